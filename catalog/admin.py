@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from catalog.models import Category, Product, Contact, Blog, ProductVersion
+from catalog.models import Category, Product, Contact, Blog, ProductVersion, OutboxEmail, ContactMessage, \
+    ForbiddenWord
 
 
 @admin.register(Category)
@@ -11,10 +12,10 @@ class CategoryAdmin(admin.ModelAdmin):
 
     Атрибуты:
         - list_display: Кортеж, определяющий, какие поля модели будут отображены в списке объектов в административной
-                        панели. В данном случае, это поля id и name.
+                        панели. В данном случае, это поля id, name и поля статистики продуктов категории.
     """
 
-    list_display = ('id', 'name')
+    list_display = ('id', 'name', 'product_count', 'published_count', 'min_price', 'max_price')
 
 
 @admin.register(Product)
@@ -28,12 +29,12 @@ class ProductAdmin(admin.ModelAdmin):
         - list_filter (tuple): Определяет поля модели, по которым можно фильтровать объекты в административной панели.
                                В данном случае фильтрация доступна по полю 'category'.
         - search_fields (tuple): Определяет поля модели, по которым можно осуществлять поиск объектов в административной
-                                 панели. В данном случае поиск доступен по полям 'name' и 'description'.
+                                 панели. В данном случае поиск доступен по полям 'name', 'description' и 'sku'.
     """
 
     list_display = ('id', 'name', 'price', 'category')
     list_filter = ('category',)
-    search_fields = ('name', 'description')
+    search_fields = ('name', 'description', 'sku')
 
 
 @admin.register(Contact)
@@ -52,6 +53,22 @@ class ContactAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 
+@admin.register(ContactMessage)
+class ContactMessageAdmin(admin.ModelAdmin):
+    """
+    Класс ContactMessageAdmin представляет собой конфигурацию административного интерфейса для модели ContactMessage.
+
+    Атрибуты:
+        - list_display (tuple): Определяет поля модели, которые будут отображены в списке объектов в административной
+                                панели. В данном случае отображаются поля 'id', 'name', 'phone' и 'created_at'.
+        - search_fields (tuple): Определяет поля модели, по которым можно осуществлять поиск объектов в административной
+                                 панели. В данном случае поиск доступен по полям 'name' и 'phone'.
+    """
+
+    list_display = ('id', 'name', 'phone', 'created_at')
+    search_fields = ('name', 'phone')
+
+
 @admin.register(Blog)
 class BlogAdmin(admin.ModelAdmin):
     """
@@ -89,3 +106,38 @@ class ProductVersionAdmin(admin.ModelAdmin):
     list_display = ('id', 'version_number', 'product', 'is_current')
     list_filter = ('is_current',)
     search_fields = ('product__name',)
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    """
+    Класс OutboxEmailAdmin представляет собой конфигурацию административного интерфейса для модели OutboxEmail.
+
+    Атрибуты:
+        - list_display (tuple): Определяет поля модели, которые будут отображены в списке объектов в административной
+        панели. В данном случае отображаются поля 'id', 'subject', 'status', 'attempts' и 'created_at'.
+        - list_filter (tuple): Определяет поля модели, по которым можно фильтровать объекты в административной панели.
+                               В данном случае можно фильтровать по полю 'status', что позволяет найти недоставленные
+                               письма.
+        - exclude (tuple): Поля модели, не отображаемые в форме. Текст письма может содержать новый пароль
+                           пользователя, поэтому он не показывается.
+    """
+
+    list_display = ('id', 'subject', 'status', 'attempts', 'created_at')
+    list_filter = ('status',)
+    exclude = ('message',)
+
+
+@admin.register(ForbiddenWord)
+class ForbiddenWordAdmin(admin.ModelAdmin):
+    """
+    Класс ForbiddenWordAdmin представляет собой конфигурацию административного интерфейса для модели ForbiddenWord.
+    После изменения списка слов существующие продукты и статьи можно перепроверить командой moderate_catalog.
+
+    Атрибуты:
+        - list_display (tuple): Поля, отображаемые в списке слов: 'word' и 'created_at'.
+        - search_fields (tuple): Поля, по которым осуществляется поиск: 'word'.
+    """
+
+    list_display = ('word', 'created_at')
+    search_fields = ('word',)
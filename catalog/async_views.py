@@ -0,0 +1,145 @@
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.views import View
+
+from catalog.mixins import CustomLoginRequiredMixin
+from catalog.models import Blog
+from catalog.services import aget_catalog_snapshot, arender_product_cards, arender_blog_cards, aincrement_blog_views, \
+    aget_product_page
+from catalog.views import ProductListView, ProductDetailView, BlogListView, BlogDetailView
+
+# Асинхронные версии представлений чтения каталога и блога для запуска под ASGI (config.asgi). Подключаются
+# настройкой CATALOG_ASYNC_VIEWS (см. catalog.urls). Данные читаются асинхронным ORM, кэш - асинхронными методами
+# (catalog.cache.AsyncRedisCache), поэтому один процесс ASGI обслуживает другие запросы, пока запрос ожидает
+# базу данных или Redis. Шаблоны, контекст и ключи кэша те же, что у синхронных представлений.
+
+
+class AsyncUserMixin:
+    """
+    Mixin класс, загружающий пользователя запроса асинхронно (request.auser()) до вызова обработчика.
+
+    После загрузки request.user содержит готовый объект пользователя, поэтому обращение к нему в представлении и
+    шаблонах не выполняет синхронных запросов к базе данных.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+
+        return await View.dispatch(self, request, *args, **kwargs)
+
+
+class AsyncLoginRequiredMixin(CustomLoginRequiredMixin):
+    """
+    Асинхронная версия CustomLoginRequiredMixin: пользователь загружается через request.auser(), неавторизованный
+    пользователь перенаправляется на страницу входа.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+
+        return await View.dispatch(self, request, *args, **kwargs)
+
+
+class AsyncProductListView(AsyncUserMixin, ProductListView):
+    """
+    Асинхронная версия ProductListView.
+
+    Снимок каталога с фасетами фильтров и карточки продуктов читаются из кэша асинхронно. Вывод по курсору и с
+    заданными фильтрами выполняется синхронной версией представления в отдельном потоке.
+
+    Методы:
+        - get(request, *args, **kwargs): Возвращает страницу списка продуктов.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        if self.reads_database():
+            return await sync_to_async(super().get)(request, *args, **kwargs)
+
+        snapshot = await aget_catalog_snapshot()
+        self.object_list = snapshot.rows
+        self.facets = snapshot.facets
+        context = super(ProductListView, self).get_context_data()
+        context['product_cards'] = await arender_product_cards(context['object_list'])
+        context.update(self.get_filter_context())
+
+        return self.render_to_response(context)
+
+
+class AsyncProductDetailView(AsyncLoginRequiredMixin, ProductDetailView):
+    """
+    Асинхронная версия ProductDetailView.
+
+    Методы:
+        - get(request, *args, **kwargs): Возвращает страницу продукта или ошибку 404.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        page = await aget_product_page(self.kwargs['pk'])
+
+        if page is None:
+            raise Http404('Продукт не найден')
+
+        return self.render_to_response(self.get_context_data(page))
+
+
+class AsyncBlogListView(AsyncLoginRequiredMixin, BlogListView):
+    """
+    Асинхронная версия BlogListView.
+
+    Количество статей для постраничной навигации и статьи страницы читаются асинхронным ORM, карточки статей - из
+    кэша асинхронно. Вывод по курсору выполняется синхронной версией представления в отдельном потоке.
+
+    Атрибуты:
+        - object_count (int | None): Количество статей, полученное до построения постраничной навигации.
+
+    Методы:
+        - get(request, *args, **kwargs): Возвращает страницу списка статей.
+        - get_paginator(queryset, per_page, **kwargs): Возвращает Paginator с уже известным количеством статей.
+    """
+
+    object_count = None
+
+    async def get(self, request, *args, **kwargs):
+        if self.is_cursor_mode():
+            return await sync_to_async(super().get)(request, *args, **kwargs)
+
+        self.object_list = self.get_queryset()
+        self.object_count = await self.object_list.acount()
+        context = super(BlogListView, self).get_context_data()
+
+        articles = [article async for article in context['object_list']]
+        context['page_obj'].object_list = articles
+        context['object_list'] = context[self.get_context_object_name(self.object_list)] = articles
+        context['blog_cards'] = await arender_blog_cards(articles)
+
+        return self.render_to_response(context)
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        paginator = super().get_paginator(queryset, per_page, **kwargs)
+
+        if self.object_count is not None:
+            paginator.count = self.object_count
+
+        return paginator
+
+
+class AsyncBlogDetailView(AsyncLoginRequiredMixin, BlogDetailView):
+    """
+    Асинхронная версия BlogDetailView. Просмотр статьи учитывается в кэше асинхронно.
+
+    Методы:
+        - get(request, *args, **kwargs): Возвращает страницу статьи или ошибку 404.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            self.object = await self.get_queryset().aget(**{self.slug_field: self.kwargs[self.slug_url_kwarg]})
+        except Blog.DoesNotExist:
+            raise Http404('Статья не найдена')
+
+        self.object.views_count += await aincrement_blog_views(self.object.pk)
+
+        return self.render_to_response(self.get_context_data(object=self.object))
@@ -0,0 +1,292 @@
+import statistics
+import time
+import uuid
+from collections import namedtuple, Counter
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from catalog.local_cache import clear_local_caches
+from catalog.models import Category, Product, ProductVersion, Blog, Contact
+from catalog.search import rebuild_index
+from catalog.services import recompute_category_stats
+
+# Замер производительности маршрутов приложений catalog и users: набор данных заданного масштаба, перечень
+# запросов ко всем маршрутам и бюджеты запросов к базе данных. Используется командой bench_endpoints и тестами
+# catalog.tests.
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+# Количество объектов на единицу масштаба набора данных.
+DATASET_SIZES = {
+    'users': 5,
+    'categories': 5,
+    'products': 100,
+    'versions_per_product': 2,
+    'blogs': 30,
+}
+
+Dataset = namedtuple('Dataset', ('user', 'product', 'blog'))
+
+# Запрос к маршруту: name - имя замера, url_name - полное имя маршрута, path - функция, возвращающая адрес для
+# набора данных, login - выполнять ли запрос от имени пользователя набора данных, status_code - ожидаемый код ответа.
+Endpoint = namedtuple('Endpoint', ('name', 'url_name', 'path', 'login', 'status_code'), defaults=(200,))
+
+ENDPOINTS = (
+    Endpoint('home', 'catalog:home', lambda dataset: '/', False),
+    Endpoint('home_page_2', 'catalog:home', lambda dataset: '/?page=2', False),
+    Endpoint('home_cursor', 'catalog:home', lambda dataset: '/?cursor=', False),
+    Endpoint('home_authenticated', 'catalog:home', lambda dataset: '/', True),
+    Endpoint('home_filtered', 'catalog:home',
+             lambda dataset: f'/?category={dataset.product.category_id}&price_min=120&available=1', False),
+    Endpoint('home_filtered_page_2', 'catalog:home',
+             lambda dataset: f'/?category={dataset.product.category_id}&available=1&page=2', False),
+    Endpoint('contacts', 'catalog:contacts', lambda dataset: '/contacts/', True),
+    Endpoint('product_detail', 'catalog:product_detail', lambda dataset: f'/product/{dataset.product.pk}/', True),
+    Endpoint('new_product', 'catalog:new_product', lambda dataset: '/new_product/', True),
+    Endpoint('product_update', 'catalog:product_update',
+             lambda dataset: f'/product/{dataset.product.pk}/edit/', True),
+    Endpoint('product_delete', 'catalog:product_delete',
+             lambda dataset: f'/product/{dataset.product.pk}/delete/', True),
+    Endpoint('blog', 'catalog:blog', lambda dataset: '/blog/', True),
+    Endpoint('blog_page_2', 'catalog:blog', lambda dataset: '/blog/?page=2', True),
+    Endpoint('blog_cursor', 'catalog:blog', lambda dataset: '/blog/?cursor=', True),
+    Endpoint('new_blog', 'catalog:new_blog', lambda dataset: '/blog/new/', True),
+    Endpoint('blog_detail', 'catalog:blog_detail', lambda dataset: f'/blog/{dataset.blog.slug}/', True),
+    Endpoint('blog_edit', 'catalog:blog_edit', lambda dataset: f'/blog/{dataset.blog.slug}/edit/', True),
+    Endpoint('blog_delete', 'catalog:blog_delete', lambda dataset: f'/blog/{dataset.blog.slug}/delete/', True),
+    Endpoint('search', 'catalog:search', lambda dataset: '/search/?q=продукт', False),
+    Endpoint('product_feed', 'catalog:product_feed', lambda dataset: '/feed/jsonl/', False),
+    Endpoint('categories', 'catalog:categories', lambda dataset: '/categories/', False),
+    Endpoint('category_detail', 'catalog:category_detail',
+             lambda dataset: f'/categories/{dataset.product.category_id}/', False),
+    Endpoint('register', 'users:register', lambda dataset: '/users/register/', False),
+    Endpoint('verify_email', 'users:verify_email', lambda dataset: f'/users/verify/{uuid.UUID(int=0)}/', False, 404),
+    Endpoint('login', 'users:login', lambda dataset: '/users/login/', False),
+    Endpoint('password_reset', 'users:password_reset', lambda dataset: '/users/password_reset/', False),
+    Endpoint('profile_edit', 'users:profile_edit', lambda dataset: '/users/profile/edit/', True),
+)
+
+# Максимальное количество запросов к базе данных на один запрос к маршруту, в том числе при пустом кэше. В бюджет
+# входят запросы сессии и пользователя, а при пустом кэше - два запроса прав пользователя
+# (users.backends.CachedModelBackend) и, для списка продуктов, два запроса фасетов фильтров (catalog.filters).
+# Бюджет не должен зависеть от размера набора данных: рост числа запросов вместе с количеством объектов (N+1) -
+# регрессия.
+QUERY_BUDGETS = {
+    'home': 3,
+    'home_page_2': 3,
+    'home_cursor': 4,
+    'home_authenticated': 5,
+    'home_filtered': 4,
+    'home_filtered_page_2': 4,
+    'contacts': 3,
+    'product_detail': 4,
+    'new_product': 3,
+    'product_update': 6,
+    'product_delete': 3,
+    'blog': 6,
+    'blog_page_2': 6,
+    'blog_cursor': 5,
+    'new_blog': 4,
+    'blog_detail': 3,
+    'blog_edit': 5,
+    'blog_delete': 5,
+    'search': 3,
+    'product_feed': 1,
+    'categories': 2,
+    'category_detail': 3,
+    'register': 0,
+    'verify_email': 1,
+    'login': 0,
+    'password_reset': 0,
+    'profile_edit': 3,
+}
+
+# Операции кэша, которые учитываются при замере.
+CACHE_OPERATIONS = ('get', 'get_many', 'set', 'set_many', 'add', 'delete', 'delete_many', 'incr', 'decr',
+                    'has_key', 'touch', 'aget', 'aget_many', 'aset', 'aset_many', 'aadd', 'adelete', 'aincr')
+
+
+def seed_dataset(scale=1):
+    """
+    Создает набор данных для замеров: пользователей, категории, продукты с версиями, статьи блога и контакты.
+
+    Объекты создаются запросами bulk_create, после чего пересчитывается статистика категорий и перестраивается
+    поисковый индекс. Пользователь набора данных (benchmark@example.com, пароль BENCHMARK_PASSWORD) - владелец всех
+    продуктов с правами на управление статьями блога.
+
+    Параметры:
+        scale (int): Масштаб набора данных - множитель DATASET_SIZES.
+
+    Возвращает:
+        Dataset: Пользователь, продукт и статья, используемые в адресах запросов.
+    """
+
+    User = get_user_model()
+
+    user = User.objects.create_user('benchmark@example.com', BENCHMARK_PASSWORD)
+    user.user_permissions.set(Permission.objects.filter(
+        content_type__app_label='catalog', codename__in=('add_blog', 'change_blog', 'delete_blog'),
+    ))
+    User.objects.bulk_create([
+        User(email=f'user{index}@example.com', password=user.password)
+        for index in range(DATASET_SIZES['users'] * scale - 1)
+    ])
+
+    categories = Category.objects.bulk_create([
+        Category(name=f'Категория {index}', description=f'Описание категории {index}')
+        for index in range(DATASET_SIZES['categories'])
+    ])
+    products = Product.objects.bulk_create([
+        Product(
+            name=f'Продукт {index}',
+            description=f'Описание продукта {index}. ' * 10,
+            category=categories[index % len(categories)],
+            price=Decimal(100 + index),
+            owner=user,
+            is_published=True,
+            sku=f'SKU-{index}',
+        )
+        for index in range(DATASET_SIZES['products'] * scale)
+    ])
+    ProductVersion.objects.bulk_create([
+        ProductVersion(
+            product=product,
+            version_number=str(number),
+            version_name=f'Версия {number}',
+            is_current=number == DATASET_SIZES['versions_per_product'],
+        )
+        for product in products
+        for number in range(1, DATASET_SIZES['versions_per_product'] + 1)
+    ])
+    blogs = Blog.objects.bulk_create([
+        Blog(title=f'Статья {index}', slug=f'article-{index}', content=f'Содержание статьи {index}. ' * 20)
+        for index in range(DATASET_SIZES['blogs'] * scale)
+    ])
+    Contact.objects.create(name='Магазин', email='shop@example.com', phone='+70000000000', address='Москва')
+
+    recompute_category_stats()
+    rebuild_index()
+
+    return Dataset(user, products[0], blogs[0])
+
+
+@contextmanager
+def count_cache_operations(alias='default'):
+    """
+    Подсчитывает операции с кэшем внутри блока with.
+
+    Методы экземпляра бэкенда кэша текущего потока временно заменяются обертками, увеличивающими счетчик.
+    Учитываются только внешние вызовы: если метод бэкенда вызывает другой метод (например, get_many базового класса
+    вызывает get для каждого ключа), вложенные вызовы не считаются.
+
+    Параметры:
+        alias (str): Псевдоним кэша.
+
+    Возвращает:
+        Counter: Счетчик операций (имя метода -> количество вызовов), заполняемый по мере выполнения блока.
+    """
+
+    backend = caches[alias]
+    counter = Counter()
+    depth = [0]
+
+    def wrap(name, method):
+        def wrapper(*args, **kwargs):
+            if not depth[0]:
+                counter[name] += 1
+
+            depth[0] += 1
+
+            try:
+                return method(*args, **kwargs)
+            finally:
+                depth[0] -= 1
+
+        return wrapper
+
+    patched = [name for name in CACHE_OPERATIONS if hasattr(backend, name)]
+
+    for name in patched:
+        setattr(backend, name, wrap(name, getattr(backend, name)))
+
+    try:
+        yield counter
+    finally:
+        for name in patched:
+            delattr(backend, name)
+
+
+def percentile(values, percent):
+    """
+    Возвращает перцентиль отсортированного списка значений (метод ближайшего ранга).
+    """
+
+    return values[min(len(values) - 1, max(0, round(len(values) * percent / 100) - 1))]
+
+
+def measure_endpoint(client, endpoint, dataset, repeat):
+    """
+    Выполняет запросы к маршруту и возвращает результаты замера.
+
+    Первый запрос выполняется с пустым кэшем (кэш и кэши в памяти процесса очищаются перед замером маршрута),
+    остальные - с заполненным, поэтому кэш не должен использоваться ничем, кроме замера.
+
+    Параметры:
+        client (Client): Тестовый клиент; для маршрутов с login=True в нем должен быть выполнен вход.
+        endpoint (Endpoint): Маршрут.
+        dataset (Dataset): Набор данных.
+        repeat (int): Количество запросов.
+
+    Возвращает:
+        dict: Адрес, код ответа, задержки в миллисекундах (p50, p90, p99, среднее), количество запросов к базе данных
+              (при пустом и заполненном кэше, максимум) и среднее количество операций кэша на запрос по операциям.
+    """
+
+    path = endpoint.path(dataset)
+    latencies = []
+    queries = []
+    cache_operations = Counter()
+    status_code = None
+
+    caches['default'].clear()
+    clear_local_caches()
+
+    for _ in range(repeat):
+        with count_cache_operations() as counter, CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = client.get(path)
+
+            if response.streaming:
+                b''.join(response.streaming_content)
+
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        status_code = response.status_code
+        queries.append(len(context.captured_queries))
+        cache_operations.update(counter)
+
+    latencies.sort()
+
+    return {
+        'path': path,
+        'status_code': status_code,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 3),
+            'p90': round(percentile(latencies, 90), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'mean': round(statistics.fmean(latencies), 3),
+        },
+        'queries': {
+            'cold': queries[0],
+            'warm': queries[-1],
+            'max': max(queries),
+            'budget': QUERY_BUDGETS.get(endpoint.name),
+        },
+        'cache_operations': {name: round(count / repeat, 2) for name, count in sorted(cache_operations.items())},
+    }
@@ -0,0 +1,283 @@
+import asyncio
+import random
+import time
+import weakref
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.redis import RedisCache
+
+from catalog.metrics import get_request_metrics
+
+# Параметры OPTIONS, относящиеся только к синхронному клиенту redis-py.
+SYNC_ONLY_OPTIONS = ('serializer', 'pool_class', 'parser_class')
+
+_MISSING = object()
+
+
+class AsyncRedisCache(RedisCache):
+    """
+    Бэкенд кэша Redis с неблокирующими асинхронными методами.
+
+    Асинхронные методы стандартного RedisCache выполняют синхронные вызовы в отдельном потоке (sync_to_async). Этот
+    бэкенд реализует основные асинхронные методы (aget, aget_many, aset, aset_many, aadd, adelete, aincr, ahas_key)
+    через клиент redis.asyncio, поэтому под ASGI ожидание Redis не занимает поток и может перекрываться с запросами к
+    базе данных других запросов. Ключи, сериализация и сроки хранения совпадают с синхронными методами, так что
+    синхронный и асинхронный код работают с одними и теми же записями.
+
+    Пул соединений redis.asyncio привязан к циклу событий, поэтому пулы хранятся отдельно для каждого цикла. Сервер
+    выбирается так же, как в синхронном клиенте: первый сервер LOCATION - основной (запись), остальные - реплики, из
+    которых читается случайная.
+
+    Дополнительно бэкенд поддерживает множества Redis (sadd, asadd, spop), которыми учитываются измененные объекты
+    (см. catalog.services.flush_blog_views()). Элементы множеств не сериализуются и возвращаются строками.
+
+    Методы:
+        - get_server_index(write=False): Возвращает индекс сервера в LOCATION для записи или чтения.
+        - get_async_client(write=False): Возвращает клиент redis.asyncio для текущего цикла событий.
+        - sadd(key, *members), asadd(key, *members): Добавляют элементы в множество.
+        - spop(key, count): Извлекает из множества до count произвольных элементов.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        self._async_pools = weakref.WeakKeyDictionary()
+
+    def get_server_index(self, write=False):
+        if write or len(self._servers) == 1:
+            return 0
+
+        return random.randint(1, len(self._servers) - 1)
+
+    def get_async_client(self, write=False):
+        import redis.asyncio
+
+        pools = self._async_pools.setdefault(asyncio.get_running_loop(), {})
+        index = self.get_server_index(write)
+
+        if index not in pools:
+            options = {key: value for key, value in self._options.items() if key not in SYNC_ONLY_OPTIONS}
+            pools[index] = redis.asyncio.ConnectionPool.from_url(self._servers[index], **options)
+
+        return redis.asyncio.Redis(connection_pool=pools[index])
+
+    @property
+    def _serializer(self):
+        return self._cache._serializer
+
+    async def aget(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        value = await self.get_async_client().get(key)
+
+        return default if value is None else self._serializer.loads(value)
+
+    async def aget_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+
+        if not key_map:
+            return {}
+
+        values = await self.get_async_client().mget(list(key_map))
+
+        return {
+            key_map[key]: self._serializer.loads(value) for key, value in zip(key_map, values) if value is not None
+        }
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        timeout = self.get_backend_timeout(timeout)
+        client = self.get_async_client(write=True)
+
+        if timeout == 0:
+            await client.delete(key)
+        else:
+            await client.set(key, self._serializer.dumps(value), ex=timeout)
+
+    async def aset_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if not data:
+            return []
+
+        timeout = self.get_backend_timeout(timeout)
+        safe_data = {
+            self.make_and_validate_key(key, version=version): self._serializer.dumps(value)
+            for key, value in data.items()
+        }
+
+        async with self.get_async_client(write=True).pipeline() as pipeline:
+            pipeline.mset(safe_data)
+
+            if timeout is not None:
+                for key in safe_data:
+                    pipeline.expire(key, timeout)
+
+            await pipeline.execute()
+
+        return []
+
+    async def aadd(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        timeout = self.get_backend_timeout(timeout)
+        client = self.get_async_client(write=True)
+        value = self._serializer.dumps(value)
+
+        if timeout == 0:
+            added = bool(await client.set(key, value, nx=True))
+
+            if added:
+                await client.delete(key)
+
+            return added
+
+        return bool(await client.set(key, value, ex=timeout, nx=True))
+
+    async def adelete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+
+        return bool(await self.get_async_client(write=True).delete(key))
+
+    async def aincr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        client = self.get_async_client(write=True)
+
+        if not await client.exists(key):
+            raise ValueError(f"Key '{key}' not found.")
+
+        return await client.incr(key, delta)
+
+    async def ahas_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+
+        return bool(await self.get_async_client().exists(key))
+
+    def sadd(self, key, *members, version=None):
+        key = self.make_and_validate_key(key, version=version)
+
+        return self._cache.get_client(key, write=True).sadd(key, *members)
+
+    async def asadd(self, key, *members, version=None):
+        key = self.make_and_validate_key(key, version=version)
+
+        return await self.get_async_client(write=True).sadd(key, *members)
+
+    def spop(self, key, count, version=None):
+        key = self.make_and_validate_key(key, version=version)
+
+        return [member.decode() for member in self._cache.get_client(key, write=True).spop(key, count)]
+
+
+class InstrumentedCacheMixin:
+    """
+    Mixin класс для бэкенда кэша, учитывающий в показателях запроса (catalog.metrics) количество и время обращений
+    к кэшу, попадания и промахи.
+
+    Вне обработки запроса методы вызываются без замеров.
+    """
+
+    def _measure(self, method, *args, **kwargs):
+        metrics = get_request_metrics()
+
+        if metrics is None:
+            return method(*args, **kwargs)
+
+        started = time.perf_counter()
+
+        try:
+            return method(*args, **kwargs)
+        finally:
+            metrics.cache_time += time.perf_counter() - started
+            metrics.cache_calls += 1
+
+    async def _ameasure(self, method, *args, **kwargs):
+        metrics = get_request_metrics()
+
+        if metrics is None:
+            return await method(*args, **kwargs)
+
+        started = time.perf_counter()
+
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            metrics.cache_time += time.perf_counter() - started
+            metrics.cache_calls += 1
+
+    @staticmethod
+    def _count_lookups(hits, total):
+        metrics = get_request_metrics()
+
+        if metrics is not None:
+            metrics.cache_hits += hits
+            metrics.cache_misses += total - hits
+
+    def get(self, key, default=None, version=None):
+        value = self._measure(super().get, key, _MISSING, version)
+        self._count_lookups(value is not _MISSING, 1)
+
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = self._measure(super().get_many, keys, version)
+        self._count_lookups(len(values), len(keys))
+
+        return values
+
+    def set(self, *args, **kwargs):
+        return self._measure(super().set, *args, **kwargs)
+
+    def set_many(self, *args, **kwargs):
+        return self._measure(super().set_many, *args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        return self._measure(super().add, *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._measure(super().delete, *args, **kwargs)
+
+    def incr(self, *args, **kwargs):
+        return self._measure(super().incr, *args, **kwargs)
+
+    def touch(self, *args, **kwargs):
+        return self._measure(super().touch, *args, **kwargs)
+
+    def sadd(self, *args, **kwargs):
+        return self._measure(super().sadd, *args, **kwargs)
+
+    def spop(self, *args, **kwargs):
+        return self._measure(super().spop, *args, **kwargs)
+
+    async def aget(self, key, default=None, version=None):
+        value = await self._ameasure(super().aget, key, _MISSING, version)
+        self._count_lookups(value is not _MISSING, 1)
+
+        return default if value is _MISSING else value
+
+    async def aget_many(self, keys, version=None):
+        keys = list(keys)
+        values = await self._ameasure(super().aget_many, keys, version)
+        self._count_lookups(len(values), len(keys))
+
+        return values
+
+    async def aset(self, *args, **kwargs):
+        return await self._ameasure(super().aset, *args, **kwargs)
+
+    async def aset_many(self, *args, **kwargs):
+        return await self._ameasure(super().aset_many, *args, **kwargs)
+
+    async def aadd(self, *args, **kwargs):
+        return await self._ameasure(super().aadd, *args, **kwargs)
+
+    async def adelete(self, *args, **kwargs):
+        return await self._ameasure(super().adelete, *args, **kwargs)
+
+    async def aincr(self, *args, **kwargs):
+        return await self._ameasure(super().aincr, *args, **kwargs)
+
+    async def asadd(self, *args, **kwargs):
+        return await self._ameasure(super().asadd, *args, **kwargs)
+
+
+class InstrumentedRedisCache(InstrumentedCacheMixin, AsyncRedisCache):
+    """
+    Бэкенд кэша AsyncRedisCache с учетом обращений к кэшу в показателях запроса (см. InstrumentedCacheMixin).
+    """
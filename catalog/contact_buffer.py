@@ -0,0 +1,132 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection
+
+from catalog.models import ContactMessage
+
+logger = logging.getLogger(__name__)
+
+
+class ContactMessageBuffer:
+    """
+    Буфер сообщений формы обратной связи с групповой записью в базу данных.
+
+    Сообщения накапливаются в памяти процесса и записываются фоновым потоком одним запросом bulk_create, когда
+    набирается batch_size сообщений или проходит flush_interval секунд. Поток запроса при этом не обращается к диску.
+    При политике 'always' каждое сообщение записывается сразу, что исключает потерю сообщений при аварийном завершении
+    процесса ценой записи в потоке запроса. При штатном завершении процесса буфер сбрасывается.
+
+    Размер буфера ограничен max_pending сообщениями: пока база данных недоступна, новые сообщения сверх этого
+    количества записываются сразу в потоке запроса (и запрос завершается ошибкой), а сообщения, не записанные
+    фоновым потоком, возвращаются в буфер только в пределах свободного места, остальные теряются с записью в журнал.
+
+    Атрибуты:
+        - policy (str): Политика записи: 'batch' или 'always'.
+        - batch_size (int): Количество сообщений, при накоплении которого буфер сбрасывается немедленно.
+        - flush_interval (float): Максимальное время хранения сообщения в буфере в секундах.
+        - max_pending (int): Максимальное количество сообщений в буфере.
+
+    Методы:
+        - add(**fields): Добавляет сообщение в буфер.
+        - flush(): Записывает накопленные сообщения в базу данных.
+    """
+
+    def __init__(self, policy, batch_size, flush_interval, max_pending):
+        self.policy = policy
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._messages = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, **fields):
+        """
+        Добавляет сообщение в буфер.
+
+        Параметры:
+            - **fields: Значения полей модели ContactMessage.
+        """
+
+        message = ContactMessage(**fields)
+
+        if self.policy == 'always':
+            message.save()
+            return
+
+        with self._lock:
+            pending = len(self._messages) + 1
+
+            if pending <= self.max_pending:
+                self._messages.append(message)
+
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='contact-message-buffer', daemon=True)
+                    self._thread.start()
+
+        if pending > self.max_pending:
+            message.save()
+            return
+
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """
+        Записывает накопленные сообщения в базу данных. Если запись не удалась, сообщения возвращаются в буфер в
+        пределах max_pending.
+
+        Возвращает:
+            - int: Количество записанных сообщений.
+        """
+
+        with self._flush_lock:
+            with self._lock:
+                messages, self._messages = self._messages, []
+
+            if messages:
+                try:
+                    ContactMessage.objects.bulk_create(messages, batch_size=self.batch_size)
+                except Exception:
+                    with self._lock:
+                        free = max(0, self.max_pending - len(self._messages))
+                        self._messages[:0] = messages[len(messages) - free:] if free else []
+
+                    if len(messages) > free:
+                        logger.error('Буфер сообщений формы обратной связи переполнен, потеряно сообщений: %s',
+                                     len(messages) - free)
+
+                    raise
+
+            return len(messages)
+
+    def _run(self):
+        """
+        Цикл фонового потока: сбрасывает буфер по таймеру или по заполнению.
+        """
+
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Не удалось записать сообщения формы обратной связи')
+            finally:
+                connection.close()
+
+
+contact_message_buffer = ContactMessageBuffer(
+    policy=settings.CONTACT_MESSAGES_FLUSH_POLICY,
+    batch_size=settings.CONTACT_MESSAGES_BATCH_SIZE,
+    flush_interval=settings.CONTACT_MESSAGES_FLUSH_INTERVAL,
+    max_pending=settings.CONTACT_MESSAGES_MAX_PENDING,
+)
+
+atexit.register(contact_message_buffer.flush)
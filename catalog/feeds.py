@@ -0,0 +1,290 @@
+import csv
+import io
+import json
+import zlib
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from catalog.models import Product, ProductVersion, Category
+
+FEED_FIELDS = ('id', 'sku', 'name', 'description', 'category_id', 'category', 'price', 'is_published', 'updated_at',
+               'version_name', 'version_number', 'url', 'picture')
+
+# Поля, которые выгружаются для снятых с публикации продуктов в инкрементальной выгрузке: агрегатору достаточно
+# идентификатора, чтобы скрыть продукт, а наименование, описание, цена и изображение неопубликованного продукта не
+# должны быть доступны через общедоступную выгрузку.
+FEED_UNPUBLISHED_FIELDS = ('id', 'sku', 'is_published', 'updated_at')
+
+FEED_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'yml': 'application/xml; charset=utf-8',
+}
+
+FEED_CHUNK_SIZE = 2000
+
+# Минимальный объем данных, отдаваемый клиенту за один раз. Без буферизации каждая строка выгрузки превращалась бы в
+# отдельную запись в сокет.
+FEED_BUFFER_SIZE = 64 * 1024
+
+
+def parse_since(value):
+    """
+    Разбирает момент начала инкрементальной выгрузки в формате ISO 8601. Время без часового пояса считается временем
+    в часовом поясе проекта.
+
+    Параметры:
+        value (str): Дата и время, например 2024-06-01T12:00:00+03:00 или 2024-06-01.
+
+    Возвращает:
+        datetime: Момент начала выгрузки.
+
+    Исключения:
+        ValueError: Если значение не является датой и временем.
+    """
+
+    since = parse_datetime(value) or parse_datetime(f'{value}T00:00:00')
+
+    if since is None:
+        raise ValueError(f'Некорректная дата: {value}')
+
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+
+    return since
+
+
+def get_feed_rows(since=None, chunk_size=FEED_CHUNK_SIZE):
+    """
+    Построчно читает продукты для выгрузки.
+
+    Продукты читаются через iterator(chunk_size), то есть порциями (на PostgreSQL - через серверный курсор), поэтому
+    объем памяти не зависит от размера каталога. Наименование категории подгружается через JOIN, текущая версия
+    продукта - подзапросами. Полная выгрузка содержит только опубликованные продукты. Инкрементальная выгрузка
+    (since) содержит все продукты, измененные начиная с указанного момента, в том числе снятые с публикации, чтобы
+    агрегатор мог скрыть их у себя; для таких продуктов выгружаются только поля FEED_UNPUBLISHED_FIELDS (см.
+    iter_feed_records()).
+
+    Параметры:
+        since (datetime, optional): Момент, начиная с которого выгружаются измененные продукты.
+        chunk_size (int): Количество строк, читаемых из базы данных за один раз.
+
+    Возвращает:
+        generator: Словари с полями FEED_FIELDS (кроме url и picture).
+    """
+
+    current_version = ProductVersion.objects.filter(product=OuterRef('pk'), is_current=True).order_by('-pk')
+
+    products = Product.objects.order_by('pk')
+
+    if since is None:
+        products = products.filter(is_published=True)
+    else:
+        products = products.filter(updated_at__gte=since)
+
+    return (
+        products
+        .annotate(
+            version_name=Subquery(current_version.values('version_name')[:1]),
+            version_number=Subquery(current_version.values('version_number')[:1]),
+        )
+        .values('id', 'sku', 'name', 'description', 'category_id', 'category__name', 'price', 'preview',
+                'is_published', 'updated_at', 'version_name', 'version_number')
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def iter_feed_records(base_url, since=None, chunk_size=FEED_CHUNK_SIZE):
+    """
+    Возвращает записи выгрузки с абсолютными адресами страницы и изображения продукта.
+
+    В записях снятых с публикации продуктов заполнены только поля FEED_UNPUBLISHED_FIELDS, остальные равны None.
+
+    Параметры:
+        base_url (str): Адрес сайта без завершающего слеша, например https://shop.example.
+        since (datetime, optional): Момент, начиная с которого выгружаются измененные продукты.
+        chunk_size (int): Количество строк, читаемых из базы данных за один раз.
+
+    Возвращает:
+        generator: Словари с полями FEED_FIELDS.
+    """
+
+    for row in get_feed_rows(since, chunk_size):
+        if not row['is_published']:
+            yield {field: row.get(field) if field in FEED_UNPUBLISHED_FIELDS else None for field in FEED_FIELDS}
+            continue
+
+        preview = row.pop('preview')
+        row['category'] = row.pop('category__name')
+        row['url'] = base_url + reverse('catalog:product_detail', kwargs={'pk': row['id']})
+        row['picture'] = f'{base_url}{settings.MEDIA_URL}{preview}' if preview else ''
+
+        yield row
+
+
+def render_csv(records):
+    """
+    Формирует выгрузку в формате CSV.
+
+    Параметры:
+        records (iterable): Записи выгрузки.
+
+    Возвращает:
+        generator: Фрагменты текста выгрузки.
+    """
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FEED_FIELDS)
+    writer.writeheader()
+
+    for record in records:
+        record['updated_at'] = record['updated_at'].isoformat()
+        writer.writerow(record)
+
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def render_jsonl(records):
+    """
+    Формирует выгрузку в формате JSON Lines.
+
+    Параметры:
+        records (iterable): Записи выгрузки.
+
+    Возвращает:
+        generator: Фрагменты текста выгрузки.
+    """
+
+    for record in records:
+        if record['price'] is not None:
+            record['price'] = str(record['price'])
+
+        record['updated_at'] = record['updated_at'].isoformat()
+
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def render_yml(records, base_url):
+    """
+    Формирует выгрузку в формате YML (Yandex Market Language).
+
+    Список категорий небольшой и выгружается одним запросом перед предложениями, сами предложения формируются
+    построчно.
+
+    Параметры:
+        records (iterable): Записи выгрузки.
+        base_url (str): Адрес сайта.
+
+    Возвращает:
+        generator: Фрагменты текста выгрузки.
+    """
+
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield f'<yml_catalog date={quoteattr(timezone.now().isoformat(timespec="seconds"))}>\n<shop>\n'
+    yield f'<name>{escape(settings.FEED_SHOP_NAME)}</name>\n'
+    yield f'<company>{escape(settings.FEED_COMPANY_NAME)}</company>\n'
+    yield f'<url>{escape(base_url)}/</url>\n'
+    yield '<currencies><currency id="RUR" rate="1"/></currencies>\n<categories>\n'
+
+    for pk, name in Category.objects.order_by('pk').values_list('pk', 'name'):
+        yield f'<category id="{pk}">{escape(name)}</category>\n'
+
+    yield '</categories>\n<offers>\n'
+
+    for record in records:
+        if not record['is_published']:
+            yield f'<offer id="{record["id"]}" available="false"/>\n'
+            continue
+
+        offer = [
+            f'<offer id="{record["id"]}" available="{"true" if record["is_published"] else "false"}">',
+            f'<name>{escape(record["name"])}</name>',
+            f'<url>{escape(record["url"])}</url>',
+            f'<price>{record["price"]}</price>',
+            '<currencyId>RUR</currencyId>',
+            f'<categoryId>{record["category_id"]}</categoryId>',
+        ]
+
+        if record['sku']:
+            offer.append(f'<vendorCode>{escape(record["sku"])}</vendorCode>')
+
+        if record['picture']:
+            offer.append(f'<picture>{escape(record["picture"])}</picture>')
+
+        if record['description']:
+            offer.append(f'<description>{escape(record["description"])}</description>')
+
+        if record['version_name']:
+            offer.append(f'<param name="Версия">{escape(record["version_name"])} '
+                         f'({escape(record["version_number"])})</param>')
+
+        offer.append('</offer>\n')
+
+        yield ''.join(offer)
+
+    yield '</offers>\n</shop>\n</yml_catalog>\n'
+
+
+def render_feed(feed_format, base_url, since=None, chunk_size=FEED_CHUNK_SIZE):
+    """
+    Формирует выгрузку каталога в заданном формате.
+
+    Параметры:
+        feed_format (str): Формат выгрузки: csv, jsonl или yml.
+        base_url (str): Адрес сайта без завершающего слеша.
+        since (datetime, optional): Момент, начиная с которого выгружаются измененные продукты.
+        chunk_size (int): Количество строк, читаемых из базы данных за один раз.
+
+    Возвращает:
+        generator: Фрагменты текста выгрузки.
+    """
+
+    records = iter_feed_records(base_url, since, chunk_size)
+
+    if feed_format == 'csv':
+        return render_csv(records)
+
+    if feed_format == 'jsonl':
+        return render_jsonl(records)
+
+    return render_yml(records, base_url)
+
+
+def encode_feed(chunks, compress=False):
+    """
+    Кодирует фрагменты выгрузки в UTF-8, при необходимости сжимает их gzip на лету и объединяет в блоки не меньше
+    FEED_BUFFER_SIZE байт.
+
+    Сжатие выполняется потоково (zlib.compressobj), поэтому в памяти находится только текущий блок.
+
+    Параметры:
+        chunks (iterable): Фрагменты текста выгрузки.
+        compress (bool): Сжимать ли выгрузку в формат gzip.
+
+    Возвращает:
+        generator: Блоки выгрузки в байтах.
+    """
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    buffer = bytearray()
+
+    for chunk in chunks:
+        data = chunk.encode()
+        buffer += compressor.compress(data) if compressor else data
+
+        if len(buffer) >= FEED_BUFFER_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+
+    if compressor:
+        buffer += compressor.flush()
+
+    if buffer:
+        yield bytes(buffer)
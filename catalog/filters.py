@@ -0,0 +1,325 @@
+import hashlib
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Count, Q
+from django.http import QueryDict
+
+from catalog.local_cache import facets_cache
+from catalog.models import Category, Product
+from catalog.services import get_products_generation, aget_products_generation
+
+# Фильтрация списка продуктов по категориям, диапазону цен и наличию (флаг публикации) с подсчетом количества
+# продуктов для каждого значения фильтра (фасета). Все количества вычисляются одним запросом с условной агрегацией
+# (COUNT(*) FILTER (WHERE ...)) и кэшируются для нормализованного набора фильтров до изменения каталога.
+
+FACETS_CACHE_KEY = 'product_facets:{}:{}'
+FACETS_CACHE_TIMEOUT = 60 * 60
+
+# Диапазоны цен фасета цены: (от, до), границы не включают верхнее значение.
+PRICE_RANGES = (
+    (None, Decimal(1000)),
+    (Decimal(1000), Decimal(5000)),
+    (Decimal(5000), Decimal(20000)),
+    (Decimal(20000), None),
+)
+
+PRICE_QUANTUM = Decimal('0.01')
+
+# Максимальное количество цифр идентификатора категории: большие значения не помещаются в bigint.
+CATEGORY_ID_MAX_DIGITS = 18
+
+
+def _parse_price(value):
+    """
+    Возвращает цену из параметра запроса или None, если значение пустое или некорректное.
+    """
+
+    try:
+        price = Decimal(value.replace(',', '.')).quantize(PRICE_QUANTUM)
+    except (AttributeError, InvalidOperation):
+        return None
+
+    return price if price.is_finite() and 0 <= price < 10 ** 8 else None
+
+
+def _parse_category(value):
+    """
+    Возвращает идентификатор категории из параметра запроса или None, если значение некорректное. Допускаются только
+    цифры ASCII: str.isdigit() принимает также надстрочные и другие цифры Unicode, которые int() не разбирает.
+    """
+
+    if value.isascii() and value.isdigit() and len(value) <= CATEGORY_ID_MAX_DIGITS:
+        return int(value)
+
+    return None
+
+
+class ProductFilter:
+    """
+    Нормализованный набор фильтров списка продуктов.
+
+    Одинаковые по смыслу параметры запроса (порядок и повтор категорий, запись цены, перепутанные границы диапазона)
+    приводятся к одному набору, поэтому им соответствуют один ключ кэша фасетов и одна строка запроса. Некорректные
+    значения отбрасываются.
+
+    Атрибуты:
+        - categories (tuple): Отсортированные идентификаторы выбранных категорий.
+        - price_min (Decimal | None): Минимальная цена включительно.
+        - price_max (Decimal | None): Максимальная цена, не включая ее.
+        - available (bool | None): Только опубликованные (True) или только неопубликованные (False) продукты.
+
+    Методы:
+        - from_query(query): Создает набор фильтров из параметров запроса.
+        - is_empty(): Возвращает True, если фильтры не заданы.
+        - get_q(exclude=None): Возвращает условие фильтрации.
+        - apply(queryset): Применяет фильтры к QuerySet продуктов.
+        - replace(**changes): Возвращает копию набора с измененными фильтрами.
+        - to_query(): Возвращает нормализованную строку запроса.
+    """
+
+    __slots__ = ('categories', 'price_min', 'price_max', 'available')
+
+    def __init__(self, categories=(), price_min=None, price_max=None, available=None):
+        if price_min is not None and price_max is not None and price_min > price_max:
+            price_min, price_max = price_max, price_min
+
+        self.categories = tuple(sorted(set(categories)))
+        self.price_min = price_min
+        self.price_max = price_max
+        self.available = available
+
+    @classmethod
+    def from_query(cls, query):
+        """
+        Создает набор фильтров из параметров запроса category (можно указать несколько раз), price_min, price_max и
+        available (1 или 0).
+        """
+
+        return cls(
+            categories=[pk for pk in map(_parse_category, query.getlist('category')) if pk is not None],
+            price_min=_parse_price(query.get('price_min')),
+            price_max=_parse_price(query.get('price_max')),
+            available={'1': True, '0': False}.get(query.get('available')),
+        )
+
+    def is_empty(self):
+        return not self.categories and self.price_min is None and self.price_max is None and self.available is None
+
+    def get_q(self, exclude=None):
+        """
+        Возвращает условие фильтрации продуктов.
+
+        Параметры:
+            exclude (str, optional): Фасет (category, price или available), условие которого не включается. Так
+                                     количество для значений фасета считается с учетом остальных фильтров.
+        """
+
+        q = Q()
+
+        if self.categories and exclude != 'category':
+            q &= Q(category_id__in=self.categories)
+
+        if exclude != 'price':
+            q &= price_q(self.price_min, self.price_max)
+
+        if self.available is not None and exclude != 'available':
+            q &= Q(is_published=self.available)
+
+        return q
+
+    def apply(self, queryset):
+        return queryset.filter(self.get_q())
+
+    def replace(self, **changes):
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+
+        return ProductFilter(**values)
+
+    def to_query(self):
+        query = QueryDict(mutable=True)
+        query.setlist('category', [str(pk) for pk in self.categories])
+
+        if self.price_min is not None:
+            query['price_min'] = str(self.price_min)
+
+        if self.price_max is not None:
+            query['price_max'] = str(self.price_max)
+
+        if self.available is not None:
+            query['available'] = '1' if self.available else '0'
+
+        return query.urlencode()
+
+
+def price_q(price_min, price_max):
+    """
+    Возвращает условие на цену продукта из диапазона [price_min, price_max).
+    """
+
+    q = Q()
+
+    if price_min is not None:
+        q &= Q(price__gte=price_min)
+
+    if price_max is not None:
+        q &= Q(price__lt=price_max)
+
+    return q
+
+
+def _count(q):
+    return Count('pk', filter=q) if q else Count('pk')
+
+
+def _facet_aggregates(product_filter, category_ids):
+    """
+    Возвращает выражения условной агрегации для всех значений фасетов.
+    """
+
+    aggregates = {'total': _count(product_filter.get_q())}
+    category_q = product_filter.get_q(exclude='category')
+    price_filter_q = product_filter.get_q(exclude='price')
+    available_q = product_filter.get_q(exclude='available')
+
+    for pk in category_ids:
+        aggregates[f'category_{pk}'] = _count(Q(category_id=pk) & category_q)
+
+    for index, (price_min, price_max) in enumerate(PRICE_RANGES):
+        aggregates[f'price_{index}'] = _count(price_q(price_min, price_max) & price_filter_q)
+
+    aggregates['available_1'] = _count(Q(is_published=True) & available_q)
+    aggregates['available_0'] = _count(Q(is_published=False) & available_q)
+
+    return aggregates
+
+
+def _facets(categories, counts):
+    """
+    Собирает результат подсчета фасетов в словарь для кэширования.
+    """
+
+    return {
+        'total': counts['total'],
+        'categories': [(pk, name, counts[f'category_{pk}']) for pk, name in categories],
+        'price_ranges': [counts[f'price_{index}'] for index in range(len(PRICE_RANGES))],
+        'available': {True: counts['available_1'], False: counts['available_0']},
+    }
+
+
+def _facets_cache_key(product_filter, generation):
+    digest = hashlib.md5(product_filter.to_query().encode()).hexdigest()
+
+    return FACETS_CACHE_KEY.format(generation, digest)
+
+
+def build_facets(product_filter):
+    """
+    Подсчитывает количество продуктов для всех значений фасетов.
+
+    Выполняются два запроса: список категорий и один запрос с условной агрегацией по таблице продуктов.
+
+    Возвращает:
+        dict: Словарь с ключами total (количество продуктов, подходящих под все фильтры), categories (список
+              (id, наименование, количество)), price_ranges (количества для PRICE_RANGES) и available (количества
+              опубликованных и неопубликованных продуктов).
+    """
+
+    categories = list(Category.objects.order_by('name', 'pk').values_list('pk', 'name'))
+    counts = Product.objects.aggregate(**_facet_aggregates(product_filter, [pk for pk, name in categories]))
+
+    return _facets(categories, counts)
+
+
+async def abuild_facets(product_filter):
+    """
+    Асинхронная версия build_facets().
+    """
+
+    categories = [row async for row in Category.objects.order_by('name', 'pk').values_list('pk', 'name')]
+    counts = await Product.objects.aaggregate(**_facet_aggregates(product_filter, [pk for pk, name in categories]))
+
+    return _facets(categories, counts)
+
+
+def get_facets(product_filter):
+    """
+    Возвращает фасеты для набора фильтров из кэша или подсчитывает их.
+
+    Ключ кэша содержит поколение кэша списка продуктов, поэтому фасеты пересчитываются после изменения продуктов,
+    версий или категорий (см. catalog.signals), и хранятся также в памяти процесса (catalog.local_cache).
+    """
+
+    key = _facets_cache_key(product_filter, get_products_generation())
+    facets = facets_cache.get(key)
+
+    if facets is None:
+        facets = build_facets(product_filter)
+        facets_cache.set(key, facets, FACETS_CACHE_TIMEOUT)
+
+    return facets
+
+
+async def aget_facets(product_filter):
+    """
+    Асинхронная версия get_facets().
+    """
+
+    key = _facets_cache_key(product_filter, await aget_products_generation())
+    facets = await facets_cache.aget(key)
+
+    if facets is None:
+        facets = await abuild_facets(product_filter)
+        await facets_cache.aset(key, facets, FACETS_CACHE_TIMEOUT)
+
+    return facets
+
+
+def get_facet_links(product_filter, facets):
+    """
+    Возвращает значения фасетов для шаблона: наименование, количество, признак выбора и строку запроса, которая
+    включает или выключает значение.
+    """
+
+    selected = set(product_filter.categories)
+    categories = [
+        {
+            'label': name,
+            'count': count,
+            'active': pk in selected,
+            'query': product_filter.replace(categories=selected ^ {pk}).to_query(),
+        }
+        for pk, name, count in facets['categories']
+    ]
+
+    price_ranges = []
+
+    for (price_min, price_max), count in zip(PRICE_RANGES, facets['price_ranges']):
+        active = (product_filter.price_min, product_filter.price_max) == (price_min, price_max)
+        changes = {'price_min': None, 'price_max': None} if active else {'price_min': price_min, 'price_max': price_max}
+
+        if price_min is None:
+            label = f'до {price_max}'
+        elif price_max is None:
+            label = f'от {price_min}'
+        else:
+            label = f'{price_min} - {price_max}'
+
+        price_ranges.append({
+            'label': label,
+            'count': count,
+            'active': active,
+            'query': product_filter.replace(**changes).to_query(),
+        })
+
+    available = [
+        {
+            'label': label,
+            'count': facets['available'][value],
+            'active': product_filter.available is value,
+            'query': product_filter.replace(available=None if product_filter.available is value else value).to_query(),
+        }
+        for value, label in ((True, 'В продаже'), (False, 'Нет в продаже'))
+    ]
+
+    return {'categories': categories, 'price_ranges': price_ranges, 'available': available}
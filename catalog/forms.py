@@ -1,8 +1,31 @@
 from django import forms
+from django.forms import BaseInlineFormSet
 
-from .models import Product, ProductVersion
+from .models import Product, ProductVersion, Blog
+from .moderation import find_forbidden_words
 
-FORBIDDEN_WORDS = ['казино', 'криптовалюта', 'крипта', 'биржа', 'дешево', 'бесплатно', 'обман', 'полиция', 'радар']
+
+def check_forbidden_words(value, place):
+    """
+    Проверяет значение поля формы на наличие запрещенных слов (см. catalog.moderation).
+
+    Параметры:
+        - value (str): Значение поля.
+        - place (str): Название поля в предложном падеже для сообщения об ошибке, например "названии".
+
+    Возвращает:
+        - str: Значение поля без изменений.
+
+    Исключения:
+        - ValidationError: Если в значении найдены запрещенные слова.
+    """
+
+    found = find_forbidden_words(value)
+
+    if found:
+        raise forms.ValidationError(f"Запрещенное слово в {place}: {', '.join(found)}")
+
+    return value
 
 
 class ProductForm(forms.ModelForm):
@@ -72,11 +95,7 @@ class ProductForm(forms.ModelForm):
             - ValidationError: Если найдено запрещенное слово в названии.
         """
 
-        name = self.cleaned_data.get('name')
-        for word in FORBIDDEN_WORDS:
-            if word in name.lower():
-                raise forms.ValidationError(f"Запрещенное слово в названии: {word}")
-        return name
+        return check_forbidden_words(self.cleaned_data.get('name'), 'названии')
 
     def clean_description(self):
         """
@@ -89,11 +108,31 @@ class ProductForm(forms.ModelForm):
             - ValidationError: Если найдено запрещенное слово в описании.
         """
 
-        description = self.cleaned_data.get('description')
-        for word in FORBIDDEN_WORDS:
-            if word in description.lower():
-                raise forms.ValidationError(f"Запрещенное слово в описании: {word}")
-        return description
+        return check_forbidden_words(self.cleaned_data.get('description'), 'описании')
+
+
+class BlogForm(forms.ModelForm):
+    """
+    Форма для модели Blog с проверкой заголовка и содержания статьи на наличие запрещенных слов.
+
+    Методы:
+        - clean_title(): Проверяет заголовок статьи и выбрасывает ValidationError, если найдены запрещенные слова.
+        - clean_content(): Проверяет содержание статьи и выбрасывает ValidationError, если найдены запрещенные слова.
+
+    Класс Meta:
+        - model (Blog): Связанная модель Django.
+        - fields (tuple): Поля формы: 'title', 'content', 'preview' и 'is_published'.
+    """
+
+    class Meta:
+        model = Blog
+        fields = ('title', 'content', 'preview', 'is_published')
+
+    def clean_title(self):
+        return check_forbidden_words(self.cleaned_data.get('title'), 'заголовке')
+
+    def clean_content(self):
+        return check_forbidden_words(self.cleaned_data.get('content'), 'содержании')
 
 
 class VersionForm(forms.ModelForm):
@@ -115,3 +154,25 @@ class VersionForm(forms.ModelForm):
     class Meta:
         model = ProductVersion
         fields = ['product', 'version_number', 'version_name', 'is_current']
+
+
+class VersionFormSet(BaseInlineFormSet):
+    """
+    Набор форм версий продукта, допускающий не более одной текущей версии.
+
+    Методы:
+        - clean(): Проверяет, что текущей отмечена не более чем одна версия, и выбрасывает ValidationError в противном
+                   случае. Предыдущая текущая версия, не входящая в набор форм, снимается автоматически при сохранении
+                   новой текущей версии (см. ProductVersion.save()).
+    """
+
+    def clean(self):
+        super().clean()
+
+        current_count = sum(
+            1 for form in self.forms
+            if form.cleaned_data.get('is_current') and not form.cleaned_data.get('DELETE')
+        )
+
+        if current_count > 1:
+            raise forms.ValidationError('Допустима только одна активная версия для каждого продукта.')
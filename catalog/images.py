@@ -0,0 +1,282 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+# Модуль не импортирует модели на уровне модуля: функции generate_derivatives() и init_worker() выполняются в
+# процессах пула, где приложение Django может быть еще не инициализировано.
+#
+# Очередь пула (schedule_derivatives()) хранится только в памяти процесса веб-сервера: задачи, поставленные в
+# очередь, но не завершенные к моменту перезапуска или остановки процесса (развертывание, перезапуск воркера
+# gunicorn по max_requests, OOM), теряются, как и задачи, завершившиеся ошибкой. До создания копий страницы выводят
+# исходное изображение. Повторная попытка для таких изображений - команда generate_image_derivatives: по умолчанию
+# она обрабатывает только изображения без записи ImageDerivative, поэтому ее можно запускать периодически
+# (например, раз в несколько минут из cron) и после каждого развертывания.
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = 'derivatives'
+DIGEST_LENGTH = 12
+
+# Форматы производных изображений: расширение файла -> формат Pillow и MIME-тип.
+DERIVATIVE_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpg': ('JPEG', 'image/jpeg'),
+}
+
+IMAGE_VARIANTS_KEY = 'image_variants:{}'
+IMAGE_VARIANTS_CACHE_TIMEOUT = 60 * 60 * 24
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def derivative_name(source, digest, width, extension):
+    """
+    Возвращает имя файла производного изображения.
+
+    Имя содержит контрольную сумму исходного файла, поэтому при замене изображения меняется и адрес производных, и
+    их можно отдавать с заголовком Cache-Control: immutable.
+
+    Параметры:
+        source (str): Имя исходного файла в хранилище, например products/phone.png.
+        digest (str): Контрольная сумма исходного файла.
+        width (int): Ширина производного изображения.
+        extension (str): Расширение производного изображения (ключ DERIVATIVE_FORMATS).
+
+    Возвращает:
+        str: Имя файла, например derivatives/products/phone.3f2a9c1b7e0d.320w.webp.
+    """
+
+    return f'{DERIVATIVES_DIR}/{os.path.splitext(source)[0]}.{digest}.{width}w.{extension}'
+
+
+def parse_variants(variants):
+    """
+    Разбирает описание производных изображений в формате '<контрольная сумма>:<ширина>,<ширина>,...'.
+
+    Возвращает:
+        tuple: Контрольная сумма и список ширин или (None, []), если описание пустое.
+    """
+
+    if not variants:
+        return None, []
+
+    digest, widths = variants.split(':', 1)
+
+    return digest, [int(width) for width in widths.split(',')]
+
+
+def build_picture_sources(source, variants):
+    """
+    Формирует значения атрибутов srcset для тега <picture> по описанию производных изображений.
+
+    Параметры:
+        source (str): Имя исходного файла в хранилище.
+        variants (str): Описание производных изображений (см. parse_variants()).
+
+    Возвращает:
+        dict: Словарь расширение -> (MIME-тип, значение srcset) и ключ 'src' с адресом самого крупного изображения
+              JPEG. Пустой словарь, если производных изображений нет.
+    """
+
+    digest, widths = parse_variants(variants)
+
+    if not widths:
+        return {}
+
+    sources = {
+        extension: (
+            mime_type,
+            ', '.join(
+                f'{default_storage.url(derivative_name(source, digest, width, extension))} {width}w'
+                for width in widths
+            ),
+        )
+        for extension, (image_format, mime_type) in DERIVATIVE_FORMATS.items()
+    }
+    sources['src'] = default_storage.url(derivative_name(source, digest, widths[-1], 'jpg'))
+
+    return sources
+
+
+def get_image_variants(source):
+    """
+    Возвращает описание производных изображений для исходного файла.
+
+    Описание читается из кэша, при промахе - из базы данных (ImageDerivative) с сохранением в кэш.
+
+    Параметры:
+        source (str): Имя исходного файла в хранилище.
+
+    Возвращает:
+        str: Описание производных изображений или пустая строка, если они еще не созданы.
+    """
+
+    from catalog.models import ImageDerivative
+
+    key = IMAGE_VARIANTS_KEY.format(hashlib.md5(source.encode()).hexdigest())
+    variants = cache.get(key)
+
+    if variants is None:
+        variants = ImageDerivative.objects.filter(source=source).values_list('variants', flat=True).first() or ''
+        cache.set(key, variants, IMAGE_VARIANTS_CACHE_TIMEOUT)
+
+    return variants
+
+
+def generate_derivatives(source):
+    """
+    Создает производные изображения в нескольких ширинах и форматах.
+
+    Выполняется в процессе пула, поэтому не обращается к базе данных: результат сохраняет вызывающий процесс.
+    Изображение не увеличивается: ширины больше исходной заменяются исходной шириной. Уже существующие файлы не
+    пересоздаются, так как их имя определяется содержимым исходного файла.
+
+    Параметры:
+        source (str): Имя исходного файла в хранилище.
+
+    Возвращает:
+        tuple: Имя исходного файла и описание производных изображений (см. parse_variants()).
+    """
+
+    from PIL import Image, ImageOps
+
+    with default_storage.open(source, 'rb') as file:
+        data = file.read()
+
+    digest = hashlib.sha256(data).hexdigest()[:DIGEST_LENGTH]
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+        widths = sorted({min(width, image.width) for width in settings.IMAGE_DERIVATIVE_WIDTHS})
+
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+
+            for extension, (image_format, mime_type) in DERIVATIVE_FORMATS.items():
+                name = derivative_name(source, digest, width, extension)
+
+                if default_storage.exists(name):
+                    continue
+
+                output = resized
+
+                if image_format == 'JPEG' and output.mode == 'RGBA':
+                    output = Image.new('RGB', resized.size, (255, 255, 255))
+                    output.paste(resized, mask=resized.getchannel('A'))
+
+                buffer = io.BytesIO()
+                output.save(buffer, image_format, quality=settings.IMAGE_DERIVATIVE_QUALITY)
+                default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    return source, f'{digest}:{",".join(str(width) for width in widths)}'
+
+
+def save_variants(results):
+    """
+    Сохраняет описания производных изображений в базу данных и кэш и инвалидирует кэш списка продуктов, так как
+    описание входит в строки снимка каталога.
+
+    Параметры:
+        results (iterable): Пары (имя исходного файла, описание производных изображений).
+    """
+
+    from catalog.models import ImageDerivative
+    from catalog.services import invalidate_products_cache
+
+    results = dict(results)
+
+    if not results:
+        return
+
+    ImageDerivative.objects.bulk_create(
+        [ImageDerivative(source=source, variants=variants) for source, variants in results.items()],
+        update_conflicts=True, unique_fields=['source'], update_fields=['variants'],
+    )
+    cache.set_many(
+        {IMAGE_VARIANTS_KEY.format(hashlib.md5(source.encode()).hexdigest()): variants
+         for source, variants in results.items()},
+        IMAGE_VARIANTS_CACHE_TIMEOUT,
+    )
+    invalidate_products_cache()
+
+
+def init_worker():
+    """
+    Инициализирует приложение Django в процессе пула, если процесс запущен без fork (например, на macOS и Windows).
+    """
+
+    import django
+
+    django.setup()
+
+
+def get_executor():
+    """
+    Возвращает общий для процесса пул процессов для создания производных изображений.
+    """
+
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=settings.IMAGE_DERIVATIVE_WORKERS, initializer=init_worker)
+
+    return _executor
+
+
+def _on_derivatives_done(future):
+    """
+    Сохраняет результат фоновой задачи. Вызывается в служебном потоке пула, поэтому после работы с базой данных
+    закрывает соединение этого потока.
+    """
+
+    from django.db import connection
+
+    try:
+        save_variants([future.result()])
+    except Exception:
+        logger.exception('Не удалось создать производные изображения, они будут созданы командой '
+                         'generate_image_derivatives')
+    finally:
+        connection.close()
+
+
+def schedule_missing_derivatives(image):
+    """
+    Ставит в очередь создание производных изображений после фиксации текущей транзакции, если они еще не созданы.
+
+    Параметры:
+        image (FieldFile): Загруженное изображение.
+    """
+
+    from django.db import transaction
+
+    if image and not get_image_variants(image.name):
+        source = image.name
+        transaction.on_commit(lambda: schedule_derivatives(source))
+
+
+def schedule_derivatives(source):
+    """
+    Ставит создание производных изображений в очередь пула процессов, не блокируя текущий запрос. Задача теряется при
+    перезапуске процесса до ее завершения (см. комментарий в начале модуля).
+
+    Параметры:
+        source (str): Имя исходного файла в хранилище.
+    """
+
+    get_executor().submit(generate_derivatives, source).add_done_callback(_on_derivatives_done)
@@ -0,0 +1,165 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from catalog.metrics import metrics_registry
+
+# Двухуровневый кэш: словарь LRU в памяти процесса (L1) перед общим кэшем Redis (L2). Обращение к L1 не требует
+# сетевого запроса и десериализации, поэтому горячие записи (снимок каталога, фрагменты карточек, фасеты) читаются
+# из Redis один раз на процесс, а не на каждый запрос.
+#
+# L1 не инвалидируется по событиям: в нем хранятся только записи под версионированными ключами, содержимое которых
+# под данным ключом не меняется (ключ включает поколение кэша каталога или версию содержимого). Поколение по-прежнему
+# читается из Redis на каждый запрос, поэтому после изменения каталога в любом процессе все процессы обращаются к
+# новым ключам, а записи старого поколения вытесняются из L1 по LRU или времени жизни.
+
+TIER_COUNTER = 'cache_tier_requests_total'
+
+
+class TwoTierCache:
+    """
+    Кэш в памяти процесса перед общим кэшем Django.
+
+    Чтение сначала выполняется из L1, при промахе - из L2, найденное в L2 значение сохраняется в L1. Запись выполняется
+    в оба уровня. Значения L1 не копируются, поэтому кэшируемые значения не должны изменяться после записи. Количество
+    попаданий и промахов каждого уровня учитывается в счетчике cache_tier_requests_total (см. catalog.metrics).
+
+    Атрибуты:
+        - name (str): Имя кэша, метка cache счетчика.
+        - max_entries (int): Максимальное количество записей L1; при превышении вытесняются давно не читавшиеся.
+        - timeout (float): Время жизни записи L1 в секундах.
+        - backend (BaseCache): Кэш L2, по умолчанию кэш default.
+
+    Методы:
+        - get(key): Возвращает значение по ключу или None.
+        - get_many(keys): Возвращает словарь найденных значений.
+        - set(key, value, timeout): Сохраняет значение в обоих уровнях.
+        - set_many(mapping, timeout): Сохраняет значения в обоих уровнях.
+        - aget(key), aget_many(keys), aset(key, value, timeout), aset_many(mapping, timeout): Асинхронные версии.
+        - clear_local(): Очищает L1.
+    """
+
+    def __init__(self, name, max_entries, timeout, backend=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.backend = cache if backend is None else backend
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_local(self, keys):
+        """
+        Возвращает словарь значений, найденных в L1, и удаляет записи с истекшим временем жизни.
+        """
+
+        now = time.monotonic()
+        found = {}
+
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+
+                if entry is None:
+                    continue
+
+                if entry[0] <= now:
+                    del self._entries[key]
+                    continue
+
+                self._entries.move_to_end(key)
+                found[key] = entry[1]
+
+        return found
+
+    def _set_local(self, mapping):
+        expires = time.monotonic() + self.timeout
+
+        with self._lock:
+            for key, value in mapping.items():
+                self._entries[key] = (expires, value)
+                self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _count(self, tier, hits, misses):
+        for result, value in (('hit', hits), ('miss', misses)):
+            if value:
+                labels = (('cache', self.name), ('tier', tier), ('result', result))
+                metrics_registry.increment(TIER_COUNTER, labels, value)
+
+    def _merge(self, keys, local, remote):
+        """
+        Сохраняет найденные в L2 значения в L1, учитывает обращения и возвращает значения обоих уровней.
+        """
+
+        if remote:
+            self._set_local(remote)
+
+        self._count('l1', len(local), len(keys) - len(local))
+
+        if len(keys) > len(local):
+            self._count('l2', len(remote), len(keys) - len(local) - len(remote))
+
+        return {**local, **remote}
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        local = self._get_local(keys)
+        missing = [key for key in keys if key not in local]
+
+        return self._merge(keys, local, self.backend.get_many(missing) if missing else {})
+
+    def set(self, key, value, timeout):
+        self.backend.set(key, value, timeout)
+        self._set_local({key: value})
+
+    def set_many(self, mapping, timeout):
+        self.backend.set_many(mapping, timeout)
+        self._set_local(mapping)
+
+    async def aget(self, key):
+        return (await self.aget_many([key])).get(key)
+
+    async def aget_many(self, keys):
+        local = self._get_local(keys)
+        missing = [key for key in keys if key not in local]
+
+        return self._merge(keys, local, await self.backend.aget_many(missing) if missing else {})
+
+    async def aset(self, key, value, timeout):
+        await self.backend.aset(key, value, timeout)
+        self._set_local({key: value})
+
+    async def aset_many(self, mapping, timeout):
+        await self.backend.aset_many(mapping, timeout)
+        self._set_local(mapping)
+
+    def clear_local(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _create_local_cache(name):
+    options = settings.LOCAL_CACHES[name]
+
+    return TwoTierCache(name, max_entries=options['MAX_ENTRIES'], timeout=options['TIMEOUT'])
+
+
+products_cache = _create_local_cache('products')
+cards_cache = _create_local_cache('cards')
+facets_cache = _create_local_cache('facets')
+
+
+def clear_local_caches():
+    """
+    Очищает L1 всех двухуровневых кэшей процесса.
+    """
+
+    for local_cache in (products_cache, cards_cache, facets_cache):
+        local_cache.clear_local()
@@ -0,0 +1,134 @@
+import json
+import platform
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment, setup_databases, \
+    teardown_databases, override_settings
+from django.utils import timezone
+
+from catalog.benchmark import ENDPOINTS, QUERY_BUDGETS, seed_dataset, measure_endpoint
+
+
+class Command(BaseCommand):
+    """
+    Команда для замера производительности всех маршрутов приложений catalog и users.
+
+    Команда создает тестовую базу данных (как при запуске тестов), заполняет ее набором данных заданного масштаба
+    (catalog.benchmark.seed_dataset) и выполняет GET-запросы к каждому маршруту через тестовый клиент. Для каждого
+    маршрута записываются перцентили задержки, количество запросов к базе данных при пустом и заполненном кэше и
+    количество операций кэша. Результаты сохраняются в файл JSON; с параметром --compare выводится сравнение с
+    результатами предыдущего запуска. Маршруты, превысившие бюджет запросов (catalog.benchmark.QUERY_BUDGETS),
+    отмечаются в выводе.
+
+    Кэш очищается перед замером каждого маршрута, поэтому по умолчанию используется кэш в памяти процесса. Чтобы
+    учитывать обращения к Redis, укажите отдельную базу Redis параметром --cache-location.
+
+    Методы:
+        - add_arguments(parser): Добавляет аргументы --scale, --repeat, --output, --compare и --cache-location.
+        - handle(*args, **options): Выполняет замеры, сохраняет и выводит результаты.
+        - run(scale, repeat): Заполняет базу данных и замеряет маршруты.
+        - report(results, previous): Выводит таблицу результатов.
+    """
+
+    help = 'Замеряет задержки, запросы к базе данных и операции кэша для всех маршрутов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1, help='Масштаб набора данных')
+        parser.add_argument('--repeat', type=int, default=20, help='Количество запросов к каждому маршруту')
+        parser.add_argument('--output', default='benchmark.json', help='Файл для сохранения результатов')
+        parser.add_argument('--compare', help='Файл результатов предыдущего запуска для сравнения')
+        parser.add_argument('--cache-location',
+                            help='Адрес отдельной базы Redis для замера, например redis://127.0.0.1:6379/15')
+
+    def handle(self, *args, **options):
+        if options['scale'] < 1 or options['repeat'] < 1:
+            raise CommandError('--scale и --repeat должны быть положительными')
+
+        previous = None
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                previous = json.load(file)['endpoints']
+
+        if options['cache_location']:
+            cache_config = {'BACKEND': 'catalog.cache.AsyncRedisCache', 'LOCATION': options['cache_location']}
+        else:
+            cache_config = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+
+        try:
+            with override_settings(CACHES={'default': cache_config}):
+                results = self.run(options['scale'], options['repeat'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        data = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'scale': options['scale'],
+                'repeat': options['repeat'],
+                'database': connection.vendor,
+                'cache': cache_config['BACKEND'],
+                'python': platform.python_version(),
+            },
+            'endpoints': results,
+        }
+
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False, indent=2)
+
+        self.report(results, previous)
+        self.stdout.write(f'Результаты сохранены в {options["output"]}')
+
+    def run(self, scale, repeat):
+        """
+        Заполняет базу данных набором данных и замеряет все маршруты.
+
+        Возвращает:
+            dict: Результаты замеров по именам маршрутов (см. catalog.benchmark.measure_endpoint()).
+        """
+
+        dataset = seed_dataset(scale)
+        anonymous = Client()
+        authenticated = Client()
+        authenticated.force_login(dataset.user)
+
+        return {
+            endpoint.name: measure_endpoint(authenticated if endpoint.login else anonymous, endpoint, dataset, repeat)
+            for endpoint in ENDPOINTS
+        }
+
+    def report(self, results, previous):
+        """
+        Выводит таблицу результатов и, если переданы результаты предыдущего запуска, изменение p50 и количества
+        запросов. Маршруты с превышением бюджета запросов или неожиданным кодом ответа выделяются.
+        """
+
+        self.stdout.write(f'{"Маршрут":<20} {"код":>4} {"p50 мс":>8} {"p99 мс":>8} {"запросы":>8} {"кэш":>6}')
+
+        expected_status_codes = {endpoint.name: endpoint.status_code for endpoint in ENDPOINTS}
+
+        for name, result in results.items():
+            queries = result['queries']
+            line = (
+                f'{name:<20} {result["status_code"]:>4} {result["latency_ms"]["p50"]:>8.2f} '
+                f'{result["latency_ms"]["p99"]:>8.2f} {queries["cold"]:>3}/{queries["warm"]:<4} '
+                f'{sum(result["cache_operations"].values()):>6.1f}'
+            )
+
+            if previous and name in previous:
+                before = previous[name]
+                line += (f'  p50 {result["latency_ms"]["p50"] - before["latency_ms"]["p50"]:+.2f} мс, '
+                         f'запросы {queries["max"] - before["queries"]["max"]:+d}')
+
+            if queries['max'] > QUERY_BUDGETS[name]:
+                self.stdout.write(self.style.ERROR(f'{line}  превышен бюджет {QUERY_BUDGETS[name]}'))
+            elif result['status_code'] != expected_status_codes[name]:
+                self.stdout.write(self.style.ERROR(f'{line}  ожидался код {expected_status_codes[name]}'))
+            else:
+                self.stdout.write(line)
@@ -0,0 +1,66 @@
+import pickle
+import time
+
+from django.core.management import BaseCommand
+
+from catalog.models import Product
+from catalog.services import build_catalog_snapshot, materialize_products, SNAPSHOT_FORMAT_VERSION
+
+
+class Command(BaseCommand):
+    """
+    Команда для сравнения компактного снимка каталога с кэшированием полных объектов Product через pickle.
+
+    Для каждого варианта измеряются размер сериализованных данных (столько байт хранится в Redis и передается по сети)
+    и время десериализации, которое каждый процесс тратит на каждом запросе списка продуктов. Для снимка дополнительно
+    учитывается преобразование в объекты строк одной страницы.
+
+    Методы:
+        - add_arguments(parser): Добавляет аргументы --repeat и --page-size.
+        - handle(*args, **options): Выполняет замеры и выводит результаты.
+    """
+
+    help = 'Сравнивает размер и время десериализации кэша каталога: pickle объектов Product против снимка'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Количество повторов каждого замера')
+        parser.add_argument('--page-size', type=int, default=10, help='Количество строк на странице списка')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        page_size = options['page_size']
+
+        products = list(Product.objects.all())
+        snapshot = build_catalog_snapshot()
+
+        legacy_payload = pickle.dumps(products, pickle.HIGHEST_PROTOCOL)
+        snapshot_payload = pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL)
+
+        legacy_time = self.measure(lambda: pickle.loads(legacy_payload), repeat)
+        snapshot_time = self.measure(
+            lambda: materialize_products(pickle.loads(snapshot_payload)[1][:page_size]), repeat
+        )
+
+        self.stdout.write(f'Продуктов: {len(products)}')
+        self.stdout.write(f'pickle Product: {len(legacy_payload)} байт, {legacy_time * 1000:.3f} мс на чтение')
+        self.stdout.write(f'Снимок v{SNAPSHOT_FORMAT_VERSION}: {len(snapshot_payload)} байт, '
+                          f'{snapshot_time * 1000:.3f} мс на чтение и страницу из {page_size} строк')
+
+        if snapshot_payload and snapshot_time:
+            self.stdout.write(self.style.SUCCESS(
+                f'Размер меньше в {len(legacy_payload) / len(snapshot_payload):.1f} раз, '
+                f'чтение быстрее в {legacy_time / snapshot_time:.1f} раз'
+            ))
+
+    @staticmethod
+    def measure(func, repeat):
+        """
+        Возвращает среднее время выполнения функции в секундах.
+        """
+
+        started = time.perf_counter()
+
+        for _ in range(repeat):
+            func()
+
+        return (time.perf_counter() - started) / repeat
@@ -0,0 +1,200 @@
+import asyncio
+import statistics
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+
+from asgiref.sync import ThreadSensitiveContext
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, AsyncClient
+from django.test.utils import override_settings
+from django.urls import URLResolver
+
+from catalog.models import Product
+from catalog.urls import get_urlpatterns
+
+
+class Command(BaseCommand):
+    """
+    Команда для сравнения пропускной способности и задержек синхронных (WSGI) и асинхронных (ASGI) представлений
+    чтения каталога и блога.
+
+    Запросы выполняются внутри процесса, без сетевого сервера, с одинаковым числом одновременных запросов
+    (--concurrency): в режиме WSGI - синхронным обработчиком в пуле потоков, как у WSGI-сервера с потоками, в режиме
+    ASGI - асинхронным обработчиком в одном цикле событий, как у одного процесса ASGI-сервера. Для каждого режима
+    маршруты приложения подменяются синхронными или асинхронными представлениями (catalog.urls.get_urlpatterns()),
+    база данных и кэш используются те же, что настроены в проекте. Перед замером выполняются прогревочные запросы.
+
+    Методы:
+        - add_arguments(parser): Добавляет аргументы --path, --requests, --concurrency, --warmup и --user.
+        - handle(*args, **options): Выполняет замеры и выводит результаты.
+        - get_paths(paths): Возвращает адреса для замера.
+        - build_urlconf(async_views): Строит корневой URLconf с выбранными представлениями приложения.
+        - run_wsgi(paths, total, concurrency): Выполняет запросы синхронным обработчиком.
+        - run_asgi(paths, total, concurrency): Выполняет запросы асинхронным обработчиком.
+    """
+
+    help = 'Сравнивает запросы в секунду и задержки синхронных (WSGI) и асинхронных (ASGI) представлений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Адрес для замера (можно указать несколько раз), по умолчанию - список продуктов, '
+                                 'карточка продукта и список статей блога')
+        parser.add_argument('--requests', type=int, default=1000, help='Количество запросов для каждого режима')
+        parser.add_argument('--concurrency', type=int, default=8, help='Количество одновременных запросов')
+        parser.add_argument('--warmup', type=int, default=50, help='Количество прогревочных запросов')
+        parser.add_argument('--user', help='Email пользователя, от имени которого выполняются запросы')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests и --concurrency должны быть положительными')
+
+        paths = self.get_paths(options['paths'])
+        self.cookies = None
+
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(email=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'Пользователь {options["user"]} не найден')
+
+            client = Client()
+            client.force_login(user)
+            self.cookies = {settings.SESSION_COOKIE_NAME: client.cookies[settings.SESSION_COOKIE_NAME].value}
+
+        self.stdout.write(f'Адреса: {", ".join(paths)}; запросов: {options["requests"]}, '
+                          f'одновременно: {options["concurrency"]}')
+
+        for mode, async_views, run in (('WSGI', False, self.run_wsgi), ('ASGI', True, self.run_asgi)):
+            with override_settings(ROOT_URLCONF=self.build_urlconf(async_views)):
+                if options['warmup']:
+                    run(paths, options['warmup'], options['concurrency'])
+
+                started = time.perf_counter()
+                results = run(paths, options['requests'], options['concurrency'])
+                elapsed = time.perf_counter() - started
+
+            latencies = sorted(latency for latency, status_code in results)
+            errors = sum(status_code != 200 for latency, status_code in results)
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+            self.stdout.write(
+                f'{mode}: {len(latencies) / elapsed:.1f} запросов/с, '
+                f'p50 {statistics.median(latencies) * 1000:.1f} мс, p99 {p99 * 1000:.1f} мс'
+            )
+
+            if errors:
+                self.stderr.write(f'{mode}: ответов с кодом, отличным от 200: {errors}')
+
+    @staticmethod
+    def get_paths(paths):
+        """
+        Возвращает адреса для замера: переданные в --path или адреса списка продуктов, карточки первого продукта и
+        списка статей блога.
+        """
+
+        if paths:
+            return paths
+
+        paths = ['/', '/blog/']
+        product_pk = Product.objects.order_by('pk').values_list('pk', flat=True).first()
+
+        if product_pk is not None:
+            paths.insert(1, f'/product/{product_pk}/')
+
+        return paths
+
+    @staticmethod
+    def build_urlconf(async_views):
+        """
+        Строит корневой URLconf проекта, в котором маршруты приложения catalog используют синхронные или асинхронные
+        представления.
+
+        Параметры:
+            async_views (bool): Использовать асинхронные представления.
+
+        Возвращает:
+            module: Модуль с атрибутом urlpatterns.
+        """
+
+        urlconf = types.ModuleType(f'bench_urls_{"async" if async_views else "sync"}')
+        urlconf.urlpatterns = [
+            URLResolver(pattern.pattern, get_urlpatterns(async_views), app_name=pattern.app_name,
+                        namespace=pattern.namespace)
+            if isinstance(pattern, URLResolver) and pattern.namespace == 'catalog' else pattern
+            for pattern in import_module(settings.ROOT_URLCONF).urlpatterns
+        ]
+
+        return urlconf
+
+    def run_wsgi(self, paths, total, concurrency):
+        """
+        Выполняет запросы синхронным обработчиком в пуле из concurrency потоков.
+
+        Возвращает:
+            list: Пары (задержка запроса в секундах, код ответа).
+        """
+
+        def worker(count):
+            client = Client()
+
+            if self.cookies:
+                client.cookies.load(self.cookies)
+
+            results = []
+
+            try:
+                for index in range(count):
+                    started = time.perf_counter()
+                    response = client.get(paths[index % len(paths)])
+                    results.append((time.perf_counter() - started, response.status_code))
+            finally:
+                connection.close()
+
+            return results
+
+        counts = [total // concurrency + (index < total % concurrency) for index in range(concurrency)]
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return [result for results in executor.map(worker, counts) for result in results]
+
+    def run_asgi(self, paths, total, concurrency):
+        """
+        Выполняет запросы асинхронным обработчиком: concurrency задач в одном цикле событий.
+
+        Каждый запрос выполняется в собственном ThreadSensitiveContext, как в django.core.handlers.asgi.ASGIHandler,
+        поэтому синхронный код разных запросов не выполняется в одном потоке.
+
+        Возвращает:
+            list: Пары (задержка запроса в секундах, код ответа).
+        """
+
+        async def worker(count):
+            client = AsyncClient()
+
+            if self.cookies:
+                client.cookies.load(self.cookies)
+
+            results = []
+
+            for index in range(count):
+                started = time.perf_counter()
+
+                async with ThreadSensitiveContext():
+                    response = await client.get(paths[index % len(paths)])
+
+                results.append((time.perf_counter() - started, response.status_code))
+
+            return results
+
+        async def main():
+            counts = [total // concurrency + (index < total % concurrency) for index in range(concurrency)]
+            results = await asyncio.gather(*(worker(count) for count in counts))
+
+            return [result for worker_results in results for result in worker_results]
+
+        return asyncio.run(main())
@@ -0,0 +1,96 @@
+import json
+import os
+import re
+
+from django.core.management import BaseCommand
+
+from catalog.models import ContactMessage
+
+
+class Command(BaseCommand):
+    """
+    Команда для выгрузки сообщений формы обратной связи в файлы формата JSON Lines.
+
+    Сообщения выгружаются в порядке поступления порциями по --chunk-size. Когда размер текущего файла превышает
+    --max-bytes, выгрузка продолжается в следующий файл (contact_messages-0001.jsonl, contact_messages-0002.jsonl и
+    т.д.). Нумерация продолжается после файлов, оставшихся от предыдущих запусков, существующие файлы не
+    перезаписываются. С параметром --delete выгруженные сообщения удаляются из базы данных, что позволяет ограничить
+    размер таблицы.
+
+    Выгружаются только сообщения, записанные в базу данных: буферы сообщений процессов сайта (catalog.contact_buffer)
+    команде недоступны и сбрасываются самими процессами.
+
+    Методы:
+        - add_arguments(parser): Добавляет аргументы команды.
+        - handle(*args, **options): Выполняет выгрузку.
+        - get_last_segment(output_dir, prefix): Возвращает номер последнего файла выгрузки в каталоге.
+    """
+
+    help = 'Выгружает сообщения формы обратной связи в файлы JSON Lines с ротацией по размеру'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default='.', help='Каталог для файлов выгрузки')
+        parser.add_argument('--prefix', default='contact_messages', help='Префикс имен файлов выгрузки')
+        parser.add_argument('--max-bytes', type=int, default=64 * 1024 * 1024, help='Максимальный размер одного файла')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Количество сообщений в одной порции')
+        parser.add_argument('--delete', action='store_true', help='Удалить выгруженные сообщения из базы данных')
+
+    def handle(self, *args, **options):
+        os.makedirs(options['output_dir'], exist_ok=True)
+
+        first_segment = segment = self.get_last_segment(options['output_dir'], options['prefix'])
+        file = None
+        exported = 0
+        last_pk = 0
+
+        try:
+            while True:
+                chunk = list(
+                    ContactMessage.objects.filter(pk__gt=last_pk).order_by('pk')[:options['chunk_size']]
+                )
+
+                if not chunk:
+                    break
+
+                for message in chunk:
+                    if file is None or file.tell() >= options['max_bytes']:
+                        if file is not None:
+                            file.close()
+
+                        segment += 1
+                        path = os.path.join(options['output_dir'], f"{options['prefix']}-{segment:04d}.jsonl")
+                        file = open(path, 'x', encoding='utf-8')
+
+                    record = {
+                        'id': message.pk,
+                        'name': message.name,
+                        'phone': message.phone,
+                        'message': message.message,
+                        'created_at': message.created_at.isoformat(),
+                    }
+                    file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+                file.flush()
+                os.fsync(file.fileno())
+
+                last_pk = chunk[-1].pk
+                exported += len(chunk)
+
+                if options['delete']:
+                    ContactMessage.objects.filter(pk__in=[message.pk for message in chunk]).delete()
+        finally:
+            if file is not None:
+                file.close()
+
+        self.stdout.write(self.style.SUCCESS(f'Выгружено сообщений: {exported}, файлов: {segment - first_segment}'))
+
+    @staticmethod
+    def get_last_segment(output_dir, prefix):
+        """
+        Возвращает наибольший номер файла выгрузки с префиксом prefix в каталоге output_dir или 0, если файлов нет.
+        """
+
+        pattern = re.compile(rf'{re.escape(prefix)}-([0-9]+)\.jsonl')
+        numbers = [int(match[1]) for match in map(pattern.fullmatch, os.listdir(output_dir)) if match]
+
+        return max(numbers, default=0)
@@ -0,0 +1,55 @@
+import sys
+
+from django.core.management import BaseCommand, CommandError
+
+from catalog.feeds import FEED_CONTENT_TYPES, FEED_CHUNK_SIZE, parse_since, render_feed, encode_feed
+
+
+class Command(BaseCommand):
+    """
+    Команда для потоковой выгрузки каталога продуктов в файл формата CSV, JSON Lines или YML.
+
+    Выгрузка формируется построчно, как и в представлении ProductFeedView, поэтому объем памяти не зависит от размера
+    каталога. С параметром --gzip файл сжимается на лету, с параметром --since выгружаются только продукты,
+    измененные начиная с указанного момента.
+
+    Методы:
+        - add_arguments(parser): Добавляет аргументы команды.
+        - handle(*args, **options): Выполняет выгрузку.
+    """
+
+    help = 'Выгружает каталог продуктов в файл CSV, JSON Lines или YML'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(FEED_CONTENT_TYPES), default='yml', help='Формат выгрузки')
+        parser.add_argument('--output', default='-', help='Путь к файлу выгрузки ("-" - стандартный вывод)')
+        parser.add_argument('--base-url', required=True, help='Адрес сайта для ссылок на продукты и изображения')
+        parser.add_argument('--since', help='Выгрузить продукты, измененные начиная с указанной даты (ISO 8601)')
+        parser.add_argument('--gzip', action='store_true', help='Сжать выгрузку в формат gzip')
+        parser.add_argument('--chunk-size', type=int, default=FEED_CHUNK_SIZE,
+                            help='Количество строк, читаемых из базы данных за один раз')
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_since(options['since']) if options['since'] else None
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        chunks = encode_feed(
+            render_feed(options['format'], options['base_url'].rstrip('/'), since, options['chunk_size']),
+            options['gzip'],
+        )
+
+        output = sys.stdout.buffer if options['output'] == '-' else open(options['output'], 'wb')
+        written = 0
+
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+
+        if options['output'] != '-':
+            self.stdout.write(self.style.SUCCESS(f'Выгрузка записана в {options["output"]}: {written} байт'))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management import BaseCommand
+
+from catalog.services import flush_blog_views
+
+
+class Command(BaseCommand):
+    """
+    Команда для переноса накопленных в кэше просмотров статей блога в базу данных.
+
+    Предназначена для периодического запуска (cron) или работы в фоне с параметром --interval.
+
+    Методы:
+        - add_arguments(parser): Добавляет аргументы --chunk-size и --interval.
+        - handle(*args, **options): Переносит просмотры однократно или в цикле с заданным интервалом.
+    """
+
+    help = 'Переносит накопленные в кэше просмотры статей в базу данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Количество статей в одной порции')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Интервал повторного запуска в секундах (0 - однократный запуск)')
+
+    def handle(self, *args, **options):
+        while True:
+            flushed = flush_blog_views(chunk_size=options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(f'Перенесено просмотров: {flushed}'))
+
+            if not options['interval']:
+                break
+
+            time.sleep(options['interval'])
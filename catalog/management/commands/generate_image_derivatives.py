@@ -0,0 +1,88 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+
+from catalog.images import generate_derivatives, save_variants, init_worker
+from catalog.models import Product, Blog, ImageDerivative
+
+
+class Command(BaseCommand):
+    """
+    Команда для создания уменьшенных копий уже загруженных изображений продуктов, статей блога и аватаров.
+
+    Изображения обрабатываются параллельно в пуле процессов (--workers), результаты сохраняются в базу данных
+    порциями. По умолчанию обрабатываются только изображения, для которых копии еще не созданы; с параметром --force
+    копии создаются для всех изображений (например, после изменения IMAGE_DERIVATIVE_WIDTHS).
+
+    Команда - механизм повторной попытки для фонового создания копий (catalog.images.schedule_derivatives()): задачи
+    пула процессов веб-сервера теряются при его перезапуске, а изображения без созданных копий обрабатываются
+    следующим запуском команды. Поэтому ее следует запускать после каждого развертывания и периодически.
+
+    Методы:
+        - add_arguments(parser): Добавляет аргументы --workers, --chunk-size и --force.
+        - handle(*args, **options): Создает копии изображений и выводит статистику.
+        - get_sources(force): Возвращает имена изображений для обработки.
+    """
+
+    help = 'Создает уменьшенные копии загруженных изображений (WebP и JPEG в нескольких ширинах)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.IMAGE_DERIVATIVE_WORKERS,
+                            help='Количество процессов обработки изображений')
+        parser.add_argument('--chunk-size', type=int, default=100,
+                            help='Количество результатов, сохраняемых в базу данных за один раз')
+        parser.add_argument('--force', action='store_true', help='Обработать изображения, для которых копии уже есть')
+
+    def handle(self, *args, **options):
+        sources = self.get_sources(options['force'])
+        self.stdout.write(f'Изображений для обработки: {len(sources)}')
+
+        processed = failed = 0
+        results = []
+
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as executor:
+            futures = {executor.submit(generate_derivatives, source): source for source in sources}
+
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'{futures[future]}: {error}')
+                    continue
+
+                processed += 1
+
+                if len(results) >= options['chunk_size']:
+                    save_variants(results)
+                    results = []
+                    self.stdout.write(f'Обработано: {processed}')
+
+        save_variants(results)
+
+        self.stdout.write(self.style.SUCCESS(f'Готово: обработано {processed}, ошибок {failed}'))
+
+    @staticmethod
+    def get_sources(force):
+        """
+        Возвращает имена изображений продуктов, статей блога и аватаров без повторов.
+
+        Параметры:
+            - force (bool): Включать ли изображения, для которых копии уже созданы.
+
+        Возвращает:
+            - list: Имена файлов в хранилище.
+        """
+
+        sources = set()
+
+        for model, field in ((Product, 'preview'), (Blog, 'preview'), (get_user_model(), 'avatar')):
+            sources.update(model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                           .values_list(field, flat=True).distinct().iterator())
+
+        if not force:
+            sources.difference_update(ImageDerivative.objects.values_list('source', flat=True).iterator())
+
+        return sorted(sources)
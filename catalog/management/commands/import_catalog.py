@@ -0,0 +1,298 @@
+import csv
+import io
+import json
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from catalog.models import Category, Product
+from catalog.page_cache import purge_page_cache
+from catalog.search import index_products
+from catalog.services import invalidate_products_cache, recompute_category_stats, PRODUCT_PAGE_CACHE
+
+IMPORT_FIELDS = ('name', 'description', 'category_id', 'price')
+
+PRICE_QUANTUM = Decimal('0.01')
+
+# Размер пакета bulk_update: запрос с выражением CASE на каждое поле растет вместе с пакетом, поэтому обновление
+# выполняется пакетами меньше порции.
+BULK_UPDATE_BATCH_SIZE = 200
+
+
+class Command(BaseCommand):
+    """
+    Команда для потокового импорта каталога продуктов из файла CSV или JSON Lines.
+
+    Каждая строка входного файла содержит поля sku, name, description, category и price. Файл читается построчно и
+    обрабатывается порциями по --chunk-size строк, поэтому объем памяти не зависит от размера файла. Категории
+    сопоставляются по наименованию через словарь, загруженный один раз перед импортом; отсутствующие категории
+    создаются. Продукты сопоставляются по артикулу (sku): существующие обновляются, новые создаются, поэтому повторный
+    импорт того же файла не создает дубликатов. Флаг публикации существующих продуктов при импорте не меняется.
+
+    На PostgreSQL порция загружается командой COPY во временную таблицу и переносится в таблицу продуктов одним
+    запросом INSERT ... ON CONFLICT. На остальных базах данных используются bulk_create и bulk_update.
+
+    Массовые операции не вызывают сигналы моделей, поэтому после импорта команда сама инвалидирует кэш списка
+    продуктов и страниц импортированных продуктов, пересчитывает статистику категорий и обновляет поисковый индекс
+    для импортированных продуктов. Кэш страниц и поисковый индекс обновляются порциями по --chunk-size продуктов,
+    количество запросов на порцию не зависит от ее размера (catalog.search.index_products()).
+
+    Методы:
+        - add_arguments(parser): Добавляет аргументы команды.
+        - handle(*args, **options): Выполняет импорт и выводит статистику.
+        - read_rows(path, file_format, delimiter): Построчно читает входной файл.
+        - prepare_chunk(chunk, categories): Проверяет строки порции и сопоставляет категории.
+        - import_bulk(rows, owner, publish): Сохраняет порцию через bulk_create и bulk_update.
+        - import_copy(rows, owner, publish): Сохраняет порцию через COPY и INSERT ... ON CONFLICT.
+    """
+
+    help = 'Импортирует каталог продуктов из файла CSV или JSON Lines с обновлением по артикулу'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу импорта ("-" - стандартный ввод)')
+        parser.add_argument('--format', choices=('csv', 'jsonl'),
+                            help='Формат файла (по умолчанию определяется по расширению)')
+        parser.add_argument('--delimiter', default=',', help='Разделитель полей CSV')
+        parser.add_argument('--owner', required=True, help='E-mail владельца создаваемых продуктов')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Количество строк в одной порции')
+        parser.add_argument('--publish', action='store_true', help='Публиковать создаваемые продукты')
+        parser.add_argument('--no-copy', action='store_true', help='Не использовать COPY на PostgreSQL')
+        parser.add_argument('--no-index', action='store_true', help='Не обновлять поисковый индекс после импорта')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        try:
+            owner = get_user_model().objects.get(email=options['owner'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'Пользователь {options["owner"]} не найден')
+
+        use_copy = connection.vendor == 'postgresql' and not options['no_copy']
+        import_chunk = self.import_copy if use_copy else self.import_bulk
+        categories = dict(Category.objects.values_list('name', 'id'))
+
+        rows = self.read_rows(path, file_format, options['delimiter'])
+        processed = created = updated = 0
+        imported_ids = []
+        started = time.perf_counter()
+
+        while True:
+            chunk = list(islice(rows, options['chunk_size']))
+
+            if not chunk:
+                break
+
+            prepared = self.prepare_chunk(chunk, categories)
+
+            with transaction.atomic():
+                ids, chunk_created = import_chunk(prepared, owner, options['publish'])
+
+            imported_ids.extend(ids)
+            processed += len(chunk)
+            created += chunk_created
+            updated += len(ids) - chunk_created
+
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'Обработано строк: {processed} ({processed / elapsed:.0f} строк/с)')
+
+        elapsed = time.perf_counter() - started
+
+        if imported_ids:
+            invalidate_products_cache()
+
+            for start in range(0, len(imported_ids), options['chunk_size']):
+                purge_page_cache(PRODUCT_PAGE_CACHE, imported_ids[start:start + options['chunk_size']])
+
+            recompute_category_stats()
+
+            if not options['no_index']:
+                self.stdout.write('Обновление поискового индекса...')
+
+                for start in range(0, len(imported_ids), options['chunk_size']):
+                    index_products(imported_ids[start:start + options['chunk_size']])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт завершен ({"COPY" if use_copy else "bulk"}): строк {processed}, создано {created}, '
+            f'обновлено {updated}, пропущено {processed - len(imported_ids)}, '
+            f'{elapsed:.1f} с, {processed / elapsed if elapsed else 0:.0f} строк/с'
+        ))
+
+    def read_rows(self, path, file_format, delimiter):
+        """
+        Построчно читает входной файл.
+
+        Параметры:
+            - path (str): Путь к файлу или "-" для стандартного ввода.
+            - file_format (str): Формат файла: csv или jsonl.
+            - delimiter (str): Разделитель полей CSV.
+
+        Возвращает:
+            - generator: Пары (номер строки, словарь полей).
+        """
+
+        file = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+
+        try:
+            if file_format == 'csv':
+                for line_number, row in enumerate(csv.DictReader(file, delimiter=delimiter), start=2):
+                    yield line_number, row
+            else:
+                for line_number, line in enumerate(file, start=1):
+                    if not line.strip():
+                        continue
+
+                    try:
+                        yield line_number, json.loads(line)
+                    except ValueError as error:
+                        yield line_number, {'error': f'некорректный JSON: {error}'}
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+    def prepare_chunk(self, chunk, categories):
+        """
+        Проверяет строки порции, приводит значения полей к типам модели и сопоставляет категории по наименованию.
+
+        Некорректные строки пропускаются с сообщением в stderr. Отсутствующие категории создаются одним запросом и
+        добавляются в словарь categories. Если артикул встречается в порции несколько раз, используется последняя
+        строка.
+
+        Параметры:
+            - chunk (list): Пары (номер строки, словарь полей).
+            - categories (dict): Словарь наименование категории -> id, дополняется созданными категориями.
+
+        Возвращает:
+            - dict: Словарь артикул -> словарь значений полей IMPORT_FIELDS.
+        """
+
+        rows = {}
+        max_sku_length = Product._meta.get_field('sku').max_length
+        max_name_length = Product._meta.get_field('name').max_length
+
+        for line_number, row in chunk:
+            sku = str(row.get('sku') or '').strip()
+            name = str(row.get('name') or '').strip()
+            category = str(row.get('category') or '').strip()
+            error = row.get('error')
+
+            if not error and not (sku and name and category):
+                error = 'не заполнены обязательные поля sku, name, category'
+            elif not error and len(sku) > max_sku_length:
+                error = f'артикул длиннее {max_sku_length} символов'
+
+            if not error:
+                try:
+                    price = Decimal(str(row.get('price', '')).replace(',', '.')).quantize(PRICE_QUANTUM)
+                except InvalidOperation:
+                    error = f'некорректная цена "{row.get("price")}"'
+                else:
+                    if not price.is_finite() or price < 0 or price.adjusted() >= 8:
+                        error = f'некорректная цена "{row.get("price")}"'
+
+            if error:
+                self.stderr.write(f'Строка {line_number} пропущена: {error}')
+                continue
+
+            rows[sku] = {
+                'name': name[:max_name_length],
+                'description': str(row.get('description') or '') or None,
+                'category': category,
+                'price': price,
+            }
+
+        missing = {row['category'] for row in rows.values()} - categories.keys()
+
+        if missing:
+            new_categories = Category.objects.bulk_create([Category(name=name) for name in sorted(missing)])
+            categories.update((category.name, category.pk) for category in new_categories)
+            self.stdout.write(f'Создано категорий: {len(new_categories)}')
+
+        for row in rows.values():
+            row['category_id'] = categories[row.pop('category')]
+
+        return rows
+
+    @staticmethod
+    def import_bulk(rows, owner, publish):
+        """
+        Сохраняет порцию через bulk_create (новые продукты) и bulk_update (существующие продукты).
+
+        Параметры:
+            - rows (dict): Словарь артикул -> значения полей.
+            - owner (User): Владелец создаваемых продуктов.
+            - publish (bool): Флаг публикации создаваемых продуктов.
+
+        Возвращает:
+            - tuple: Список id сохраненных продуктов и количество созданных продуктов.
+        """
+
+        existing = dict(Product.objects.filter(sku__in=rows.keys()).values_list('sku', 'id'))
+        now = timezone.now()
+
+        to_create = [
+            Product(sku=sku, owner=owner, is_published=publish, **values)
+            for sku, values in rows.items() if sku not in existing
+        ]
+        to_update = [
+            Product(pk=existing[sku], sku=sku, updated_at=now, **values)
+            for sku, values in rows.items() if sku in existing
+        ]
+
+        Product.objects.bulk_create(to_create)
+        Product.objects.bulk_update(to_update, IMPORT_FIELDS + ('updated_at',), batch_size=BULK_UPDATE_BATCH_SIZE)
+
+        return [product.pk for product in to_create + to_update], len(to_create)
+
+    @staticmethod
+    def import_copy(rows, owner, publish):
+        """
+        Сохраняет порцию на PostgreSQL: строки загружаются командой COPY во временную таблицу, после чего переносятся в
+        таблицу продуктов запросом INSERT ... ON CONFLICT (sku) DO UPDATE.
+
+        Параметры:
+            - rows (dict): Словарь артикул -> значения полей.
+            - owner (User): Владелец создаваемых продуктов.
+            - publish (bool): Флаг публикации создаваемых продуктов.
+
+        Возвращает:
+            - tuple: Список id сохраненных продуктов и количество созданных продуктов.
+        """
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        for sku, values in rows.items():
+            writer.writerow([sku, values['name'], values['description'], values['category_id'], values['price']])
+
+        buffer.seek(0)
+        table = Product._meta.db_table
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE catalog_product_import ('
+                'sku varchar(64), name varchar(100), description text, category_id bigint, price numeric(10, 2)'
+                ') ON COMMIT DROP'
+            )
+            cursor.copy_expert(
+                'COPY catalog_product_import (sku, name, description, category_id, price) FROM STDIN WITH (FORMAT csv)',
+                buffer,
+            )
+            cursor.execute(
+                f'INSERT INTO {table} '
+                f'(sku, name, description, category_id, price, owner_id, is_published, created_at, updated_at) '
+                f'SELECT sku, name, description, category_id, price, %s, %s, now(), now() FROM catalog_product_import '
+                f'ON CONFLICT (sku) DO UPDATE SET name = EXCLUDED.name, description = EXCLUDED.description, '
+                f'category_id = EXCLUDED.category_id, price = EXCLUDED.price, updated_at = EXCLUDED.updated_at '
+                f'RETURNING id, xmax = 0',
+                [owner.pk, publish],
+            )
+            results = cursor.fetchall()
+
+        return [pk for pk, inserted in results], sum(1 for pk, inserted in results if inserted)
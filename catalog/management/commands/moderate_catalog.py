@@ -0,0 +1,112 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from catalog.models import Product, Blog, SearchEntry
+from catalog.moderation import get_matcher, find_forbidden_words
+from catalog.services import invalidate_products_cache, recompute_category_stats
+
+
+class Command(BaseCommand):
+    """
+    Команда для повторной проверки существующих продуктов и статей блога на наличие запрещенных слов.
+
+    Запускается после изменения списка запрещенных слов. Объекты читаются порциями по первичному ключу (только
+    проверяемые поля), регулярное выражение строится один раз на весь проход. С параметром --unpublish опубликованные
+    объекты с запрещенными словами снимаются с публикации и удаляются из поискового индекса.
+
+    Методы:
+        - add_arguments(parser): Добавляет аргументы --chunk-size и --unpublish.
+        - handle(*args, **options): Выполняет проверку и выводит найденные нарушения.
+        - scan(model, fields, label, chunk_size): Проверяет объекты одной модели.
+        - unpublish(model, pks, kind): Снимает объекты с публикации и удаляет их из поискового индекса.
+    """
+
+    help = 'Проверяет продукты и статьи блога на наличие запрещенных слов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Количество объектов в одной порции')
+        parser.add_argument('--unpublish', action='store_true',
+                            help='Снять с публикации объекты, содержащие запрещенные слова')
+
+    def handle(self, *args, **options):
+        self.matcher = get_matcher()
+
+        if self.matcher is None:
+            self.stdout.write('Список запрещенных слов пуст')
+            return
+
+        products = self.scan(Product, ('name', 'description'), 'Продукт', options['chunk_size'])
+        blogs = self.scan(Blog, ('title', 'content'), 'Статья', options['chunk_size'])
+
+        if options['unpublish']:
+            unpublished = self.unpublish(Product, products, SearchEntry.KIND_PRODUCT)
+            unpublished += self.unpublish(Blog, blogs, SearchEntry.KIND_BLOG)
+
+            if products:
+                invalidate_products_cache()
+                recompute_category_stats(
+                    Product.objects.filter(pk__in=products).values_list('category_id', flat=True).distinct()
+                )
+
+            self.stdout.write(f'Снято с публикации: {unpublished}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверка завершена: продуктов с нарушениями {len(products)}, статей с нарушениями {len(blogs)}'
+        ))
+
+    def scan(self, model, fields, label, chunk_size):
+        """
+        Проверяет объекты модели порциями и выводит найденные нарушения.
+
+        Параметры:
+            - model (Model): Проверяемая модель.
+            - fields (tuple): Проверяемые текстовые поля.
+            - label (str): Название объекта для вывода.
+            - chunk_size (int): Количество объектов в одной порции.
+
+        Возвращает:
+            - list: Идентификаторы объектов, содержащих запрещенные слова.
+        """
+
+        violations = []
+        last_pk = 0
+
+        while True:
+            chunk = list(model.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', *fields)[:chunk_size])
+
+            if not chunk:
+                break
+
+            for pk, *values in chunk:
+                found = find_forbidden_words('\n'.join(value or '' for value in values), self.matcher)
+
+                if found:
+                    violations.append(pk)
+                    self.stdout.write(f'{label} #{pk}: {", ".join(found)}')
+
+            last_pk = chunk[-1][0]
+
+        return violations
+
+    def unpublish(self, model, pks, kind):
+        """
+        Снимает с публикации опубликованные объекты и удаляет их из поискового индекса.
+
+        Возвращает:
+            - int: Количество снятых с публикации объектов.
+        """
+
+        unpublished = 0
+        fields = {'is_published': False}
+
+        if model is Product:
+            fields['updated_at'] = timezone.now()
+
+        with transaction.atomic():
+            for start in range(0, len(pks), 1000):
+                chunk = pks[start:start + 1000]
+                unpublished += model.objects.filter(pk__in=chunk, is_published=True).update(**fields)
+                SearchEntry.objects.filter(kind=kind, object_id__in=chunk).delete()
+
+        return unpublished
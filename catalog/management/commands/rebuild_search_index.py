@@ -0,0 +1,27 @@
+from django.core.management import BaseCommand
+
+from catalog.search import rebuild_index
+
+
+class Command(BaseCommand):
+    """
+    Команда для полной перестройки поискового индекса по опубликованным продуктам и статьям блога.
+
+    В обычном режиме индекс обновляется автоматически при сохранении объектов; команда нужна после массовых операций,
+    минующих сигналы моделей. Индекс перестраивается на месте, без предварительной очистки, поэтому поиск продолжает
+    работать во время выполнения команды.
+
+    Методы:
+        - add_arguments(parser): Добавляет аргумент --chunk-size.
+        - handle(*args, **options): Перестраивает индекс.
+    """
+
+    help = 'Перестраивает поисковый индекс продуктов и статей блога'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Количество объектов в одной порции')
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index(chunk_size=options['chunk_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано объектов: {indexed}'))
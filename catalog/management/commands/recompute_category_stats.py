@@ -0,0 +1,73 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from catalog.models import Category
+from catalog.services import category_stats_expressions
+
+STATS_FIELDS = ('product_count', 'published_count', 'min_price', 'max_price')
+
+
+class Command(BaseCommand):
+    """
+    Команда для пересчета статистики категорий (количество продуктов, количество опубликованных продуктов и диапазон
+    цен) по таблице продуктов.
+
+    Статистика обновляется при сохранении и удалении продуктов; команда исправляет расхождения, например после
+    изменений продуктов запросами update() или bulk_update(), минующими сигналы. Категории обрабатываются порциями
+    по первичному ключу: фактические значения каждой порции вычисляются одним запросом с коррелированными
+    подзапросами, а расходящиеся категории обновляются одним запросом bulk_update.
+
+    Методы:
+        - add_arguments(parser): Добавляет аргументы --chunk-size и --dry-run.
+        - handle(*args, **options): Пересчитывает статистику и выводит расхождения.
+    """
+
+    help = 'Пересчитывает статистику категорий по таблице продуктов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Количество категорий в одной порции')
+        parser.add_argument('--dry-run', action='store_true', help='Только вывести расхождения, не исправляя их')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть положительным')
+
+        expressions = {f'actual_{field}': expression for field, expression in category_stats_expressions().items()}
+        checked = drifted = 0
+        last_pk = 0
+
+        while True:
+            with transaction.atomic():
+                chunk = list(
+                    Category.objects.select_for_update().filter(pk__gt=last_pk).order_by('pk')
+                    .only('pk', 'name', *STATS_FIELDS).annotate(**expressions)[:options['chunk_size']]
+                )
+
+                if not chunk:
+                    break
+
+                changed = []
+
+                for category in chunk:
+                    differences = [
+                        f'{field} {getattr(category, field)} -> {getattr(category, f"actual_{field}")}'
+                        for field in STATS_FIELDS if getattr(category, field) != getattr(category, f'actual_{field}')
+                    ]
+
+                    if differences:
+                        self.stdout.write(f'Категория #{category.pk} "{category.name}": {", ".join(differences)}')
+
+                        for field in STATS_FIELDS:
+                            setattr(category, field, getattr(category, f'actual_{field}'))
+
+                        changed.append(category)
+
+                if changed and not options['dry_run']:
+                    Category.objects.bulk_update(changed, STATS_FIELDS)
+
+            checked += len(chunk)
+            drifted += len(changed)
+            last_pk = chunk[-1].pk
+
+        action = 'найдено расхождений' if options['dry_run'] else 'исправлено'
+        self.stdout.write(self.style.SUCCESS(f'Проверено категорий: {checked}, {action}: {drifted}'))
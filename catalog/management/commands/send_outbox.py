@@ -0,0 +1,180 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from catalog.metrics import OUTBOX_SMTP_HISTOGRAM, metrics_registry
+from catalog.models import OutboxEmail
+
+
+class Command(BaseCommand):
+    """
+    Команда для отправки писем из очереди исходящих писем.
+
+    Письма выбираются порциями, строки порции блокируются (select_for_update с skip_locked), поэтому несколько
+    экземпляров команды могут работать параллельно. Вся порция отправляется через одно SMTP-соединение. При ошибке
+    попытка повторяется с экспоненциально растущей задержкой, после исчерпания попыток письмо помечается как
+    недоставленное.
+
+    Текст письма может содержать секретные данные (например, новый пароль), поэтому после отправки или исчерпания
+    попыток он стирается, а записи отправленных и недоставленных писем старше --retention секунд удаляются.
+
+    Время открытия SMTP-соединения и отправки каждого письма учитывается в гистограмме OUTBOX_SMTP_HISTOGRAM
+    (catalog.metrics) с метками operation (open, send) и result (ok, error). Показатели процесса команды публикуются
+    в кэш после каждой порции, поэтому они доступны представлению /metrics и при однократном запуске.
+
+    Методы:
+        - add_arguments(parser): Добавляет аргументы --batch-size, --max-attempts, --backoff, --interval и --retention.
+        - handle(*args, **options): Отправляет письма однократно или в цикле с заданным интервалом.
+        - send_batch(batch_size, max_attempts, backoff): Отправляет одну порцию писем.
+        - smtp_call(operation, func, *args): Выполняет операцию SMTP и учитывает ее время.
+        - purge(retention): Удаляет старые записи отправленных и недоставленных писем.
+    """
+
+    help = 'Отправляет письма из очереди исходящих писем'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Количество писем в одной порции')
+        parser.add_argument('--max-attempts', type=int, default=5, help='Максимальное количество попыток отправки')
+        parser.add_argument('--backoff', type=int, default=60,
+                            help='Задержка перед повторной попыткой в секундах, удваивается с каждой попыткой')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Интервал повторного запуска в секундах (0 - отправить все письма и завершиться)')
+        parser.add_argument('--retention', type=int, default=settings.OUTBOX_RETENTION,
+                            help='Время хранения отправленных и недоставленных писем в секундах')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = self.send_batch(options['batch_size'], options['max_attempts'], options['backoff'])
+
+            if sent or failed:
+                metrics_registry.publish()
+                self.stdout.write(f'Отправлено: {sent}, ошибок: {failed}')
+
+            if not sent and not failed:
+                purged = self.purge(options['retention'])
+
+                if purged:
+                    self.stdout.write(f'Удалено старых писем: {purged}')
+
+                if not options['interval']:
+                    break
+
+                time.sleep(options['interval'])
+
+    def send_batch(self, batch_size, max_attempts, backoff):
+        """
+        Отправляет одну порцию писем, готовых к отправке.
+
+        Параметры:
+            - batch_size (int): Количество писем в порции.
+            - max_attempts (int): Максимальное количество попыток отправки.
+            - backoff (int): Базовая задержка перед повторной попыткой в секундах.
+
+        Возвращает:
+            - tuple: Количество отправленных писем и количество ошибок отправки.
+        """
+
+        sent = failed = 0
+        now = timezone.now()
+
+        with transaction.atomic():
+            batch = list(
+                OutboxEmail.objects.select_for_update(skip_locked=True)
+                .filter(status=OutboxEmail.STATUS_PENDING, next_attempt_at__lte=now)
+                .order_by('next_attempt_at', 'pk')[:batch_size]
+            )
+
+            if not batch:
+                return sent, failed
+
+            connection = get_connection()
+
+            try:
+                self.smtp_call('open', connection.open)
+            except Exception as error:
+                for email in batch:
+                    self.register_failure(email, error, max_attempts, backoff, now)
+
+                OutboxEmail.objects.bulk_update(batch, ['status', 'message', 'attempts', 'next_attempt_at',
+                                                        'last_error'])
+
+                return sent, len(batch)
+
+            try:
+                for email in batch:
+                    message = EmailMessage(email.subject, email.message, email.from_email, email.recipients,
+                                           connection=connection)
+
+                    try:
+                        self.smtp_call('send', connection.send_messages, [message])
+                    except Exception as error:
+                        self.register_failure(email, error, max_attempts, backoff, now)
+                        failed += 1
+                    else:
+                        email.status = OutboxEmail.STATUS_SENT
+                        email.message = ''
+                        email.attempts += 1
+                        email.sent_at = timezone.now()
+                        sent += 1
+            finally:
+                connection.close()
+
+            OutboxEmail.objects.bulk_update(batch, ['status', 'message', 'attempts', 'next_attempt_at', 'last_error',
+                                                    'sent_at'])
+
+        return sent, failed
+
+    @staticmethod
+    def smtp_call(operation, func, *args):
+        """
+        Выполняет операцию SMTP и учитывает ее время в гистограмме OUTBOX_SMTP_HISTOGRAM.
+        """
+
+        result = 'error'
+        started = time.perf_counter()
+
+        try:
+            value = func(*args)
+            result = 'ok'
+        finally:
+            metrics_registry.observe_duration(
+                OUTBOX_SMTP_HISTOGRAM, (('operation', operation), ('result', result)), time.perf_counter() - started,
+            )
+
+        return value
+
+    @staticmethod
+    def register_failure(email, error, max_attempts, backoff, now):
+        """
+        Учитывает неудачную попытку отправки письма и назначает время следующей попытки.
+        """
+
+        email.attempts += 1
+        email.last_error = str(error)
+
+        if email.attempts >= max_attempts:
+            email.status = OutboxEmail.STATUS_DEAD
+            email.message = ''
+        else:
+            email.next_attempt_at = now + timedelta(seconds=backoff * 2 ** (email.attempts - 1))
+
+    @staticmethod
+    def purge(retention):
+        """
+        Удаляет записи отправленных и недоставленных писем, поставленных в очередь раньше чем retention секунд назад.
+
+        Возвращает:
+            - int: Количество удаленных записей.
+        """
+
+        deleted, _ = OutboxEmail.objects.filter(
+            status__in=(OutboxEmail.STATUS_SENT, OutboxEmail.STATUS_DEAD),
+            created_at__lt=timezone.now() - timedelta(seconds=retention),
+        ).delete()
+
+        return deleted
@@ -0,0 +1,238 @@
+import math
+import queue
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from catalog.models import Blog
+from catalog.services import get_cached_products, render_product_cards
+from catalog.views import BlogListView, ProductListView
+from config.settings import env
+
+# Интервал вывода хода прогрева в секундах.
+PROGRESS_INTERVAL = 5
+
+# Количество фрагментов карточек продуктов, записываемых в кэш одним запросом set_many.
+CARDS_CHUNK_SIZE = 500
+
+
+class RateLimiter:
+    """
+    Ограничивает частоту запросов из нескольких потоков: каждый вызов wait() получает следующий интервал длиной
+    1 / rate секунд и ждет его начала.
+
+    Атрибуты:
+        - interval (float): Минимальный интервал между запросами в секундах (0 - без ограничения).
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + self.interval
+
+        time.sleep(start - now)
+
+
+class Command(BaseCommand):
+    """
+    Команда для прогрева кэша после развертывания, очистки Redis, импорта каталога или initial_fill.
+
+    Снимок каталога вместе с фасетами без фильтров и фрагменты карточек всех продуктов снимка (с текущей версией и
+    описанием уменьшенных копий изображения) строятся напрямую (catalog.services), после чего выполняются
+    запросы к первым --pages страницам списка продуктов. Запросы выполняются внутри процесса тестовым клиентом через
+    все middleware, поэтому в общий кэш попадают ответы, кэшируемые CachePolicyMiddleware. Запросы выполняются с хостом
+    и схемой из --base-url.
+
+    Страницы продуктов не прогреваются: общая для всех пользователей часть страницы (catalog.page_cache) строится при
+    первом просмотре продукта любым пользователем, а прогрев всех страниц каталога стоил бы столько же, сколько его
+    полный обход. Карточки продуктов заполняются на первом этапе.
+
+    Список статей блога доступен только авторизованным пользователям, поэтому с --user первые --pages его страниц
+    запрашиваются от имени указанного пользователя. Сами ответы кэшируются для сессии команды, но при этом
+    заполняется общий кэш фрагментов карточек статей.
+
+    Команду можно запускать на работающем сайте: выполняются только GET-запросы, кэш не очищается,
+    количество одновременных запросов (--concurrency) и частота запросов (--rate) ограничены.
+
+    Методы:
+        - add_arguments(parser): Добавляет аргументы --base-url, --pages, --concurrency, --rate и --user.
+        - handle(*args, **options): Прогревает кэш и выводит ход и время прогрева.
+        - warm_cards(rows): Заполняет кэш фрагментов карточек продуктов.
+        - get_stages(pages, products_count): Возвращает адреса для прогрева по этапам.
+        - warm(paths, cookies, concurrency, limiter): Выполняет запросы в пуле потоков.
+    """
+
+    help = 'Прогревает кэш каталога, карточек продуктов и страниц списков продуктов и статей блога'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default=env('MY_IP_ADDRESS', default=''),
+                            help='Адрес сайта (схема и хост), по умолчанию MY_IP_ADDRESS')
+        parser.add_argument('--pages', type=int, default=5, help='Количество прогреваемых страниц списков')
+        parser.add_argument('--concurrency', type=int, default=4, help='Количество одновременных запросов')
+        parser.add_argument('--rate', type=float, default=20,
+                            help='Максимальное количество запросов в секунду (0 - без ограничения)')
+        parser.add_argument('--user', help='Email пользователя, от имени которого прогревается список статей блога')
+
+    def handle(self, *args, **options):
+        if options['pages'] < 1 or options['concurrency'] < 1 or options['rate'] < 0:
+            raise CommandError('--pages и --concurrency должны быть положительными, --rate - неотрицательным')
+
+        base_url = urlsplit(options['base_url'])
+
+        if base_url.scheme not in ('http', 'https') or not base_url.netloc:
+            raise CommandError('Укажите адрес сайта в --base-url или MY_IP_ADDRESS, например https://example.com')
+
+        self.client_options = {'HTTP_HOST': base_url.netloc, 'secure': base_url.scheme == 'https'}
+        self.cookies = None
+
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(email=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'Пользователь {options["user"]} не найден')
+
+            client = Client()
+            client.force_login(user)
+            self.cookies = {settings.SESSION_COOKIE_NAME: client.cookies[settings.SESSION_COOKIE_NAME].value}
+
+        limiter = RateLimiter(options['rate'])
+        started = time.perf_counter()
+
+        stage_started = time.perf_counter()
+        rows = get_cached_products()
+        self.warm_cards(rows)
+        self.stdout.write(f'Снимок каталога, фасеты и карточки продуктов: {len(rows)} продуктов, '
+                          f'{(time.perf_counter() - stage_started) * 1000:.0f} мс')
+
+        total = errors = 0
+
+        if self.cookies is None:
+            self.stdout.write('Список статей блога не прогревается: не указан --user')
+
+        for title, paths, cookies in self.get_stages(options['pages'], len(rows)):
+            stage_started = time.perf_counter()
+            results = self.warm(paths, cookies, options['concurrency'], limiter)
+            elapsed = time.perf_counter() - stage_started
+
+            latencies = sorted(latency for path, latency, status_code in results)
+            failed = [(path, status_code) for path, latency, status_code in results if status_code != 200]
+            total += len(results)
+            errors += len(failed)
+
+            if latencies:
+                p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+                self.stdout.write(
+                    f'{title}: {len(results)} запросов, {elapsed:.1f} с, {len(results) / elapsed:.1f} запросов/с, '
+                    f'p50 {statistics.median(latencies) * 1000:.1f} мс, p95 {p95 * 1000:.1f} мс'
+                )
+
+            for path, status_code in failed:
+                self.stderr.write(f'{path}: код ответа {status_code}')
+
+        style = self.style.WARNING if errors else self.style.SUCCESS
+        self.stdout.write(style(
+            f'Прогрев завершен: {total} запросов, ошибок {errors}, {time.perf_counter() - started:.1f} с'
+        ))
+
+    @staticmethod
+    def warm_cards(rows):
+        """
+        Заполняет общий кэш фрагментов карточек продуктов для строк снимка каталога порциями по CARDS_CHUNK_SIZE.
+        Уже сохраненные фрагменты не рендерятся повторно.
+        """
+
+        for start in range(0, len(rows), CARDS_CHUNK_SIZE):
+            render_product_cards(rows[start:start + CARDS_CHUNK_SIZE])
+
+    def get_stages(self, pages, products_count):
+        """
+        Возвращает адреса для прогрева по этапам: страницы списка продуктов и, если указан --user, страницы списка
+        статей блога. Первая страница списка запрашивается по адресу без параметров и с параметром page=1, которые
+        кэшируются отдельно.
+
+        Параметры:
+            - pages (int): Максимальное количество страниц списков.
+            - products_count (int): Количество продуктов в снимке каталога.
+
+        Возвращает:
+            - list: Тройки (наименование этапа, список адресов, cookie клиента или None).
+        """
+
+        home = reverse('catalog:home')
+        product_pages = min(pages, max(1, math.ceil(products_count / ProductListView.paginate_by)))
+        stages = [('Список продуктов', [home] + [f'{home}?page={page}' for page in range(1, product_pages + 1)], None)]
+
+        if self.cookies is None:
+            return stages
+
+        blog = reverse('catalog:blog')
+        blog_pages = min(pages, max(1, math.ceil(
+            Blog.objects.filter(is_published=True).count() / BlogListView.paginate_by
+        )))
+        blog_paths = [blog] + [f'{blog}?page={page}' for page in range(1, blog_pages + 1)]
+
+        return stages + [('Список статей блога', blog_paths, self.cookies)]
+
+    def warm(self, paths, cookies, concurrency, limiter):
+        """
+        Выполняет GET-запросы к адресам в пуле из concurrency потоков и выводит ход выполнения каждые
+        PROGRESS_INTERVAL секунд. Запросы выполняются анонимно или с cookie сессии cookies.
+
+        Возвращает:
+            list: Тройки (адрес, задержка запроса в секундах, код ответа).
+        """
+
+        pending = queue.SimpleQueue()
+        results = []
+
+        for path in paths:
+            pending.put(path)
+
+        def worker():
+            client = Client(raise_request_exception=False)
+
+            if cookies:
+                client.cookies.load(cookies)
+
+            try:
+                while True:
+                    try:
+                        path = pending.get_nowait()
+                    except queue.Empty:
+                        return
+
+                    limiter.wait()
+                    started = time.perf_counter()
+                    response = client.get(path, **self.client_options)
+                    results.append((path, time.perf_counter() - started, response.status_code))
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(worker) for _ in range(min(concurrency, len(paths)))]
+
+            while wait(futures, timeout=PROGRESS_INTERVAL).not_done:
+                self.stdout.write(f'Выполнено запросов: {len(results)} из {len(paths)}')
+
+            for future in futures:
+                future.result()
+
+        return results
@@ -0,0 +1,433 @@
+import bisect
+import logging
+import os
+import socket
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.backends.django import DjangoTemplates
+
+# Модуль не импортирует модели: он подключается в настройках (бэкенд шаблонов) и в бэкенде кэша.
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм длительности в секундах.
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Гистограммы: имя метрики -> (описание, атрибут RequestMetrics или None для общей длительности запроса).
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('Длительность обработки запроса', None),
+    'http_request_sql_duration_seconds': ('Время выполнения SQL-запросов за запрос', 'sql_time'),
+    'http_request_cache_duration_seconds': ('Время обращений к кэшу за запрос', 'cache_time'),
+    'http_request_template_duration_seconds': ('Время рендеринга шаблонов за запрос', 'template_time'),
+}
+
+# Гистограммы, не связанные с отдельным запросом (см. MetricsRegistry.observe_duration()): имя метрики -> описание.
+OUTBOX_SMTP_HISTOGRAM = 'outbox_smtp_duration_seconds'
+DURATION_HISTOGRAMS = {
+    OUTBOX_SMTP_HISTOGRAM: 'Время операций SMTP при отправке писем из очереди (команда send_outbox)',
+}
+
+# Счетчики: имя метрики -> (описание, атрибут RequestMetrics).
+COUNTERS = {
+    'http_request_sql_queries_total': ('Количество SQL-запросов', 'sql_count'),
+    'http_request_cache_hits_total': ('Количество попаданий в кэш', 'cache_hits'),
+    'http_request_cache_misses_total': ('Количество промахов кэша', 'cache_misses'),
+}
+
+METRICS_SLOT_KEY = 'metrics:slot:{}'
+# Номер в ключе - версия формата показателей процесса: показатели прежнего формата, опубликованные до обновления,
+# не объединяются с новыми.
+METRICS_PROCESS_KEY = 'metrics:process:2:{}'
+
+_request_metrics = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Показатели обработки одного запроса.
+
+    Объект хранится в переменной контекста (contextvars), поэтому показатели учитываются и в синхронном коде,
+    вызванном из асинхронного представления через sync_to_async.
+
+    Атрибуты:
+        - sql_count (int): Количество SQL-запросов.
+        - sql_time (float): Время выполнения SQL-запросов в секундах.
+        - cache_hits (int): Количество ключей, найденных в кэше.
+        - cache_misses (int): Количество ключей, отсутствующих в кэше.
+        - cache_calls (int): Количество обращений к кэшу.
+        - cache_time (float): Время обращений к кэшу в секундах.
+        - template_time (float): Время рендеринга шаблонов в секундах.
+    """
+
+    __slots__ = ('sql_count', 'sql_time', 'cache_hits', 'cache_misses', 'cache_calls', 'cache_time', 'template_time')
+
+    def __init__(self):
+        self.sql_count = self.cache_hits = self.cache_misses = self.cache_calls = 0
+        self.sql_time = self.cache_time = self.template_time = 0.0
+
+    def server_timing(self, duration):
+        """
+        Возвращает значение заголовка Server-Timing.
+
+        Параметры:
+            duration (float): Общая длительность обработки запроса в секундах.
+        """
+
+        return ', '.join((
+            f'sql;dur={self.sql_time * 1000:.2f};desc="{self.sql_count} queries"',
+            f'cache;dur={self.cache_time * 1000:.2f};'
+            f'desc="{self.cache_calls} calls, {self.cache_hits} hits, {self.cache_misses} misses"',
+            f'tpl;dur={self.template_time * 1000:.2f}',
+            f'total;dur={duration * 1000:.2f}',
+        ))
+
+
+def start_request_metrics():
+    """
+    Начинает сбор показателей запроса в текущем контексте.
+
+    Возвращает:
+        tuple: Показатели запроса (RequestMetrics) и маркер для finish_request_metrics().
+    """
+
+    metrics = RequestMetrics()
+
+    return metrics, _request_metrics.set(metrics)
+
+
+def finish_request_metrics(token):
+    """
+    Завершает сбор показателей запроса, начатый start_request_metrics().
+    """
+
+    _request_metrics.reset(token)
+
+
+def get_request_metrics():
+    """
+    Возвращает показатели текущего запроса или None, если запрос не обрабатывается (например, в команде управления).
+    """
+
+    return _request_metrics.get()
+
+
+def sql_execute_wrapper(execute, sql, params, many, context):
+    """
+    Обертка выполнения SQL-запросов (connection.execute_wrapper), учитывающая количество и время запросов.
+
+    Подключается ко всем соединениям с базой данных при их создании (catalog.signals), а не внутри middleware,
+    так как под ASGI синхронный код запроса выполняется в другом потоке со своим соединением. Вне запроса обертка
+    только вызывает execute.
+    """
+
+    metrics = _request_metrics.get()
+
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.sql_time += time.perf_counter() - started
+        metrics.sql_count += 1
+
+
+class InstrumentedTemplate:
+    """
+    Шаблон, учитывающий время рендеринга в показателях запроса.
+
+    Атрибуты:
+        template (Template): Шаблон бэкенда DjangoTemplates.
+    """
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = _request_metrics.get()
+
+        if metrics is None:
+            return self.template.render(context, request)
+
+        started = time.perf_counter()
+
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """
+    Бэкенд шаблонов Django, учитывающий время рендеринга шаблонов в показателях запроса.
+
+    Учитываются шаблоны, загружаемые через бэкенд (ответы представлений, render_to_string()); вложенные шаблоны
+    ({% include %}, теги включения) входят во время родительского шаблона.
+    """
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
+
+
+class MetricsRegistry:
+    """
+    Реестр показателей запросов, агрегированных по имени маршрута.
+
+    Показатели накапливаются в памяти процесса без обращений к сети. Фоновый поток раз в publish_interval секунд
+    публикует накопленные значения процесса в кэш, чтобы представление /metrics могло объединить показатели всех
+    процессов сервера. Процесс регистрируется в одном из max_processes слотов (ключи METRICS_SLOT_KEY), занимаемых
+    через cache.add(); слоты и данные завершившихся процессов освобождаются по истечении срока хранения.
+
+    Атрибуты:
+        - publish_interval (float): Интервал публикации показателей в кэш в секундах.
+        - max_processes (int): Максимальное количество процессов, показатели которых объединяются.
+
+    Методы:
+        - observe(view_name, status_code, duration, metrics): Учитывает обработанный запрос.
+        - observe_duration(name, labels, duration): Учитывает длительность операции в гистограмме.
+        - increment(name, labels, value=1): Увеличивает счетчик.
+        - snapshot(): Возвращает копию показателей процесса.
+        - publish(): Публикует показатели процесса в кэш.
+        - collect(): Возвращает показатели всех процессов.
+    """
+
+    def __init__(self, publish_interval, max_processes):
+        self.publish_interval = publish_interval
+        self.max_processes = max_processes
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        """
+        Сбрасывает состояние реестра. Вызывается также в дочернем процессе после fork: показатели и фоновый поток
+        родительского процесса в нем недействительны.
+        """
+
+        self._histograms = {}
+        self._counters = {}
+        self._slot = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self.process_id = f'{socket.gethostname()}:{os.getpid()}'
+
+    def observe(self, view_name, status_code, duration, metrics):
+        """
+        Учитывает обработанный запрос.
+
+        Параметры:
+            view_name (str): Полное имя маршрута.
+            status_code (int): Код ответа.
+            duration (float): Длительность обработки запроса в секундах.
+            metrics (RequestMetrics): Показатели запроса.
+        """
+
+        with self._lock:
+            for name, (description, attribute) in HISTOGRAMS.items():
+                value = duration if attribute is None else getattr(metrics, attribute)
+                self._observe(name, (('view', view_name),), value)
+
+            for name, (description, attribute) in COUNTERS.items():
+                key = (name, (('view', view_name),))
+                self._counters[key] = self._counters.get(key, 0) + getattr(metrics, attribute)
+
+            key = ('http_responses_total', (('view', view_name), ('status', str(status_code))))
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+            self._start_publisher()
+
+    def observe_duration(self, name, labels, duration):
+        """
+        Учитывает длительность операции, не связанной с отдельным запросом, в гистограмме DURATION_HISTOGRAMS.
+
+        Параметры:
+            name (str): Имя метрики.
+            labels (tuple): Пары (метка, значение).
+            duration (float): Длительность в секундах.
+        """
+
+        with self._lock:
+            self._observe(name, labels, duration)
+            self._start_publisher()
+
+    def _observe(self, name, labels, value):
+        # Гистограмма - счетчики корзин DURATION_BUCKETS, корзины +Inf и сумма значений.
+        histogram = self._histograms.get((name, labels))
+
+        if histogram is None:
+            histogram = self._histograms[(name, labels)] = [0] * (len(DURATION_BUCKETS) + 1) + [0.0]
+
+        histogram[bisect.bisect_left(DURATION_BUCKETS, value)] += 1
+        histogram[-1] += value
+
+    def _start_publisher(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='metrics-publisher', daemon=True)
+            self._thread.start()
+
+    def increment(self, name, labels, value=1):
+        """
+        Увеличивает счетчик, не связанный с отдельным запросом.
+
+        Параметры:
+            name (str): Имя метрики.
+            labels (tuple): Пары (метка, значение).
+            value (int): Приращение.
+        """
+
+        with self._lock:
+            self._counters[(name, labels)] = self._counters.get((name, labels), 0) + value
+
+    def snapshot(self):
+        """
+        Возвращает копию показателей процесса.
+
+        Возвращает:
+            dict: Словарь с ключами histograms ((метрика, метки) -> счетчики корзин и сумма) и counters
+                  ((метрика, метки) -> значение).
+        """
+
+        with self._lock:
+            return {
+                'histograms': {key: list(values) for key, values in self._histograms.items()},
+                'counters': dict(self._counters),
+            }
+
+    def publish(self):
+        """
+        Публикует показатели процесса в кэш и продлевает регистрацию процесса в слоте.
+        """
+
+        timeout = self.publish_interval * 3
+        cache.set(METRICS_PROCESS_KEY.format(self.process_id), self.snapshot(), timeout)
+
+        if self._slot is not None and cache.get(METRICS_SLOT_KEY.format(self._slot)) == self.process_id:
+            cache.touch(METRICS_SLOT_KEY.format(self._slot), timeout)
+            return
+
+        self._slot = None
+
+        for slot in range(self.max_processes):
+            if cache.add(METRICS_SLOT_KEY.format(slot), self.process_id, timeout):
+                self._slot = slot
+                return
+
+        logger.warning('Нет свободного слота для публикации метрик процесса %s', self.process_id)
+
+    def collect(self):
+        """
+        Возвращает показатели всех процессов: текущего - из памяти, остальных - из кэша.
+
+        Возвращает:
+            dict: Объединенные показатели (формат snapshot()).
+        """
+
+        slots = cache.get_many([METRICS_SLOT_KEY.format(slot) for slot in range(self.max_processes)])
+        process_keys = [
+            METRICS_PROCESS_KEY.format(process_id)
+            for process_id in set(slots.values()) if process_id != self.process_id
+        ]
+        snapshots = [self.snapshot(), *cache.get_many(process_keys).values()]
+
+        merged = {'histograms': {}, 'counters': {}}
+
+        for snapshot in snapshots:
+            for key, values in snapshot['histograms'].items():
+                target = merged['histograms'].setdefault(key, [0] * len(values))
+                merged['histograms'][key] = [left + right for left, right in zip(target, values)]
+
+            for key, value in snapshot['counters'].items():
+                merged['counters'][key] = merged['counters'].get(key, 0) + value
+
+        return merged
+
+    def _run(self):
+        """
+        Цикл фонового потока: публикует показатели процесса в кэш.
+        """
+
+        while True:
+            try:
+                self.publish()
+            except Exception:
+                logger.exception('Не удалось опубликовать метрики процесса')
+
+            time.sleep(self.publish_interval)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def render_prometheus(state):
+    """
+    Формирует показатели в текстовом формате Prometheus (version 0.0.4).
+
+    Параметры:
+        state (dict): Показатели (формат MetricsRegistry.snapshot()).
+
+    Возвращает:
+        str: Текст для ответа представления /metrics.
+    """
+
+    lines = []
+
+    histograms = {
+        **{name: description for name, (description, attribute) in HISTOGRAMS.items()},
+        **DURATION_HISTOGRAMS,
+    }
+
+    for name, description in histograms.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} histogram')
+
+        for (metric, labels), values in sorted(state['histograms'].items()):
+            if metric != name:
+                continue
+
+            cumulative = 0
+
+            for bound, count in zip((*DURATION_BUCKETS, '+Inf'), values):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels((*labels, ("le", bound)))} {cumulative}')
+
+            lines.append(f'{name}_sum{_format_labels(labels)} {values[-1]:.6f}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+
+    counters = {
+        **COUNTERS,
+        'http_responses_total': ('Количество ответов по кодам', None),
+        'cache_tier_requests_total': ('Количество обращений к уровням двухуровневого кэша по результату', None),
+        'page_cache_requests_total': ('Количество запросов к кэшированным страницам по результату', None),
+    }
+
+    for name, (description, attribute) in counters.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} counter')
+
+        for (metric, labels), value in sorted(state['counters'].items()):
+            if metric == name:
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+
+    return '\n'.join(lines) + '\n'
+
+
+metrics_registry = MetricsRegistry(
+    publish_interval=settings.METRICS_PUBLISH_INTERVAL,
+    max_processes=settings.METRICS_MAX_PROCESSES,
+)
@@ -1,27 +1,144 @@
-from django.utils.cache import add_never_cache_headers
+import hashlib
+import time
+from collections import namedtuple
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.urls import get_resolver, URLResolver
+from django.utils.cache import add_never_cache_headers, patch_response_headers, patch_vary_headers
 
-class ExcludeCacheMiddleware:
+from catalog.metrics import start_request_metrics, finish_request_metrics, metrics_registry
+from catalog.services import get_products_generation, aget_products_generation
+
+CachePolicy = namedtuple('CachePolicy', ('timeout', 'anonymous_only', 'vary', 'never_cache', 'generation'))
+
+CACHE_POLICY_OPTIONS = {'timeout', 'anonymous_only', 'vary', 'never_cache', 'generation'}
+
+# Поколения кэша, которые можно указать в параметре generation политики: имя -> (функция, асинхронная функция).
+# Поколение входит в ключ кэша ответа, поэтому переключение поколения делает сохраненные ответы недоступными.
+CACHE_POLICY_GENERATIONS = {
+    'products': (get_products_generation, aget_products_generation),
+}
+
+
+def iter_url_names(resolver=None, namespace=''):
     """
-    Middleware для исключения кеширования определенных URL.
+    Перебирает полные имена (с пространством имен) всех маршрутов проекта.
+
+    Параметры:
+        resolver (URLResolver, optional): Корневой резолвер. По умолчанию резолвер ROOT_URLCONF.
+        namespace (str): Префикс пространства имен для вложенных маршрутов.
+    """
+
+    resolver = resolver or get_resolver()
+
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = f'{namespace}{pattern.namespace}:' if pattern.namespace else namespace
+            yield from iter_url_names(pattern, prefix)
+        elif pattern.name:
+            yield f'{namespace}{pattern.name}'
+
+
+def compile_cache_policies(config):
+    """
+    Проверяет таблицу политик кэширования и преобразует ее в словарь объектов CachePolicy.
+
+    Параметры:
+        config (dict): Таблица политик: имя маршрута -> словарь параметров (timeout, anonymous_only, vary,
+                       never_cache, generation).
+
+    Возвращает:
+        dict: Словарь имя маршрута -> CachePolicy.
+
+    Исключения:
+        ImproperlyConfigured: Если имя маршрута не существует или параметры политики заданы неверно.
+    """
+
+    url_names = set(iter_url_names())
+    policies = {}
 
-    Этот middleware проверяет запросы поступающие на сервер, и если  путь запроса соответствует одному из заданных URL,
-    добавляет к ответу заголовки, предотвращающие кеширование. Это позволяет обеспечить актуальность данных
-    для ресурсов, которые часто меняются, таких как страницы продуктов и новых блогов.
+    for url_name, options in config.items():
+        if url_name not in url_names:
+            raise ImproperlyConfigured(f'CACHE_POLICIES: маршрут "{url_name}" не найден')
+
+        unknown = set(options) - CACHE_POLICY_OPTIONS
+
+        if unknown:
+            raise ImproperlyConfigured(f'CACHE_POLICIES["{url_name}"]: неизвестные параметры {sorted(unknown)}')
+
+        never_cache = bool(options.get('never_cache', False))
+        timeout = options.get('timeout')
+        generation = options.get('generation')
+
+        if never_cache and (
+            timeout is not None or options.get('anonymous_only') or options.get('vary') or generation is not None
+        ):
+            raise ImproperlyConfigured(f'CACHE_POLICIES["{url_name}"]: never_cache несовместим с другими параметрами')
+
+        if not never_cache and (isinstance(timeout, bool) or not isinstance(timeout, int) or timeout <= 0):
+            raise ImproperlyConfigured(f'CACHE_POLICIES["{url_name}"]: timeout должен быть положительным целым числом')
+
+        if generation is not None and generation not in CACHE_POLICY_GENERATIONS:
+            raise ImproperlyConfigured(f'CACHE_POLICIES["{url_name}"]: неизвестное поколение "{generation}"')
+
+        policies[url_name] = CachePolicy(
+            timeout=timeout,
+            anonymous_only=bool(options.get('anonymous_only', False)),
+            vary=tuple(options.get('vary', ())),
+            never_cache=never_cache,
+            generation=generation,
+        )
+
+    return policies
+
+
+class CachePolicyMiddleware:
+    """
+    Middleware для кэширования ответов по таблице политик CACHE_POLICIES.
+
+    Политика определяется по имени маршрута (request.resolver_match) один раз на запрос. Для маршрута можно задать
+    время жизни ответа в кэше (timeout), кэширование только для анонимных пользователей (anonymous_only), заголовки
+    запроса, от которых зависит ответ (vary), поколение кэша, переключение которого делает сохраненные ответы
+    недоступными (generation, см. CACHE_POLICY_GENERATIONS), или запрет кэширования (never_cache). Маршруты,
+    отсутствующие в таблице, не обрабатываются. Таблица проверяется при загрузке middleware, то есть при старте
+    приложения.
+
+    Кэшируются только успешные ответы на GET и HEAD запросы, не устанавливающие cookie. Не кэшируются также ответы с
+    токеном CSRF, созданным для запроса без cookie CSRF: при чтении из кэша такой cookie не будет установлен. Ответ,
+    взятый из кэша, повторно не сохраняется, поэтому время его жизни не продлевается обращениями.
+
+    Middleware работает как в синхронном (WSGI), так и в асинхронном (ASGI) режиме. В асинхронном режиме пользователь
+    загружается через request.auser(), а кэш читается и записывается асинхронными методами, поэтому обработка запроса
+    не переключается в синхронный поток.
 
     Атрибуты:
         get_response (function): Функция, которая обрабатывает запрос и возвращает ответ.
+        policies (dict): Скомпилированная таблица политик.
     """
 
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         """
         Инициализатор класса.
 
         Параметры:
             get_response (function): Функция, которая обрабатывает запрос и возвращает ответ.
+
+        Исключения:
+            ImproperlyConfigured: Если таблица политик задана неверно.
         """
 
         self.get_response = get_response
+        self.policies = compile_cache_policies(getattr(settings, 'CACHE_POLICIES', {}))
+
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+            self.process_view = self.aprocess_view
 
     def __call__(self, request):
         """
@@ -31,12 +148,214 @@ class ExcludeCacheMiddleware:
             request (HttpRequest): Входящий HTTP запрос.
 
         Возвращает:
-            HttpResponse: HTTP ответ с или без заголовков, предотврающих кеширование.
+            HttpResponse: HTTP ответ, при необходимости сохраненный в кэш или дополненный заголовками кэширования.
         """
 
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
         response = self.get_response(request)
+        cache_key = self.patch_response(request, response)
+
+        if cache_key:
+            cache.set(cache_key, response, request._cache_policy.timeout)
+
+        return response
+
+    async def __acall__(self, request):
+        """
+        Асинхронная версия __call__().
+        """
+
+        response = await self.get_response(request)
+        cache_key = self.patch_response(request, response)
+
+        if cache_key:
+            await cache.aset(cache_key, response, request._cache_policy.timeout)
+
+        return response
+
+    @staticmethod
+    def patch_response(request, response):
+        """
+        Добавляет к ответу заголовки кэширования по политике маршрута.
+
+        Возвращает:
+            str | None: Ключ кэша, под которым нужно сохранить ответ, или None, если ответ не кэшируется.
+        """
+
+        policy = getattr(request, '_cache_policy', None)
 
-        if any(url in request.path for url in ['', 'product/', 'new_product', 'blog/new/']):
+        if policy is None:
+            return None
+
+        if policy.never_cache:
             add_never_cache_headers(response)
 
+            return None
+
+        cache_key = getattr(request, '_cache_policy_key', None)
+
+        if getattr(request, '_cache_policy_hit', False):
+            return None
+
+        if policy.vary:
+            patch_vary_headers(response, policy.vary)
+
+        new_csrf_cookie = 'CSRF_COOKIE' in request.META and not getattr(request, '_cache_policy_had_csrf', False)
+
+        if (
+            cache_key and response.status_code == 200 and not response.streaming and not response.cookies
+            and not new_csrf_cookie
+        ):
+            patch_response_headers(response, policy.timeout)
+
+            return cache_key
+
+        return None
+
+    def get_policy(self, request):
+        """
+        Определяет политику кэширования для маршрута.
+
+        Возвращает:
+            CachePolicy | None: Политика, если ответ на запрос можно взять из кэша, иначе None.
+        """
+
+        policy = self.policies.get(request.resolver_match.view_name)
+        request._cache_policy = policy
+
+        if policy is None or policy.never_cache or request.method not in ('GET', 'HEAD'):
+            return None
+
+        return policy
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """
+        Определяет политику кэширования для маршрута и возвращает ответ из кэша, если он там есть.
+        """
+
+        policy = self.get_policy(request)
+
+        if policy is None or policy.anonymous_only and request.user.is_authenticated:
+            return None
+
+        generation = CACHE_POLICY_GENERATIONS[policy.generation][0]() if policy.generation else None
+        request._cache_policy_key = self.get_cache_key(request, policy, generation)
+        request._cache_policy_had_csrf = 'CSRF_COOKIE' in request.META
+        response = cache.get(request._cache_policy_key)
+        request._cache_policy_hit = response is not None
+
+        return response
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        """
+        Асинхронная версия process_view().
+        """
+
+        policy = self.get_policy(request)
+
+        if policy is None or policy.anonymous_only and (await request.auser()).is_authenticated:
+            return None
+
+        generation = await CACHE_POLICY_GENERATIONS[policy.generation][1]() if policy.generation else None
+        request._cache_policy_key = self.get_cache_key(request, policy, generation)
+        request._cache_policy_had_csrf = 'CSRF_COOKIE' in request.META
+        response = await cache.aget(request._cache_policy_key)
+        request._cache_policy_hit = response is not None
+
+        return response
+
+    @staticmethod
+    def get_cache_key(request, policy, generation=None):
+        """
+        Формирует ключ кэша из имени маршрута, поколения кэша политики, полного пути запроса и значений заголовков из
+        vary.
+        """
+
+        parts = [str(generation), request.get_full_path()]
+        parts.extend(request.META.get('HTTP_' + header.upper().replace('-', '_'), '') for header in policy.vary)
+        digest = hashlib.md5('\n'.join(parts).encode()).hexdigest()
+
+        return f'cache_policy:{request.resolver_match.view_name}:{digest}'
+
+
+class MetricsMiddleware:
+    """
+    Middleware для сбора показателей обработки запросов.
+
+    Для каждого запроса учитываются общая длительность, количество и время SQL-запросов, обращения к кэшу (попадания
+    и промахи) и время рендеринга шаблонов (catalog.metrics). Показатели добавляются к ответу заголовком Server-Timing
+    (если включена настройка METRICS_SERVER_TIMING) и агрегируются по имени маршрута в реестре процесса
+    (catalog.metrics.metrics_registry), откуда их отдает представление /metrics.
+
+    Middleware должно стоять первым в MIDDLEWARE, чтобы в показатели входила работа остальных middleware, в том
+    числе ответы из кэша CachePolicyMiddleware. Для потоковых ответов учитывается время до начала передачи.
+
+    Атрибуты:
+        get_response (function): Функция, которая обрабатывает запрос и возвращает ответ.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """
+        Обработка входящего запроса.
+
+        Параметры:
+            request (HttpRequest): Входящий HTTP запрос.
+
+        Возвращает:
+            HttpResponse: HTTP ответ с заголовком Server-Timing.
+        """
+
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics, token = start_request_metrics()
+        started = time.perf_counter()
+
+        try:
+            response = self.get_response(request)
+            self.record(request, response, metrics, time.perf_counter() - started)
+        finally:
+            finish_request_metrics(token)
+
+        return response
+
+    async def __acall__(self, request):
+        """
+        Асинхронная версия __call__().
+        """
+
+        metrics, token = start_request_metrics()
+        started = time.perf_counter()
+
+        try:
+            response = await self.get_response(request)
+            self.record(request, response, metrics, time.perf_counter() - started)
+        finally:
+            finish_request_metrics(token)
+
         return response
+
+    @staticmethod
+    def record(request, response, metrics, duration):
+        """
+        Учитывает запрос в реестре показателей и добавляет к ответу заголовок Server-Timing.
+        """
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        view_name = resolver_match.view_name if resolver_match else 'unresolved'
+
+        metrics_registry.observe(view_name, response.status_code, duration, metrics)
+
+        if settings.METRICS_SERVER_TIMING:
+            response.headers['Server-Timing'] = metrics.server_timing(duration)
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.14 on 2026-10-18 02:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0014_outboxemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContactMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Имя')),
+                ('phone', models.CharField(max_length=35, verbose_name='Телефон')),
+                ('message', models.TextField(verbose_name='Сообщение')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Дата отправки')),
+            ],
+            options={
+                'verbose_name': 'Сообщение',
+                'verbose_name_plural': 'Сообщения',
+            },
+        ),
+    ]
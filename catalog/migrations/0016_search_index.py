@@ -0,0 +1,70 @@
+# Generated by Django 5.0.14 on 2026-10-18 02:37
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_search_vector_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX search_entry_vector_gin ON catalog_searchentry USING gin (search_vector)'
+        )
+
+
+def drop_search_vector_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS search_entry_vector_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0015_contactmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('product', 'Продукт'), ('blog', 'Статья')], max_length=10, verbose_name='Тип')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='Идентификатор объекта')),
+                ('title', models.CharField(max_length=200, verbose_name='Заголовок')),
+                ('body', models.TextField(blank=True, verbose_name='Текст')),
+                ('url', models.CharField(max_length=300, verbose_name='Адрес')),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Запись поискового индекса',
+                'verbose_name_plural': 'Записи поискового индекса',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(default=1)),
+            ],
+            options={
+                'verbose_name': 'Термин поискового индекса',
+                'verbose_name_plural': 'Термины поискового индекса',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchentry',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_entry'),
+        ),
+        migrations.AddField(
+            model_name='searchterm',
+            name='entry',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='catalog.searchentry'),
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['term', 'entry'], name='search_term_entry'),
+        ),
+        migrations.RunPython(create_search_vector_index, drop_search_vector_index),
+    ]
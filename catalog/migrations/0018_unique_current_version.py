@@ -0,0 +1,47 @@
+# Generated by Django 5.0.14 on 2026-10-18 02:39
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+CHUNK_SIZE = 1000
+
+
+def clear_duplicate_current_versions(apps, schema_editor):
+    ProductVersion = apps.get_model('catalog', 'ProductVersion')
+
+    duplicates = (
+        ProductVersion.objects.filter(is_current=True)
+        .values('product_id')
+        .annotate(current_count=Count('id'), keep_id=Max('id'))
+        .filter(current_count__gt=1)
+        .order_by('product_id')
+    )
+    last_product_id = 0
+
+    # Продукты с несколькими текущими версиями обрабатываются порциями, чтобы списки идентификаторов в запросах
+    # не росли с размером таблицы.
+    while True:
+        chunk = list(duplicates.filter(product_id__gt=last_product_id)[:CHUNK_SIZE])
+
+        if not chunk:
+            break
+
+        last_product_id = chunk[-1]['product_id']
+        ProductVersion.objects.filter(
+            product_id__in=[row['product_id'] for row in chunk], is_current=True,
+        ).exclude(id__in=[row['keep_id'] for row in chunk]).update(is_current=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0017_created_id_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_current_versions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='productversion',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_current', True)), fields=('product',), name='unique_current_version_per_product'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.14 on 2026-10-18 02:48
+
+from django.db import migrations, models
+
+# Список запрещенных слов, ранее заданный в catalog/forms.py.
+INITIAL_FORBIDDEN_WORDS = ['казино', 'криптовалюта', 'крипта', 'биржа', 'дешево', 'бесплатно', 'обман', 'полиция',
+                           'радар']
+
+
+def create_initial_words(apps, schema_editor):
+    ForbiddenWord = apps.get_model('catalog', 'ForbiddenWord')
+    ForbiddenWord.objects.bulk_create([ForbiddenWord(word=word) for word in INITIAL_FORBIDDEN_WORDS])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0019_product_sku'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForbiddenWord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word', models.CharField(max_length=100, unique=True, verbose_name='Слово')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Запрещенное слово',
+                'verbose_name_plural': 'Запрещенные слова',
+                'ordering': ('word',),
+            },
+        ),
+        migrations.RunPython(create_initial_words, migrations.RunPython.noop),
+    ]
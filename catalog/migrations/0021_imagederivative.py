@@ -0,0 +1,26 @@
+# Generated by Django 5.0.14 on 2026-10-18 02:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0020_forbiddenword'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageDerivative',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, unique=True, verbose_name='Исходный файл')),
+                ('variants', models.CharField(max_length=100, verbose_name='Производные изображения')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Производные изображения',
+                'verbose_name_plural': 'Производные изображения',
+            },
+        ),
+    ]
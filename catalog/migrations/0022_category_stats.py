@@ -0,0 +1,64 @@
+# Generated by Django 5.0.14 on 2026-10-18 03:09
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_category_stats(apps, schema_editor):
+    Category = apps.get_model('catalog', 'Category')
+    Product = apps.get_model('catalog', 'Product')
+
+    def aggregate(function, **filters):
+        return Subquery(
+            Product.objects.filter(category=OuterRef('pk'), **filters)
+            .order_by().values('category').annotate(value=function).values('value')
+        )
+
+    Category.objects.update(
+        product_count=Coalesce(aggregate(Count('id')), 0),
+        published_count=Coalesce(aggregate(Count('id'), is_published=True), 0),
+        min_price=aggregate(Min('price'), is_published=True),
+        max_price=aggregate(Max('price'), is_published=True),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0021_imagederivative'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='max_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True, verbose_name='Максимальная цена'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='min_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True, verbose_name='Минимальная цена'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Количество продуктов'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='published_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Опубликовано продуктов'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'is_published', 'created_at', 'id'], name='product_category_created_id'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'is_published', 'price'], name='product_category_price'),
+        ),
+        migrations.RunPython(fill_category_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.0.14 on 2026-10-18 03:40
+
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.urls import reverse
+
+from catalog.search import SEARCH_CONFIG, term_weights
+
+CHUNK_SIZE = 500
+
+
+def backfill_search_index(apps, schema_editor):
+    SearchEntry = apps.get_model('catalog', 'SearchEntry')
+    SearchTerm = apps.get_model('catalog', 'SearchTerm')
+    Product = apps.get_model('catalog', 'Product')
+    Blog = apps.get_model('catalog', 'Blog')
+    uses_postgres = schema_editor.connection.vendor == 'postgresql'
+
+    def index(kind, queryset, entry):
+        last_pk = 0
+
+        while True:
+            objects = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:CHUNK_SIZE])
+
+            if not objects:
+                break
+
+            last_pk = objects[-1].pk
+            entries = [SearchEntry(kind=kind, object_id=obj.pk, **entry(obj)) for obj in objects]
+            SearchEntry.objects.bulk_create(
+                entries,
+                update_conflicts=True,
+                unique_fields=['kind', 'object_id'],
+                update_fields=['title', 'body', 'url', 'updated_at'],
+            )
+            stored = SearchEntry.objects.filter(kind=kind, object_id__in=[obj.pk for obj in objects])
+
+            if uses_postgres:
+                stored.update(
+                    search_vector=(
+                        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+                        + SearchVector('body', weight='B', config=SEARCH_CONFIG)
+                    )
+                )
+                continue
+
+            entry_ids = dict(stored.values_list('object_id', 'pk'))
+            SearchTerm.objects.filter(entry_id__in=entry_ids.values()).delete()
+            SearchTerm.objects.bulk_create(
+                [
+                    SearchTerm(entry_id=entry_ids[item.object_id], term=term, weight=weight)
+                    for item in entries
+                    for term, weight in term_weights(item.title, item.body).items()
+                ],
+                batch_size=1000,
+            )
+
+    index(
+        'product',
+        Product.objects.filter(is_published=True).select_related('category'),
+        lambda product: {
+            'title': product.name,
+            'body': f'{product.category.name}\n{product.description or ""}',
+            'url': reverse('catalog:product_detail', kwargs={'pk': product.pk}),
+        },
+    )
+    index(
+        'blog',
+        Blog.objects.filter(is_published=True).exclude(slug=''),
+        lambda blog: {
+            'title': blog.title,
+            'body': blog.content or '',
+            'url': reverse('catalog:blog_detail', kwargs={'slug': blog.slug}),
+        },
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0023_product_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_index, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,9 @@
+from datetime import datetime
+
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core import signing
+from django.db.models import Q
+from django.http import Http404
 from django.urls import reverse_lazy
 
 
@@ -15,3 +20,114 @@ class CustomLoginRequiredMixin(LoginRequiredMixin):
     """
 
     login_url = reverse_lazy('users:login')
+
+
+class KeysetPage:
+    """
+    Страница списка объектов при постраничном выводе по курсору.
+
+    Атрибуты:
+        - object_list (list): Объекты страницы.
+        - next_cursor (str | None): Курсор следующей страницы или None, если страница последняя.
+        - previous_cursor (str | None): Курсор предыдущей страницы или None, если страница первая.
+    """
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginationMixin:
+    """
+    Mixin класс для ListView, добавляющий постраничный вывод по курсору (keyset pagination).
+
+    Режим включается параметром запроса cursor (пустое значение - первая страница). Объекты упорядочиваются по
+    убыванию (created_at, id), а страница выбирается условием по значениям этих полей последнего объекта предыдущей
+    страницы, а не смещением OFFSET. Запрос COUNT(*) не выполняется, поэтому стоимость получения любой страницы
+    одинакова. Курсоры подписываются и не раскрывают пользователю внутреннюю структуру.
+
+    Атрибуты класса:
+        - cursor_query_param (str): Имя параметра запроса с курсором.
+        - cursor_salt (str): Соль для подписи курсоров.
+
+    Методы:
+        - is_cursor_mode(): Возвращает True, если запрошен вывод по курсору.
+        - paginate_queryset(queryset, page_size): Выбирает страницу по курсору в режиме курсора, в остальных случаях
+                                                  использует обычную постраничную навигацию.
+    """
+
+    cursor_query_param = 'cursor'
+    cursor_salt = 'catalog.cursor'
+
+    def is_cursor_mode(self):
+        return self.cursor_query_param in self.request.GET
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+
+        context['cursor_pagination'] = self.is_cursor_mode()
+
+        return context
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.is_cursor_mode():
+            return super().paginate_queryset(queryset, page_size)
+
+        cursor = self.request.GET.get(self.cursor_query_param)
+        direction, created_at, pk = self.decode_cursor(cursor) if cursor else ('next', None, None)
+
+        if direction == 'next':
+            queryset = queryset.order_by('-created_at', '-id')
+
+            if created_at is not None:
+                queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+        else:
+            queryset = queryset.order_by('created_at', 'id').filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            )
+
+        object_list = list(queryset[:page_size + 1])
+        has_more = len(object_list) > page_size
+        object_list = object_list[:page_size]
+
+        if direction == 'previous':
+            object_list.reverse()
+
+        has_next = has_more if direction == 'next' else True
+        has_previous = created_at is not None if direction == 'next' else has_more
+
+        page = KeysetPage(
+            object_list,
+            self.encode_cursor('next', object_list[-1]) if object_list and has_next else None,
+            self.encode_cursor('previous', object_list[0]) if object_list and has_previous else None,
+        )
+
+        return None, page, object_list, True
+
+    def encode_cursor(self, direction, obj):
+        return signing.dumps((direction, obj.created_at.isoformat(), obj.pk), salt=self.cursor_salt)
+
+    def decode_cursor(self, cursor):
+        try:
+            direction, created_at, pk = signing.loads(cursor, salt=self.cursor_salt)
+            created_at, pk = datetime.fromisoformat(created_at), int(pk)
+        except (signing.BadSignature, ValueError, TypeError):
+            raise Http404('Неверный курсор')
+
+        if direction not in ('next', 'previous'):
+            raise Http404('Неверный курсор')
+
+        return direction, created_at, pk
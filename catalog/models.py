@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.utils import timezone
 from django.utils.text import slugify
 
 from config import settings
@@ -24,6 +25,8 @@ class Product(models.Model):
                                       сохранении.
         - owner (ForeignKey): Владелец продукта. Связь с моделью User.
         - is_published (BooleanField): Флаг, указывающий, опубликован ли продукт. По умолчанию False.
+        - sku (CharField): Артикул поставщика, по которому продукт обновляется при импорте каталога. Уникален, может
+                           быть пустым или null.
 
     Методы:
         - __str__(): Возвращает строковое представление продукта (его наименование).
@@ -32,6 +35,10 @@ class Product(models.Model):
         - verbose_name: Единичное название модели в интерфейсе администратора.
         = verbose_name_plural: Множественное название модели в интерфейсе администратора.
         - permissions: Дополнительные права доступа для модели.
+        - indexes: Составной индекс (created_at, id) для постраничного вывода по курсору, индексы (category,
+                   is_published, created_at, id) и (is_published, created_at, id) для вывода продуктов категории и
+                   фильтра по наличию, индекс (category, is_published, price) для пересчета диапазона цен категории и
+                   индекс price для фильтра по цене.
     """
 
     name = models.CharField(max_length=100, verbose_name='Наименование', help_text='Введите наименование продукта')
@@ -45,6 +52,7 @@ class Product(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='products')
     is_published = models.BooleanField(default=False, verbose_name='Опубликовано')
+    sku = models.CharField(max_length=64, unique=True, verbose_name='Артикул', **NULLABLE)
 
     def __str__(self):
         """
@@ -63,6 +71,14 @@ class Product(models.Model):
             ('can_change_category', 'Can change category of product'),
         ]
 
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='product_created_id'),
+            models.Index(fields=['category', 'is_published', 'created_at', 'id'], name='product_category_created_id'),
+            models.Index(fields=['category', 'is_published', 'price'], name='product_category_price'),
+            models.Index(fields=['is_published', 'created_at', 'id'], name='product_published_created_id'),
+            models.Index(fields=['price'], name='product_price'),
+        ]
+
 
 class Category(models.Model):
     """
@@ -71,6 +87,13 @@ class Category(models.Model):
     Атрибуты:
     name (CharField): Наименование категории (максимальная длина - 100 символов).
     description (TextField): Описание категории. Может быть пустым (NULL).
+    product_count (IntegerField): Количество продуктов категории.
+    published_count (IntegerField): Количество опубликованных продуктов категории.
+    min_price (DecimalField): Минимальная цена опубликованных продуктов категории. NULL, если их нет.
+    max_price (DecimalField): Максимальная цена опубликованных продуктов категории. NULL, если их нет.
+
+    Поля статистики не редактируются вручную: они обновляются при сохранении и удалении продуктов
+    (catalog.services.change_category_stats()) и пересчитываются командой recompute_category_stats.
 
     Методы:
     __str__() -> str: Возвращает строковое представление объекта (наименование категории).
@@ -84,6 +107,12 @@ class Category(models.Model):
 
     name = models.CharField(max_length=100, verbose_name='Наименование', help_text='Введите наименование категории')
     description = models.TextField(verbose_name='Описание', help_text='Введите описание категории', **NULLABLE)
+    product_count = models.IntegerField(default=0, editable=False, verbose_name='Количество продуктов')
+    published_count = models.IntegerField(default=0, editable=False, verbose_name='Опубликовано продуктов')
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, editable=False, verbose_name='Минимальная цена',
+                                    **NULLABLE)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, editable=False, verbose_name='Максимальная цена',
+                                    **NULLABLE)
 
     def __str__(self):
         return self.name
@@ -126,6 +155,39 @@ class Contact(models.Model):
         verbose_name_plural = 'Контакты'
 
 
+class ContactMessage(models.Model):
+    """
+    Класс, представляющий модель Сообщения, отправленного через форму обратной связи.
+
+    Атрибуты:
+    name (CharField): Имя отправителя (максимальная длина - 100 символов).
+    phone (CharField): Контактный телефон отправителя (максимальная длина - 35 символов).
+    message (TextField): Текст сообщения.
+    created_at (DateTimeField): Дата и время отправки сообщения.
+
+    Методы:
+    __str__() (str): Возвращает строковое представление объекта (имя отправителя).
+
+    Вложенные классы:
+    Meta:
+        Класс метаданных для модели.
+        verbose_name (str): Человекочитаемое имя модели в единственном числе.
+        verbose_name_plural (str): Человекочитаемое имя модели во множественном числе.
+    """
+
+    name = models.CharField(max_length=100, verbose_name='Имя')
+    phone = models.CharField(max_length=35, verbose_name='Телефон')
+    message = models.TextField(verbose_name='Сообщение')
+    created_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='Дата отправки')
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = 'Сообщение'
+        verbose_name_plural = 'Сообщения'
+
+
 class Blog(models.Model):
     """
     Класс, представляющий модель Статьи в блоге.
@@ -142,9 +204,10 @@ class Blog(models.Model):
 
     Методы:
     __str__() (str): Возвращает строковое представление объекта (заголовок статьи).
-    save(*args, **kwargs) (None): Сохраняет объект, при необходимости генерирует слаг и отправляет письмо при достижении
-                                  100 просмотров.
-    send_congratulation_email() (None): Отправляет поздравительное письмо автору статьи при достижении 100 просмотров.
+    save(*args, **kwargs) (None): Сохраняет объект, при необходимости генерирует слаг.
+    send_congratulation_email() (None): Ставит в очередь поздравительное письмо автору статьи при достижении 100
+                                        просмотров. Вызывается при переносе просмотров в базу данных
+                                        (flush_blog_views).
 
     Вложенные классы:
     Meta:
@@ -172,21 +235,19 @@ class Blog(models.Model):
 
         super().save(*args, **kwargs)
 
-        if self.views_count == 100:
-            self.send_congratulation_email()
-
     def send_congratulation_email(self):
-        send_mail(
+        OutboxEmail.objects.enqueue(
             'Поздравляем!',
             f'Ваша статья "{self.title}" набрала 100 просмотров!',
-            from_email=settings.DEFAULT_FROM_EMAIL,
             recipient_list=[self.author_email],
-            fail_silently=False,
         )
 
     class Meta:
         verbose_name = 'Статья'
         verbose_name_plural = 'Статьи'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='blog_created_id'),
+        ]
 
 
 class ProductVersion(models.Model):
@@ -202,12 +263,15 @@ class ProductVersion(models.Model):
 
     Методы:
     __str__() (str): Возвращает строковое представление объекта (название версии).
+    save(*args, **kwargs) (None): Сохраняет объект. Если версия помечена как текущая, в той же транзакции одним
+                                  запросом UPDATE снимает этот флаг с предыдущей текущей версии продукта.
 
     Вложенные классы:
     Meta:
         Класс метаданных для модели.
         verbose_name (str): Человекочитаемое имя модели в единственном числе.
         verbose_name_plural (str): Человекочитаемое имя модели во множественном числе.
+        constraints (list): Частичный уникальный индекс, допускающий не более одной текущей версии продукта.
     """
 
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='versions',
@@ -219,6 +283,270 @@ class ProductVersion(models.Model):
     def __str__(self):
         return self.version_name
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            if self.is_current:
+                ProductVersion.objects.filter(product_id=self.product_id, is_current=True).exclude(
+                    pk=self.pk
+                ).update(is_current=False)
+
+            super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = 'Версия продукта'
         verbose_name_plural = 'Версии продукта'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product'],
+                condition=models.Q(is_current=True),
+                name='unique_current_version_per_product',
+            ),
+        ]
+
+
+class OutboxEmailManager(models.Manager):
+    """
+    Менеджер очереди исходящих писем.
+
+    Методы:
+    enqueue(subject, message, recipient_list, from_email=None) (OutboxEmail): Ставит письмо в очередь на отправку.
+    """
+
+    def enqueue(self, subject, message, recipient_list, from_email=None):
+        """
+        Ставит письмо в очередь на отправку.
+
+        Запись создается в текущей транзакции, поэтому письмо будет отправлено только если транзакция, вызвавшая его
+        отправку, зафиксирована. Отправкой занимается команда send_outbox.
+
+        Параметры:
+        subject (str): Тема письма.
+        message (str): Текст письма.
+        recipient_list (list): Список адресов получателей.
+        from_email (str, optional): Адрес отправителя. По умолчанию DEFAULT_FROM_EMAIL.
+
+        Возвращает:
+        OutboxEmail: Созданная запись очереди.
+        """
+
+        return self.create(
+            subject=subject,
+            message=message,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            recipients=list(recipient_list),
+        )
+
+
+class OutboxEmail(models.Model):
+    """
+    Класс, представляющий модель Письма в очереди исходящих писем.
+
+    Атрибуты:
+    subject (CharField): Тема письма.
+    message (TextField): Текст письма.
+    from_email (CharField): Адрес отправителя.
+    recipients (JSONField): Список адресов получателей.
+    status (CharField): Статус письма: ожидает отправки, отправлено или не доставлено после всех попыток.
+    attempts (PositiveIntegerField): Количество выполненных попыток отправки.
+    next_attempt_at (DateTimeField): Время, не раньше которого будет выполнена следующая попытка отправки.
+    last_error (TextField): Текст последней ошибки отправки.
+    created_at (DateTimeField): Дата и время постановки письма в очередь.
+    sent_at (DateTimeField): Дата и время успешной отправки.
+
+    Менеджеры:
+    objects (OutboxEmailManager): Менеджер для постановки писем в очередь.
+
+    Вложенные классы:
+    Meta:
+        Класс метаданных для модели.
+        verbose_name (str): Человекочитаемое имя модели в единственном числе.
+        verbose_name_plural (str): Человекочитаемое имя модели во множественном числе.
+        indexes (list): Индекс для выборки писем, ожидающих отправки.
+    """
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Ожидает отправки'),
+        (STATUS_SENT, 'Отправлено'),
+        (STATUS_DEAD, 'Не доставлено'),
+    ]
+
+    subject = models.CharField(max_length=255, verbose_name='Тема')
+    message = models.TextField(verbose_name='Текст')
+    from_email = models.CharField(max_length=254, verbose_name='Отправитель')
+    recipients = models.JSONField(verbose_name='Получатели')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name='Статус')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попыток отправки')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Следующая попытка')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(verbose_name='Отправлено', **NULLABLE)
+
+    objects = OutboxEmailManager()
+
+    def __str__(self):
+        return self.subject
+
+    class Meta:
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_attempt'),
+        ]
+
+
+class SearchEntry(models.Model):
+    """
+    Класс, представляющий модель Записи поискового индекса.
+
+    Для каждого опубликованного продукта и статьи блога хранится одна запись с текстом, по которому выполняется поиск.
+    На PostgreSQL поиск выполняется по полю search_vector (tsvector с конфигурацией 'russian' и GIN-индексом), на
+    остальных базах данных - по инвертированному индексу SearchTerm.
+
+    Атрибуты:
+    kind (CharField): Тип проиндексированного объекта: продукт или статья.
+    object_id (PositiveBigIntegerField): Идентификатор проиндексированного объекта.
+    title (CharField): Заголовок объекта.
+    body (TextField): Текст объекта.
+    url (CharField): Адрес страницы объекта.
+    search_vector (SearchVectorField): Поисковый вектор (только PostgreSQL).
+    updated_at (DateTimeField): Дата и время последнего обновления записи.
+
+    Вложенные классы:
+    Meta:
+        Класс метаданных для модели.
+        verbose_name (str): Человекочитаемое имя модели в единственном числе.
+        verbose_name_plural (str): Человекочитаемое имя модели во множественном числе.
+        constraints (list): Уникальность записи для каждого объекта.
+    """
+
+    KIND_PRODUCT = 'product'
+    KIND_BLOG = 'blog'
+    KIND_CHOICES = [
+        (KIND_PRODUCT, 'Продукт'),
+        (KIND_BLOG, 'Статья'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name='Тип')
+    object_id = models.PositiveBigIntegerField(verbose_name='Идентификатор объекта')
+    title = models.CharField(max_length=200, verbose_name='Заголовок')
+    body = models.TextField(blank=True, verbose_name='Текст')
+    url = models.CharField(max_length=300, verbose_name='Адрес')
+    search_vector = SearchVectorField(**NULLABLE)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.title
+
+    class Meta:
+        verbose_name = 'Запись поискового индекса'
+        verbose_name_plural = 'Записи поискового индекса'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_entry'),
+        ]
+
+
+class SearchTerm(models.Model):
+    """
+    Класс, представляющий модель Термина инвертированного поискового индекса.
+
+    Используется для поиска на базах данных, отличных от PostgreSQL. Для каждой записи индекса хранятся основы
+    входящих в нее слов с весом: слово в заголовке весит больше, чем слово в тексте.
+
+    Атрибуты:
+    term (CharField): Основа слова.
+    entry (ForeignKey): Запись поискового индекса, содержащая слово.
+    weight (PositiveIntegerField): Вес слова в записи.
+
+    Вложенные классы:
+    Meta:
+        Класс метаданных для модели.
+        indexes (list): Индекс по основе слова для поиска.
+    """
+
+    term = models.CharField(max_length=64)
+    entry = models.ForeignKey(SearchEntry, on_delete=models.CASCADE, related_name='terms')
+    weight = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        return self.term
+
+    class Meta:
+        verbose_name = 'Термин поискового индекса'
+        verbose_name_plural = 'Термины поискового индекса'
+        indexes = [
+            models.Index(fields=['term', 'entry'], name='search_term_entry'),
+        ]
+
+
+class ForbiddenWord(models.Model):
+    """
+    Класс, представляющий модель Запрещенного слова, используемого при модерации продуктов и статей блога.
+
+    Слово сопоставляется с текстом с учетом словоформ: запрещенными считаются все слова текста, начинающиеся с основы
+    запрещенного слова (см. catalog.moderation).
+
+    Атрибуты:
+    word (CharField): Запрещенное слово в нижнем регистре (максимальная длина - 100 символов).
+    created_at (DateTimeField): Дата и время добавления слова.
+
+    Методы:
+    __str__() (str): Возвращает строковое представление объекта (слово).
+    save(*args, **kwargs) (None): Приводит слово к нижнему регистру и сохраняет объект.
+
+    Вложенные классы:
+    Meta:
+        Класс метаданных для модели.
+        verbose_name (str): Человекочитаемое имя модели в единственном числе.
+        verbose_name_plural (str): Человекочитаемое имя модели во множественном числе.
+    """
+
+    word = models.CharField(max_length=100, unique=True, verbose_name='Слово')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.word
+
+    def save(self, *args, **kwargs):
+        self.word = self.word.strip().lower()
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name = 'Запрещенное слово'
+        verbose_name_plural = 'Запрещенные слова'
+        ordering = ('word',)
+
+
+class ImageDerivative(models.Model):
+    """
+    Класс, представляющий модель Производных изображений (уменьшенных копий в форматах WebP и JPEG) для загруженного
+    изображения.
+
+    Атрибуты:
+    source (CharField): Имя исходного файла в хранилище медиафайлов.
+    variants (CharField): Описание производных изображений в формате '<контрольная сумма>:<ширина>,<ширина>,...'. По
+                          нему вычисляются имена файлов (см. catalog.images.derivative_name()).
+    created_at (DateTimeField): Дата и время создания записи.
+
+    Методы:
+    __str__() (str): Возвращает строковое представление объекта (имя исходного файла).
+
+    Вложенные классы:
+    Meta:
+        Класс метаданных для модели.
+        verbose_name (str): Человекочитаемое имя модели в единственном числе.
+        verbose_name_plural (str): Человекочитаемое имя модели во множественном числе.
+    """
+
+    source = models.CharField(max_length=255, unique=True, verbose_name='Исходный файл')
+    variants = models.CharField(max_length=100, verbose_name='Производные изображения')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.source
+
+    class Meta:
+        verbose_name = 'Производные изображения'
+        verbose_name_plural = 'Производные изображения'
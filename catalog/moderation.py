@@ -0,0 +1,156 @@
+import re
+import threading
+import time
+
+from django.core.cache import cache
+
+from catalog.models import ForbiddenWord
+from catalog.text import stem
+
+FORBIDDEN_WORDS_GENERATION_KEY = 'forbidden_words:generation'
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def get_forbidden_words_generation():
+    """
+    Возвращает текущее поколение списка запрещенных слов.
+
+    Если счетчик поколений отсутствует в кэше, он инициализируется текущим временем в миллисекундах, чтобы новое
+    поколение гарантированно не совпало с поколением, для которого процесс уже построил регулярное выражение.
+
+    Возвращает:
+        int: Номер текущего поколения.
+    """
+
+    generation = cache.get(FORBIDDEN_WORDS_GENERATION_KEY)
+
+    if generation is None:
+        cache.add(FORBIDDEN_WORDS_GENERATION_KEY, int(time.time() * 1000), timeout=None)
+        generation = cache.get(FORBIDDEN_WORDS_GENERATION_KEY)
+
+    return generation
+
+
+def invalidate_forbidden_words():
+    """
+    Переключает поколение списка запрещенных слов, после чего каждый процесс перестроит регулярное выражение при
+    следующей проверке текста.
+    """
+
+    try:
+        cache.incr(FORBIDDEN_WORDS_GENERATION_KEY)
+    except ValueError:
+        cache.add(FORBIDDEN_WORDS_GENERATION_KEY, int(time.time() * 1000), timeout=None)
+
+
+def normalize(text):
+    """
+    Приводит текст к виду, в котором выполняется поиск: нижний регистр, "ё" заменена на "е".
+    """
+
+    return (text or '').lower().replace('ё', 'е')
+
+
+def _trie_to_regex(node):
+    """
+    Преобразует префиксное дерево основ в регулярное выражение.
+
+    Если основа является префиксом другой основы, более длинная основа отбрасывается: после основы в выражении
+    следует \\w*, поэтому она и так совпадет.
+    """
+
+    if '' in node:
+        return ''
+
+    alternatives = [re.escape(char) + _trie_to_regex(child) for char, child in sorted(node.items())]
+
+    if len(alternatives) == 1:
+        return alternatives[0]
+
+    return '(?:' + '|'.join(alternatives) + ')'
+
+
+def compile_forbidden_words(words):
+    """
+    Строит одно регулярное выражение для поиска всех запрещенных слов за один проход по тексту.
+
+    Каждое слово приводится к основе (catalog.text.stem), основы объединяются в префиксное дерево, поэтому выражение
+    не перебирает слова по очереди, а проверяет общие префиксы один раз. Совпадением считается слово текста,
+    начинающееся с основы на границе слова: "казино" совпадет с "казино" и "казиношный", но не с "приказ".
+
+    Параметры:
+        words (iterable): Запрещенные слова.
+
+    Возвращает:
+        re.Pattern | None: Регулярное выражение или None, если список слов пуст.
+    """
+
+    trie = {}
+
+    for word in words:
+        word_stem = stem(normalize(word).strip())
+
+        if not word_stem:
+            continue
+
+        node = trie
+
+        for char in word_stem:
+            node = node.setdefault(char, {})
+
+        node.clear()
+        node[''] = {}
+
+    if not trie:
+        return None
+
+    return re.compile(r'(?<!\w)' + _trie_to_regex(trie) + r'\w*')
+
+
+def get_matcher():
+    """
+    Возвращает регулярное выражение для текущего списка запрещенных слов.
+
+    Выражение хранится в памяти процесса и перестраивается, только когда поколение списка в кэше изменилось, то есть
+    после добавления, изменения или удаления запрещенного слова.
+
+    Возвращает:
+        re.Pattern | None: Регулярное выражение или None, если список слов пуст.
+    """
+
+    global _matcher
+
+    generation = get_forbidden_words_generation()
+    matcher = _matcher
+
+    if matcher is None or matcher[0] != generation:
+        with _matcher_lock:
+            matcher = _matcher
+
+            if matcher is None or matcher[0] != generation:
+                words = ForbiddenWord.objects.values_list('word', flat=True)
+                matcher = _matcher = (generation, compile_forbidden_words(words))
+
+    return matcher[1]
+
+
+def find_forbidden_words(text, matcher=None):
+    """
+    Находит в тексте запрещенные слова.
+
+    Параметры:
+        text (str): Проверяемый текст.
+        matcher (re.Pattern, optional): Регулярное выражение, по умолчанию - для текущего списка запрещенных слов.
+
+    Возвращает:
+        list: Найденные слова текста (без повторов, в порядке появления).
+    """
+
+    matcher = matcher or get_matcher()
+
+    if matcher is None or not text:
+        return []
+
+    return list(dict.fromkeys(match.group() for match in matcher.finditer(normalize(text))))
@@ -0,0 +1,263 @@
+import time
+
+from django.core.cache import cache
+
+from catalog.metrics import metrics_registry
+
+# Кэширование общих для всех пользователей частей страниц (фрагментов) по схеме stale-while-revalidate. Запись
+# кэша хранится hard_timeout секунд вместе со временем мягкого истечения (soft_timeout). До мягкого истечения запрос
+# получает фрагмент из кэша. После него фрагмент заново строит только запрос, захвативший блокировку через
+# cache.add(), а остальные запросы в это время получают устаревший фрагмент, поэтому истечение записи популярной
+# страницы не приводит к одновременной перестройке всеми запросами.
+#
+# Фрагмент не зависит от пользователя и токена CSRF: одна запись страницы объекта общая для всех пользователей, а
+# зависящая от пользователя часть страницы (меню, кнопки владельца, токен CSRF) рендерится представлением вокруг
+# фрагмента при каждом запросе.
+#
+# Ключ записи включает версию объекта страницы (PAGE_VERSION_KEY). purge_page_cache() переключает версию, и
+# изменения объекта видны сразу, без ожидания истечения записи. Страница может также зависеть от группы объектов
+# (например, страница продукта - от его категории): группа страницы запоминается при построении фрагмента
+# (PAGE_GROUP_KEY), и ключ записи включает также версию группы (PAGE_GROUP_VERSION_KEY), которую переключает
+# purge_page_group(), не перебирая страницы группы.
+
+PAGE_CACHE_KEY = 'page_cache:{}:{}:{}'
+PAGE_VERSION_KEY = 'page_cache:{}:{}:version'
+PAGE_GROUP_KEY = 'page_cache:{}:{}:group'
+PAGE_GROUP_VERSION_KEY = 'page_cache:{}:group:{}:version'
+PAGE_LOCK_TIMEOUT = 30
+
+PAGE_CACHE_COUNTER = 'page_cache_requests_total'
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def _version_key(key_prefix, object_id):
+    return PAGE_VERSION_KEY.format(key_prefix, object_id)
+
+
+def _group_key(key_prefix, object_id):
+    return PAGE_GROUP_KEY.format(key_prefix, object_id)
+
+
+def _group_version_key(key_prefix, group):
+    return PAGE_GROUP_VERSION_KEY.format(key_prefix, group)
+
+
+def _entry_key(key_prefix, object_id, version):
+    return PAGE_CACHE_KEY.format(key_prefix, object_id, version)
+
+
+def _count(key_prefix, result):
+    metrics_registry.increment(PAGE_CACHE_COUNTER, (('cache', key_prefix), ('result', result)))
+
+
+def _initial_version(versions, key):
+    """
+    Возвращает версию из словаря versions или инициализирует отсутствующую версию текущим временем, чтобы она не
+    совпала с версией сохраненных ранее записей (например, после вытеснения ключа версии из Redis).
+    """
+
+    version = versions.get(key)
+
+    if version is None:
+        cache.add(key, _new_version(), timeout=None)
+        version = cache.get(key)
+
+    return version
+
+
+async def _ainitial_version(versions, key):
+    """
+    Асинхронная версия _initial_version().
+    """
+
+    version = versions.get(key)
+
+    if version is None:
+        await cache.aadd(key, _new_version(), timeout=None)
+        version = await cache.aget(key)
+
+    return version
+
+
+def _page_state(key_prefix, object_id, grouped):
+    """
+    Возвращает версию записей страницы объекта и группу страницы.
+
+    Для страниц с группой версия включает версию группы. Если группа еще неизвестна (фрагмент не строился после
+    изменения объекта), возвращается группа None и фрагмент не сохраняется.
+    """
+
+    keys = [_version_key(key_prefix, object_id), _group_key(key_prefix, object_id)]
+    values = cache.get_many(keys if grouped else keys[:1])
+    version = _initial_version(values, keys[0])
+    group = values.get(keys[1])
+
+    if group is None:
+        return version, None
+
+    return f'{version}.{_initial_version({}, _group_version_key(key_prefix, group))}', group
+
+
+async def _apage_state(key_prefix, object_id, grouped):
+    """
+    Асинхронная версия _page_state().
+    """
+
+    keys = [_version_key(key_prefix, object_id), _group_key(key_prefix, object_id)]
+    values = await cache.aget_many(keys if grouped else keys[:1])
+    version = await _ainitial_version(values, keys[0])
+    group = values.get(keys[1])
+
+    if group is None:
+        return version, None
+
+    return f'{version}.{await _ainitial_version({}, _group_version_key(key_prefix, group))}', group
+
+
+def _should_store(value, group, get_group):
+    """
+    Проверяет, можно ли сохранить фрагмент, и возвращает также новую группу страницы, если она изменилась. Фрагмент,
+    построенный без известной группы или для другой группы, не сохраняется: его ключ не включает версию его группы.
+    """
+
+    if value is None:
+        return False, None
+
+    if get_group is not None:
+        actual_group = get_group(value)
+
+        if group is None or actual_group != group:
+            return False, actual_group
+
+    return True, None
+
+
+def get_page_fragment(key_prefix, object_id, build, soft_timeout, hard_timeout, get_group=None):
+    """
+    Возвращает общий для всех пользователей фрагмент страницы объекта из кэша или строит его по схеме
+    stale-while-revalidate (см. описание модуля).
+
+    Параметры:
+        key_prefix (str): Префикс ключей кэша, используется также в purge_page_cache() и purge_page_group().
+        object_id: Идентификатор объекта страницы.
+        build (callable): Функция без аргументов, строящая фрагмент (любое сериализуемое значение) или возвращающая
+                          None, если объекта нет. None не кэшируется.
+        soft_timeout (int): Время в секундах, после которого фрагмент перестраивается, а до завершения перестройки
+                            отдается устаревший фрагмент.
+        hard_timeout (int): Время хранения записи в кэше в секундах.
+        get_group (callable, optional): Функция, возвращающая по фрагменту группу страницы (например, идентификатор
+                                        категории продукта). Записи страниц группы сбрасывает purge_page_group().
+
+    Возвращает:
+        Фрагмент страницы или None.
+    """
+
+    version, group = _page_state(key_prefix, object_id, get_group is not None)
+    key = _entry_key(key_prefix, object_id, version)
+    entry = None if get_group is not None and group is None else cache.get(key)
+
+    def rebuild():
+        value = build()
+        cacheable, new_group = _should_store(value, group, get_group)
+
+        if new_group is not None:
+            cache.set(_group_key(key_prefix, object_id), new_group, timeout=None)
+
+        if cacheable:
+            cache.set(key, (time.time() + soft_timeout, value), hard_timeout)
+
+        return value
+
+    if entry is None:
+        _count(key_prefix, 'miss')
+        return rebuild()
+
+    soft_expires, value = entry
+
+    if soft_expires > time.time():
+        _count(key_prefix, 'fresh')
+        return value
+
+    if not cache.add(f'{key}:lock', 1, PAGE_LOCK_TIMEOUT):
+        _count(key_prefix, 'stale')
+        return value
+
+    try:
+        _count(key_prefix, 'revalidated')
+        return rebuild()
+    finally:
+        cache.delete(f'{key}:lock')
+
+
+async def aget_page_fragment(key_prefix, object_id, build, soft_timeout, hard_timeout, get_group=None):
+    """
+    Асинхронная версия get_page_fragment(). Функция build - корутина.
+    """
+
+    version, group = await _apage_state(key_prefix, object_id, get_group is not None)
+    key = _entry_key(key_prefix, object_id, version)
+    entry = None if get_group is not None and group is None else await cache.aget(key)
+
+    async def rebuild():
+        value = await build()
+        cacheable, new_group = _should_store(value, group, get_group)
+
+        if new_group is not None:
+            await cache.aset(_group_key(key_prefix, object_id), new_group, timeout=None)
+
+        if cacheable:
+            await cache.aset(key, (time.time() + soft_timeout, value), hard_timeout)
+
+        return value
+
+    if entry is None:
+        _count(key_prefix, 'miss')
+        return await rebuild()
+
+    soft_expires, value = entry
+
+    if soft_expires > time.time():
+        _count(key_prefix, 'fresh')
+        return value
+
+    if not await cache.aadd(f'{key}:lock', 1, PAGE_LOCK_TIMEOUT):
+        _count(key_prefix, 'stale')
+        return value
+
+    try:
+        _count(key_prefix, 'revalidated')
+        return await rebuild()
+    finally:
+        await cache.adelete(f'{key}:lock')
+
+
+def purge_page_cache(key_prefix, object_ids):
+    """
+    Делает недоступными записи кэша страниц объектов, переключая их версии одним запросом set_many.
+
+    Параметры:
+        key_prefix (str): Префикс ключей кэша, переданный в get_page_fragment().
+        object_ids (iterable): Идентификаторы объектов.
+    """
+
+    version = _new_version()
+    versions = {_version_key(key_prefix, object_id): version for object_id in object_ids}
+
+    if versions:
+        cache.set_many(versions, timeout=None)
+
+
+def purge_page_group(key_prefix, group):
+    """
+    Делает недоступными записи кэша всех страниц группы (см. параметр get_group в get_page_fragment()), переключая
+    версию группы.
+
+    Параметры:
+        key_prefix (str): Префикс ключей кэша, переданный в get_page_fragment().
+        group: Группа страниц, например идентификатор категории.
+    """
+
+    cache.set(_group_version_key(key_prefix, group), _new_version(), timeout=None)
@@ -0,0 +1,322 @@
+from collections import Counter
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog.models import SearchEntry, SearchTerm, Product, Blog
+from catalog.text import stems
+
+SEARCH_CONFIG = 'russian'
+TITLE_WEIGHT = 3
+BODY_WEIGHT = 1
+MAX_TERM_LENGTH = 64
+
+
+def uses_postgres_search():
+    """
+    Возвращает True, если поиск выполняется средствами полнотекстового поиска PostgreSQL.
+    """
+
+    return connection.vendor == 'postgresql'
+
+
+def index_entry(kind, object_id, title, body, url):
+    """
+    Создает или обновляет запись поискового индекса.
+
+    На PostgreSQL обновляется поисковый вектор записи, на остальных базах данных - термины инвертированного индекса.
+
+    Параметры:
+        kind (str): Тип объекта (SearchEntry.KIND_PRODUCT или SearchEntry.KIND_BLOG).
+        object_id (int): Идентификатор объекта.
+        title (str): Заголовок объекта.
+        body (str): Текст объекта.
+        url (str): Адрес страницы объекта.
+    """
+
+    with transaction.atomic():
+        entry, created = SearchEntry.objects.update_or_create(
+            kind=kind, object_id=object_id, defaults={'title': title, 'body': body or '', 'url': url},
+        )
+
+        if uses_postgres_search():
+            SearchEntry.objects.filter(pk=entry.pk).update(
+                search_vector=(
+                    SearchVector('title', weight='A', config=SEARCH_CONFIG)
+                    + SearchVector('body', weight='B', config=SEARCH_CONFIG)
+                )
+            )
+            return
+
+        if not created:
+            entry.terms.all().delete()
+
+        SearchTerm.objects.bulk_create(
+            [SearchTerm(entry=entry, term=term, weight=weight) for term, weight in term_weights(title, body).items()]
+        )
+
+
+def term_weights(title, body):
+    """
+    Возвращает веса основ слов заголовка и текста для инвертированного индекса.
+    """
+
+    weights = Counter()
+
+    for term in stems(title):
+        weights[term[:MAX_TERM_LENGTH]] += TITLE_WEIGHT
+
+    for term in stems(body):
+        weights[term[:MAX_TERM_LENGTH]] += BODY_WEIGHT
+
+    return weights
+
+
+def remove_entry(kind, object_id):
+    """
+    Удаляет объект из поискового индекса.
+    """
+
+    SearchEntry.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def index_product(product):
+    """
+    Обновляет запись поискового индекса для продукта. Неопубликованные продукты удаляются из индекса.
+
+    Параметры:
+        product (Product): Продукт.
+    """
+
+    if not product.is_published:
+        remove_entry(SearchEntry.KIND_PRODUCT, product.pk)
+        return
+
+    index_entry(
+        SearchEntry.KIND_PRODUCT,
+        product.pk,
+        product.name,
+        _product_body(product),
+        reverse('catalog:product_detail', kwargs={'pk': product.pk}),
+    )
+
+
+def _product_body(product):
+    return f'{product.category.name}\n{product.description or ""}'
+
+
+def index_products(product_ids):
+    """
+    Обновляет записи поискового индекса для набора продуктов. В отличие от вызова index_product() для каждого
+    продукта, количество запросов не зависит от размера набора: записи создаются и обновляются одним запросом
+    INSERT ... ON CONFLICT, поисковые векторы (или термины инвертированного индекса) пересчитываются для всего набора.
+    Неопубликованные продукты удаляются из индекса.
+
+    Параметры:
+        product_ids (iterable): Идентификаторы продуктов.
+    """
+
+    product_ids = list(product_ids)
+    products = Product.objects.filter(pk__in=product_ids, is_published=True).select_related('category')
+
+    _index_entries(
+        SearchEntry.KIND_PRODUCT,
+        product_ids,
+        [
+            (
+                product.pk,
+                product.name,
+                _product_body(product),
+                reverse('catalog:product_detail', kwargs={'pk': product.pk}),
+            )
+            for product in products
+        ],
+    )
+
+
+def index_blogs(blog_ids):
+    """
+    Обновляет записи поискового индекса для набора статей блога, аналогично index_products(). Неопубликованные статьи
+    и статьи без слага удаляются из индекса.
+
+    Параметры:
+        blog_ids (iterable): Идентификаторы статей блога.
+    """
+
+    blog_ids = list(blog_ids)
+    blogs = Blog.objects.filter(pk__in=blog_ids, is_published=True).exclude(slug='')
+
+    _index_entries(
+        SearchEntry.KIND_BLOG,
+        blog_ids,
+        [
+            (blog.pk, blog.title, blog.content, reverse('catalog:blog_detail', kwargs={'slug': blog.slug}))
+            for blog in blogs
+        ],
+    )
+
+
+def _index_entries(kind, object_ids, items):
+    # items - кортежи (object_id, title, body, url) индексируемых объектов; остальные объекты из object_ids
+    # удаляются из индекса.
+    indexed_ids = [object_id for object_id, title, body, url in items]
+
+    with transaction.atomic():
+        SearchEntry.objects.filter(kind=kind, object_id__in=object_ids).exclude(object_id__in=indexed_ids).delete()
+
+        if not items:
+            return
+
+        SearchEntry.objects.bulk_create(
+            [
+                SearchEntry(kind=kind, object_id=object_id, title=title, body=body or '', url=url)
+                for object_id, title, body, url in items
+            ],
+            update_conflicts=True,
+            unique_fields=['kind', 'object_id'],
+            update_fields=['title', 'body', 'url', 'updated_at'],
+        )
+        entries = SearchEntry.objects.filter(kind=kind, object_id__in=indexed_ids)
+
+        if uses_postgres_search():
+            entries.update(
+                search_vector=(
+                    SearchVector('title', weight='A', config=SEARCH_CONFIG)
+                    + SearchVector('body', weight='B', config=SEARCH_CONFIG)
+                )
+            )
+            return
+
+        entry_ids = dict(entries.values_list('object_id', 'pk'))
+        SearchTerm.objects.filter(entry_id__in=entry_ids.values()).delete()
+        SearchTerm.objects.bulk_create(
+            [
+                SearchTerm(entry_id=entry_ids[object_id], term=term, weight=weight)
+                for object_id, title, body, url in items
+                for term, weight in term_weights(title, body).items()
+            ],
+            batch_size=1000,
+        )
+
+
+def index_blog(blog):
+    """
+    Обновляет запись поискового индекса для статьи блога. Неопубликованные статьи и статьи без слага (у которых нет
+    адреса страницы) удаляются из индекса.
+
+    Параметры:
+        blog (Blog): Статья блога.
+    """
+
+    if not blog.is_published or not blog.slug:
+        remove_entry(SearchEntry.KIND_BLOG, blog.pk)
+        return
+
+    index_entry(
+        SearchEntry.KIND_BLOG,
+        blog.pk,
+        blog.title,
+        blog.content,
+        reverse('catalog:blog_detail', kwargs={'slug': blog.slug}),
+    )
+
+
+def rebuild_index(chunk_size=500):
+    """
+    Перестраивает поисковый индекс, обрабатывая объекты порциями через index_products() и index_blogs().
+
+    Индекс не очищается заранее: записи обновляются на месте, поэтому поиск продолжает работать во время перестройки.
+    После обработки всех объектов удаляются записи, не обновленные за время перестройки, - записи удаленных и снятых
+    с публикации объектов.
+
+    Параметры:
+        chunk_size (int): Количество объектов в одной порции.
+
+    Возвращает:
+        int: Количество проиндексированных объектов.
+    """
+
+    started = timezone.now()
+
+    for queryset, index in (
+        (Product.objects.filter(is_published=True), index_products),
+        (Blog.objects.filter(is_published=True), index_blogs),
+    ):
+        last_pk = 0
+
+        while True:
+            ids = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+
+            if not ids:
+                break
+
+            index(ids)
+            last_pk = ids[-1]
+
+    SearchEntry.objects.filter(updated_at__lt=started).delete()
+
+    return SearchEntry.objects.count()
+
+
+def search(query):
+    """
+    Выполняет поиск по индексу.
+
+    Возвращает QuerySet, пригодный для пагинации: на PostgreSQL - записи SearchEntry, упорядоченные по SearchRank, на
+    остальных базах данных - словари с идентификатором записи (entry_id) и релевантностью (rank), упорядоченные по
+    сумме весов найденных слов. В результат попадают только записи, содержащие все слова запроса.
+
+    Параметры:
+        query (str): Поисковый запрос.
+
+    Возвращает:
+        QuerySet: Результаты поиска.
+    """
+
+    if uses_postgres_search():
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+
+        return (
+            SearchEntry.objects
+            .filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F('search_vector'), search_query))
+            .order_by('-rank', 'pk')
+        )
+
+    terms = {term[:MAX_TERM_LENGTH] for term in stems(query)}
+
+    if not terms:
+        return SearchTerm.objects.none()
+
+    return (
+        SearchTerm.objects
+        .filter(term__in=terms)
+        .values('entry_id')
+        .annotate(rank=Sum('weight'), matched=Count('term', distinct=True))
+        .filter(matched=len(terms))
+        .order_by('-rank', 'entry_id')
+    )
+
+
+def resolve_results(page_items):
+    """
+    Преобразует элементы страницы результатов search() в записи SearchEntry.
+
+    Параметры:
+        page_items (list): Элементы текущей страницы результатов.
+
+    Возвращает:
+        list: Записи SearchEntry в порядке релевантности.
+    """
+
+    page_items = list(page_items)
+
+    if not page_items or isinstance(page_items[0], SearchEntry):
+        return page_items
+
+    entries = SearchEntry.objects.in_bulk([item['entry_id'] for item in page_items])
+
+    return [entries[item['entry_id']] for item in page_items if item['entry_id'] in entries]
@@ -1,23 +1,946 @@
+import functools
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+from django.conf import settings
 from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch, OuterRef, Subquery, F, Q, Case, When, Value, Count, Min, Max, DecimalField
+from django.db.models.functions import Substr, Coalesce
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from catalog.local_cache import products_cache, cards_cache
+from catalog.models import Product, ProductVersion, Blog, ImageDerivative, Category
+from catalog.page_cache import get_page_fragment, aget_page_fragment
+
+PRODUCTS_CACHE_KEY = 'products_list'
+PRODUCTS_GENERATION_KEY = 'products_list:generation'
+PRODUCTS_STALE_KEY = 'products_list:stale'
+PRODUCTS_CACHE_TIMEOUT = 60 * 60
+PRODUCTS_LOCK_TIMEOUT = 30
+
+SNAPSHOT_FORMAT_VERSION = 3
+SNAPSHOT_DESCRIPTION_LENGTH = 101
+SNAPSHOT_FIELDS = ('id', 'name', 'description', 'preview', 'preview_variants', 'price', 'version_name',
+                   'version_number')
+
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Префикс кэша общих частей страниц продуктов (catalog.page_cache). Группа страницы продукта - его категория.
+PRODUCT_PAGE_CACHE = 'product_detail'
+
+# Количество продуктов, дата изменения которых обновляется одним запросом (см. touch_category_products()).
+TOUCH_CHUNK_SIZE = 1000
+
+BLOG_VIEWS_KEY = 'blog_views:{}'
+BLOG_VIEWS_DIRTY_KEY = 'blog_views:dirty'
+BLOG_VIEWS_CONGRATULATION_THRESHOLD = 100
+
+# Вклад продукта в статистику категории (см. change_category_stats()).
+CategoryStatsState = namedtuple('CategoryStatsState', ('category_id', 'is_published', 'price'))
+
+# Снимок каталога: строки списка продуктов и фасеты фильтров без выбранных фильтров (см. get_catalog_snapshot()).
+CatalogSnapshot = namedtuple('CatalogSnapshot', ('rows', 'facets'))
+
+ProductRow = namedtuple('ProductRow', ('id', 'name', 'description', 'preview', 'preview_variants', 'price'))
+VersionRow = namedtuple('VersionRow', ('version_name', 'version_number'))
+
+
+def get_products_queryset():
+    """
+    Возвращает QuerySet продуктов, оптимизированный для вывода списка и карточки продукта.
+
+    Категория и владелец подгружаются через JOIN (select_related), описание производных изображений - подзапросом в
+    атрибут preview_variants, а текущие версии продуктов - одним дополнительным запросом (prefetch_related) в атрибут
+    current_versions. При пагинации QuerySet выполняется только для строк
+    запрошенной страницы, поэтому число запросов не зависит от размера каталога.
+
+    Возвращает:
+        QuerySet: QuerySet объектов Product, упорядоченный по дате создания и идентификатору.
+    """
+
+    current_versions = Prefetch(
+        'versions',
+        queryset=ProductVersion.objects.filter(is_current=True),
+        to_attr='current_versions',
+    )
+
+    return (
+        Product.objects
+        .select_related('category', 'owner')
+        .prefetch_related(current_versions)
+        .annotate(preview_variants=preview_variants_subquery())
+        .order_by('-created_at', '-id')
+    )
+
+
+def preview_variants_subquery():
+    """
+    Возвращает подзапрос описания производных изображений (ImageDerivative.variants) для поля preview продукта или
+    статьи блога.
+    """
+
+    return Subquery(ImageDerivative.objects.filter(source=OuterRef('preview')).values('variants')[:1])
+
+
+def get_current_version(product):
+    """
+    Возвращает текущую версию продукта, загруженную через get_products_queryset().
+
+    Параметры:
+        product (Product): Продукт с предзагруженным атрибутом current_versions.
+
+    Возвращает:
+        ProductVersion | None: Текущая версия продукта или None, если она не задана.
+    """
+
+    current_versions = getattr(product, 'current_versions', None)
+
+    if current_versions is None:
+        return product.versions.filter(is_current=True).first()
+
+    return current_versions[0] if current_versions else None
+
+
+def _product_page_group(page):
+    """
+    Возвращает группу кэша страницы продукта (catalog.page_cache) - идентификатор категории продукта, наименование
+    которой выводится на странице.
+    """
+
+    return page['category_id']
+
+
+def _product_page(product):
+    """
+    Строит общую для всех пользователей часть страницы продукта: HTML описания продукта и данные, нужные
+    представлению для частей страницы, зависящих от пользователя.
+
+    Возвращает:
+        dict | None: Словарь с ключами html, owner_id и category_id или None, если продукт не найден.
+    """
+
+    if product is None:
+        return None
+
+    html = render_to_string(
+        'catalog/include/product_detail.html',
+        {'product': product, 'product_version': get_current_version(product)},
+    )
+
+    return {'html': html, 'owner_id': product.owner_id, 'category_id': product.category_id}
+
+
+def get_product_page(pk):
+    """
+    Возвращает общую для всех пользователей часть страницы продукта (см. _product_page()) из кэша страниц по схеме
+    stale-while-revalidate (catalog.page_cache). Одна запись используется всеми пользователями, поэтому после
+    истечения записи популярной страницы ее перестраивает один запрос.
+
+    Параметры:
+        pk (int): Идентификатор продукта.
+
+    Возвращает:
+        dict | None: Часть страницы или None, если продукт не найден.
+    """
+
+    return get_page_fragment(
+        PRODUCT_PAGE_CACHE, pk, lambda: _product_page(get_products_queryset().filter(pk=pk).first()),
+        settings.PRODUCT_PAGE_SOFT_TIMEOUT, settings.PRODUCT_PAGE_HARD_TIMEOUT, get_group=_product_page_group,
+    )
+
+
+async def aget_product_page(pk):
+    """
+    Асинхронная версия get_product_page().
+    """
+
+    async def build():
+        return _product_page(await get_products_queryset().filter(pk=pk).afirst())
+
+    return await aget_page_fragment(
+        PRODUCT_PAGE_CACHE, pk, build,
+        settings.PRODUCT_PAGE_SOFT_TIMEOUT, settings.PRODUCT_PAGE_HARD_TIMEOUT, get_group=_product_page_group,
+    )
+
+
+def get_products_generation():
+    """
+    Возвращает текущее поколение кэша списка продуктов.
+
+    Если счетчик поколений отсутствует в кэше (например, после очистки Redis), он инициализируется текущим временем в
+    миллисекундах, чтобы новое поколение гарантированно не совпало ни с одним из ранее сохраненных ключей.
+
+    Возвращает:
+        int: Номер текущего поколения.
+    """
+
+    generation = cache.get(PRODUCTS_GENERATION_KEY)
+
+    if generation is None:
+        cache.add(PRODUCTS_GENERATION_KEY, int(time.time() * 1000), timeout=None)
+        generation = cache.get(PRODUCTS_GENERATION_KEY)
+
+    return generation
+
+
+async def aget_products_generation():
+    """
+    Асинхронная версия get_products_generation().
+    """
+
+    generation = await cache.aget(PRODUCTS_GENERATION_KEY)
+
+    if generation is None:
+        await cache.aadd(PRODUCTS_GENERATION_KEY, int(time.time() * 1000), timeout=None)
+        generation = await cache.aget(PRODUCTS_GENERATION_KEY)
+
+    return generation
+
+
+def touch_category_products(category_id, chunk_size=TOUCH_CHUNK_SIZE):
+    """
+    Обновляет дату изменения продуктов категории порциями по первичному ключу.
+
+    Каждая порция обновляется отдельным запросом, поэтому строки большой категории не блокируются одной длинной
+    транзакцией.
+    """
+
+    products = Product.objects.filter(category_id=category_id).order_by('pk').values_list('pk', flat=True)
+    last_pk = 0
+
+    while True:
+        pks = list(products.filter(pk__gt=last_pk)[:chunk_size])
+
+        if not pks:
+            return
+
+        Product.objects.filter(pk__in=pks).update(updated_at=timezone.now())
+        last_pk = pks[-1]
+
+
+def invalidate_products_cache():
+    """
+    Инвалидирует кэш списка продуктов, переключая его на новое поколение.
+
+    Старые записи не удаляются явно: они становятся недоступны по новому ключу и вытесняются по истечении срока
+    хранения.
+    """
+
+    try:
+        cache.incr(PRODUCTS_GENERATION_KEY)
+    except ValueError:
+        cache.add(PRODUCTS_GENERATION_KEY, int(time.time() * 1000), timeout=None)
+
+
+def _snapshot_queryset():
+    """
+    Возвращает QuerySet строк снимка каталога (см. build_products_snapshot()).
+    """
 
-from catalog.models import Product
+    current_version = ProductVersion.objects.filter(product=OuterRef('pk'), is_current=True).order_by('-pk')
+
+    return (
+        Product.objects
+        .order_by('-created_at', '-id')
+        .annotate(
+            short_description=Substr('description', 1, SNAPSHOT_DESCRIPTION_LENGTH),
+            preview_variants=preview_variants_subquery(),
+            version_name=Subquery(current_version.values('version_name')[:1]),
+            version_number=Subquery(current_version.values('version_number')[:1]),
+        )
+        .values_list('id', 'name', 'short_description', 'preview', 'preview_variants', 'price', 'version_name',
+                     'version_number')
+    )
+
+
+def _snapshot_row(values):
+    """
+    Приводит строку QuerySet снимка каталога к формату SNAPSHOT_FIELDS.
+    """
+
+    pk, name, description, preview, preview_variants, price, version_name, version_number = values
+
+    return pk, name, description, preview or '', preview_variants or '', str(price), version_name, version_number
+
+
+def build_products_snapshot():
+    """
+    Строит компактный снимок каталога для кэширования.
+
+    Снимок содержит только поля, используемые шаблоном списка продуктов, в виде кортежей в порядке SNAPSHOT_FIELDS.
+    Описание обрезается до SNAPSHOT_DESCRIPTION_LENGTH символов: этого достаточно, чтобы фильтр truncatechars:100
+    дал тот же результат, что и на полном тексте. Цена хранится строкой, изображение - именем файла и описанием
+    производных изображений (см. catalog.images).
+
+    Возвращает:
+        list: Список кортежей с данными продуктов.
+    """
+
+    return [_snapshot_row(values) for values in _snapshot_queryset()]
+
+
+async def abuild_products_snapshot():
+    """
+    Асинхронная версия build_products_snapshot().
+    """
+
+    return [_snapshot_row(values) async for values in _snapshot_queryset()]
+
+
+def build_catalog_snapshot():
+    """
+    Строит значение кэша снимка каталога: версию формата, строки снимка (см. build_products_snapshot()) и фасеты
+    фильтров без выбранных фильтров (catalog.filters.build_facets()), которые выводятся на главной странице вместе со
+    списком продуктов.
+
+    Возвращает:
+        tuple: Кортеж (SNAPSHOT_FORMAT_VERSION, строки, фасеты).
+    """
+
+    from catalog.filters import ProductFilter, build_facets
+
+    return SNAPSHOT_FORMAT_VERSION, build_products_snapshot(), build_facets(ProductFilter())
+
+
+async def abuild_catalog_snapshot():
+    """
+    Асинхронная версия build_catalog_snapshot().
+    """
+
+    from catalog.filters import ProductFilter, abuild_facets
+
+    return SNAPSHOT_FORMAT_VERSION, await abuild_products_snapshot(), await abuild_facets(ProductFilter())
+
+
+def product_row(product):
+    """
+    Возвращает строку в формате снимка каталога для продукта, загруженного через get_products_queryset().
+
+    Используется там, где продукты читаются из базы данных, а не из снимка (например, при выводе по курсору), чтобы
+    карточки продуктов рендерились и кэшировались одинаково.
+
+    Параметры:
+        product (Product): Продукт.
+
+    Возвращает:
+        tuple: Строка снимка (см. build_products_snapshot()).
+    """
+
+    current_version = get_current_version(product)
+
+    return (
+        product.pk,
+        product.name,
+        product.description[:SNAPSHOT_DESCRIPTION_LENGTH] if product.description is not None else None,
+        product.preview.name or '',
+        getattr(product, 'preview_variants', None) or '',
+        str(product.price),
+        current_version.version_name if current_version else None,
+        current_version.version_number if current_version else None,
+    )
+
+
+def materialize_products(rows):
+    """
+    Преобразует строки снимка каталога в легковесные объекты для шаблона.
+
+    Вызывается только для строк отображаемой страницы.
+
+    Параметры:
+        rows (list): Строки снимка, полученные из get_cached_products().
+
+    Возвращает:
+        list: Список пар (ProductRow, VersionRow | None).
+    """
+
+    return [
+        (
+            ProductRow(pk, name, description, preview, preview_variants, price),
+            VersionRow(version_name, version_number) if version_name is not None else None,
+        )
+        for pk, name, description, preview, preview_variants, price, version_name, version_number in rows
+    ]
+
+
+def _unpack_snapshot(snapshot):
+    """
+    Возвращает CatalogSnapshot для снимка каталога, прочитанного из кэша, или None для снимков устаревшего формата.
+    """
+
+    if snapshot is None or snapshot[0] != SNAPSHOT_FORMAT_VERSION:
+        return None
+
+    return CatalogSnapshot(*snapshot[1:])
+
+
+def get_catalog_snapshot():
+    """
+    Получает снимок каталога из кэша или базы данных.
+
+    Снимок хранится под ключом 'products_list:<поколение>' в виде кортежа (версия формата, строки, фасеты) в Redis и
+    в памяти процесса (catalog.local_cache), поэтому при неизменном каталоге запрос главной страницы читает из Redis
+    только поколение, а фасеты фильтров получает вместе со строками. При промахе кэш перестраивает только один
+    процесс, захвативший блокировку через cache.add(); остальные в это время получают снимок предыдущего поколения,
+    что исключает одновременную перестройку кэша всеми процессами.
+
+    Возвращает:
+        CatalogSnapshot: Строки снимка (см. build_products_snapshot()) и фасеты без выбранных фильтров.
+    """
+
+    key = f'{PRODUCTS_CACHE_KEY}:{get_products_generation()}'
+    snapshot = _unpack_snapshot(products_cache.get(key))
+
+    if snapshot is not None:
+        return snapshot
+
+    lock_key = f'{key}:lock'
+
+    if cache.add(lock_key, 1, timeout=PRODUCTS_LOCK_TIMEOUT):
+        try:
+            value = build_catalog_snapshot()
+            products_cache.set(key, value, timeout=PRODUCTS_CACHE_TIMEOUT)
+            cache.set(PRODUCTS_STALE_KEY, value, timeout=None)
+        finally:
+            cache.delete(lock_key)
+
+        return _unpack_snapshot(value)
+
+    snapshot = _unpack_snapshot(cache.get(PRODUCTS_STALE_KEY))
+
+    if snapshot is None:
+        snapshot = _unpack_snapshot(build_catalog_snapshot())
+
+    return snapshot
+
+
+async def aget_catalog_snapshot():
+    """
+    Асинхронная версия get_catalog_snapshot() с той же схемой ключей, блокировкой и резервным снимком, поэтому
+    синхронные и асинхронные представления используют общий кэш.
+    """
+
+    key = f'{PRODUCTS_CACHE_KEY}:{await aget_products_generation()}'
+    snapshot = _unpack_snapshot(await products_cache.aget(key))
+
+    if snapshot is not None:
+        return snapshot
+
+    lock_key = f'{key}:lock'
+
+    if await cache.aadd(lock_key, 1, timeout=PRODUCTS_LOCK_TIMEOUT):
+        try:
+            value = await abuild_catalog_snapshot()
+            await products_cache.aset(key, value, timeout=PRODUCTS_CACHE_TIMEOUT)
+            await cache.aset(PRODUCTS_STALE_KEY, value, timeout=None)
+        finally:
+            await cache.adelete(lock_key)
+
+        return _unpack_snapshot(value)
+
+    snapshot = _unpack_snapshot(await cache.aget(PRODUCTS_STALE_KEY))
+
+    if snapshot is None:
+        snapshot = _unpack_snapshot(await abuild_catalog_snapshot())
+
+    return snapshot
 
 
 def get_cached_products():
     """
-    Получает список продуктов из кэша или базы данных.
+    Возвращает строки снимка каталога (см. get_catalog_snapshot()).
+
+    Возвращает:
+        list: Список строк снимка (см. build_products_snapshot()).
+    """
+
+    return get_catalog_snapshot().rows
+
+
+async def aget_cached_products():
+    """
+    Асинхронная версия get_cached_products().
+    """
+
+    return (await aget_catalog_snapshot()).rows
+
+
+def get_content_version(values):
+    """
+    Возвращает версию содержимого - контрольную сумму значений, от которых зависит отображение объекта.
+    """
+
+    return format(zlib.crc32(repr(values).encode()), 'x')
+
+
+def _render_missing_cards(template_name, items, cards, render_context):
+    """
+    Рендерит карточки, отсутствующие в cards.
+
+    Возвращает:
+        dict: Словарь ключ фрагмента -> HTML отрендеренных карточек.
+    """
+
+    return {key: render_to_string(template_name, render_context(item)) for key, item in items if key not in cards}
+
+
+def render_cached_cards(template_name, items, render_context):
+    """
+    Возвращает HTML-фрагменты карточек, используя общий для всех пользователей кэш фрагментов.
+
+    Фрагменты всей страницы читаются из кэша одним запросом get_many, отсутствующие фрагменты рендерятся и
+    записываются одним запросом set_many. Ключ фрагмента включает версию содержимого, поэтому изменение объекта
+    автоматически приводит к рендерингу нового фрагмента, а устаревшие фрагменты вытесняются по истечении срока
+    хранения.
+
+    Параметры:
+        template_name (str): Имя шаблона карточки.
+        items (list): Пары (ключ фрагмента, объект).
+        render_context (callable): Функция, возвращающая контекст шаблона для объекта.
+
+    Возвращает:
+        list: HTML-фрагменты карточек в порядке items.
+    """
+
+    keys = [key for key, item in items]
+    cards = cards_cache.get_many(keys)
+    missing = _render_missing_cards(template_name, items, cards, render_context)
+
+    if missing:
+        cards_cache.set_many(missing, timeout=CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+
+    return [mark_safe(cards[key]) for key in keys]
+
+
+async def arender_cached_cards(template_name, items, render_context):
+    """
+    Асинхронная версия render_cached_cards().
+    """
+
+    keys = [key for key, item in items]
+    cards = await cards_cache.aget_many(keys)
+    missing = _render_missing_cards(template_name, items, cards, render_context)
 
-    Проверяет наличие списка продуктов в кэше под ключом 'products_list'. Если список продуктов отсутствует в кэше,
-    загружает его из базы данных, сохраняет в кэш и возвращает.
+    if missing:
+        await cards_cache.aset_many(missing, timeout=CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+
+    return [mark_safe(cards[key]) for key in keys]
+
+
+def _product_card_items(rows):
+    """
+    Возвращает пары (ключ фрагмента, строка снимка) для карточек продуктов.
+
+    Строка снимка содержит все отображаемые в карточке данные, поэтому ее контрольная сумма служит версией
+    содержимого.
+    """
+
+    return [(f'card:product:{row[0]}:{get_content_version(row)}', row) for row in rows]
+
+
+def _product_card_context(row):
+    """
+    Возвращает контекст шаблона карточки продукта для строки снимка каталога.
+    """
+
+    product, current_version = materialize_products([row])[0]
+
+    return {'product': product, 'current_version': current_version}
+
+
+def render_product_cards(rows):
+    """
+    Возвращает HTML-фрагменты карточек продуктов для строк снимка каталога.
+
+    Строка снимка содержит все отображаемые в карточке данные, поэтому ее контрольная сумма служит версией
+    содержимого. Строки преобразуются в объекты только для отсутствующих в кэше карточек.
+
+    Параметры:
+        rows (list): Строки снимка каталога для отображаемой страницы.
 
     Возвращает:
-        list: Список объектов Product.
+        list: HTML-фрагменты карточек.
+    """
+
+    return render_cached_cards('catalog/include/product_card.html', _product_card_items(rows), _product_card_context)
+
+
+async def arender_product_cards(rows):
     """
+    Асинхронная версия render_product_cards().
+    """
+
+    return await arender_cached_cards('catalog/include/product_card.html', _product_card_items(rows),
+                                      _product_card_context)
+
 
-    products = cache.get('products_list')
+def _blog_card_items(articles):
+    """
+    Возвращает пары (ключ фрагмента, статья) для карточек статей блога.
+    """
+
+    return [
+        (
+            f'card:blog:{article.pk}:' + get_content_version((
+                article.title, article.slug, article.content, str(article.preview),
+                getattr(article, 'preview_variants', None), article.created_at, article.views_count,
+            )),
+            article,
+        )
+        for article in articles
+    ]
+
+
+def _blog_card_context(article):
+    """
+    Возвращает контекст шаблона карточки статьи блога.
+    """
+
+    return {'article': article}
+
+
+def render_blog_cards(articles):
+    """
+    Возвращает HTML-фрагменты карточек статей блога.
+
+    Параметры:
+        articles (list): Статьи для отображаемой страницы.
+
+    Возвращает:
+        list: HTML-фрагменты карточек.
+    """
+
+    return render_cached_cards('catalog/include/blog_card.html', _blog_card_items(articles), _blog_card_context)
+
+
+async def arender_blog_cards(articles):
+    """
+    Асинхронная версия render_blog_cards().
+    """
+
+    return await arender_cached_cards('catalog/include/blog_card.html', _blog_card_items(articles),
+                                      _blog_card_context)
+
+
+# Множество статей с накопленными просмотрами для кэшей без множеств Redis (LocMemCache в разработке и тестах). Такой
+# кэш принадлежит одному процессу, поэтому множество хранится обычным значением и изменяется под блокировкой процесса.
+_dirty_blogs_lock = threading.Lock()
+
+
+def _mark_blog_views_dirty(*blog_ids):
+    """
+    Добавляет статьи в множество статей с накопленными просмотрами (BLOG_VIEWS_DIRTY_KEY).
+    """
+
+    if hasattr(cache, 'sadd'):
+        cache.sadd(BLOG_VIEWS_DIRTY_KEY, *blog_ids)
+        return
+
+    with _dirty_blogs_lock:
+        cache.set(BLOG_VIEWS_DIRTY_KEY, cache.get(BLOG_VIEWS_DIRTY_KEY, frozenset()) | set(blog_ids), timeout=None)
+
+
+async def _amark_blog_views_dirty(*blog_ids):
+    """
+    Асинхронная версия _mark_blog_views_dirty().
+    """
+
+    if hasattr(cache, 'asadd'):
+        await cache.asadd(BLOG_VIEWS_DIRTY_KEY, *blog_ids)
+    else:
+        _mark_blog_views_dirty(*blog_ids)
+
+
+def _pop_dirty_blog_ids(count):
+    """
+    Извлекает из множества статей с накопленными просмотрами до count идентификаторов.
+    """
+
+    if hasattr(cache, 'spop'):
+        return [int(member) for member in cache.spop(BLOG_VIEWS_DIRTY_KEY, count)]
+
+    with _dirty_blogs_lock:
+        blog_ids = cache.get(BLOG_VIEWS_DIRTY_KEY, frozenset())
+        popped = sorted(blog_ids)[:count]
+        cache.set(BLOG_VIEWS_DIRTY_KEY, blog_ids - set(popped), timeout=None)
+
+    return popped
+
+
+def increment_blog_views(blog_id):
+    """
+    Атомарно увеличивает счетчик просмотров статьи в кэше.
+
+    Просмотры накапливаются в кэше и переносятся в базу данных пакетами командой flush_blog_views, поэтому просмотр
+    статьи не блокирует ее строку в базе данных. Статья добавляется в множество статей с накопленными просмотрами,
+    по которому flush_blog_views() находит статьи для переноса.
+
+    Параметры:
+        blog_id (int): Идентификатор статьи.
+
+    Возвращает:
+        int: Количество просмотров статьи, еще не перенесенных в базу данных.
+    """
 
-    if not products:
-        products = list(Product.objects.all())
-        cache.set('products_list', products)
+    key = BLOG_VIEWS_KEY.format(blog_id)
+    cache.add(key, 0, timeout=None)
+
+    try:
+        views = cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+        views = 1
+
+    _mark_blog_views_dirty(blog_id)
+
+    return views
+
+
+async def aincrement_blog_views(blog_id):
+    """
+    Асинхронная версия increment_blog_views().
+    """
+
+    key = BLOG_VIEWS_KEY.format(blog_id)
+    await cache.aadd(key, 0, timeout=None)
+
+    try:
+        views = await cache.aincr(key)
+    except ValueError:
+        await cache.aset(key, 1, timeout=None)
+        views = 1
+
+    await _amark_blog_views_dirty(blog_id)
+
+    return views
+
+
+def get_pending_blog_views(blog_id):
+    """
+    Возвращает количество просмотров статьи, накопленных в кэше и еще не перенесенных в базу данных.
+    """
+
+    return cache.get(BLOG_VIEWS_KEY.format(blog_id)) or 0
+
+
+def _subtract_flushed_views(deltas):
+    """
+    Вычитает перенесенные в базу данных просмотры из счетчиков в кэше.
+    """
+
+    for pk, delta in deltas.items():
+        cache.decr(BLOG_VIEWS_KEY.format(pk), delta)
+
+
+def flush_blog_views(chunk_size=500):
+    """
+    Переносит накопленные в кэше просмотры статей в базу данных.
+
+    Обрабатываются только статьи из множества статей с накопленными просмотрами (BLOG_VIEWS_DIRTY_KEY), порциями по
+    chunk_size: идентификаторы извлекаются из множества, накопленные значения читаются одним запросом get_many, строки
+    порции блокируются и обновляются одним запросом bulk_update. Перенесенные просмотры вычитаются из счетчиков в кэше
+    после фиксации транзакции, поэтому при ошибке базы данных они не теряются, а статьи возвращаются в множество.
+    Просмотры, добавленные во время переноса, остаются в счетчиках, а статьи - в множестве, и переносятся при
+    следующем запуске.
+
+    Поздравительное письмо отправляется, когда перенесенные просмотры переводят статью через порог
+    BLOG_VIEWS_CONGRATULATION_THRESHOLD, поэтому оно уходит ровно один раз. Письмо ставится в очередь в той же
+    транзакции, что и обновление счетчика.
+
+    Параметры:
+        chunk_size (int): Количество статей в одной порции.
+
+    Возвращает:
+        int: Общее количество перенесенных просмотров.
+    """
+
+    flushed = 0
+
+    while True:
+        blog_ids = _pop_dirty_blog_ids(chunk_size)
+        keys = {BLOG_VIEWS_KEY.format(pk): pk for pk in blog_ids}
+        deltas = {keys[key]: value for key, value in cache.get_many(list(keys)).items() if value}
+
+        if deltas:
+            try:
+                with transaction.atomic():
+                    blogs = list(
+                        Blog.objects.select_for_update()
+                        .filter(pk__in=deltas)
+                        .only('pk', 'title', 'views_count', 'author_email')
+                    )
+
+                    for blog in blogs:
+                        previous_count = blog.views_count
+                        blog.views_count += deltas[blog.pk]
+
+                        if previous_count < BLOG_VIEWS_CONGRATULATION_THRESHOLD <= blog.views_count:
+                            blog.send_congratulation_email()
+
+                    Blog.objects.bulk_update(blogs, ['views_count'])
+                    transaction.on_commit(functools.partial(_subtract_flushed_views, deltas))
+            except Exception:
+                _mark_blog_views_dirty(*deltas)
+
+                raise
+
+            flushed += sum(deltas.values())
+
+        if len(blog_ids) < chunk_size:
+            return flushed
+
+
+def get_category_stats_state(product):
+    """
+    Возвращает вклад продукта в статистику категории.
+
+    Значения читаются из __dict__, чтобы не загружать отложенные поля (only(), defer()) отдельными запросами.
+
+    Возвращает:
+        CategoryStatsState | None: Категория, флаг публикации и цена продукта или None, если какое-либо из полей не
+                                   загружено.
+    """
+
+    values = product.__dict__
+
+    if not all(name in values for name in ('category_id', 'is_published', 'price')):
+        return None
+
+    return CategoryStatsState(values['category_id'], bool(values['is_published']), values['price'])
+
+
+def _category_price_subquery(function):
+    """
+    Возвращает подзапрос минимальной или максимальной цены опубликованных продуктов категории.
+    """
+
+    return Subquery(
+        Product.objects.filter(category=OuterRef('pk'), is_published=True)
+        .order_by().values('category').annotate(value=function('price')).values('value')
+    )
+
+
+def _category_count_subquery(**filters):
+    """
+    Возвращает подзапрос количества продуктов категории.
+    """
+
+    return Coalesce(Subquery(
+        Product.objects.filter(category=OuterRef('pk'), **filters)
+        .order_by().values('category').annotate(value=Count('pk')).values('value')
+    ), 0)
+
+
+def update_category_stats(category_id, count=0, published=0, added_price=None, removed_price=None):
+    """
+    Изменяет статистику категории одним запросом UPDATE.
+
+    Количества изменяются выражениями F(), поэтому одновременные изменения разных продуктов не теряются. Граница
+    диапазона цен сдвигается к добавленной цене, если та выходит за диапазон. Если удаленная цена совпадает с границей,
+    граница пересчитывается подзапросом по индексу (category, is_published, price); остальные продукты категории при
+    этом не читаются.
+
+    Параметры:
+        category_id (int): Идентификатор категории.
+        count (int): Изменение количества продуктов.
+        published (int): Изменение количества опубликованных продуктов.
+        added_price (Decimal, optional): Цена опубликованного продукта, добавленного в категорию.
+        removed_price (Decimal, optional): Цена опубликованного продукта, удаленного из категории.
+    """
+
+    fields = {}
+
+    if count:
+        fields['product_count'] = F('product_count') + count
+
+    if published:
+        fields['published_count'] = F('published_count') + published
+
+    for field, function, lookup in (('min_price', Min, 'gt'), ('max_price', Max, 'lt')):
+        whens = []
+
+        if removed_price is not None:
+            whens.append(When(**{field: removed_price}, then=_category_price_subquery(function)))
+
+        if added_price is not None:
+            whens.append(When(Q(**{f'{field}__isnull': True}) | Q(**{f'{field}__{lookup}': added_price}),
+                              then=Value(added_price)))
+
+        if whens:
+            fields[field] = Case(*whens, default=F(field), output_field=DecimalField(max_digits=10, decimal_places=2))
+
+    if fields:
+        Category.objects.filter(pk=category_id).update(**fields)
+
+
+def change_category_stats(old, new):
+    """
+    Переносит вклад продукта в статистику категорий из состояния old в состояние new.
+
+    Вызывается из обработчиков сигналов сохранения и удаления продукта в той же транзакции, что и изменение продукта.
+
+    Параметры:
+        old (CategoryStatsState | None): Вклад продукта до изменения или None для нового продукта.
+        new (CategoryStatsState | None): Вклад продукта после изменения или None для удаленного продукта.
+    """
+
+    if old == new:
+        return
+
+    if old is not None and new is not None and old.category_id == new.category_id:
+        update_category_stats(
+            new.category_id,
+            published=new.is_published - old.is_published,
+            added_price=new.price if new.is_published else None,
+            removed_price=old.price if old.is_published else None,
+        )
+        return
+
+    if old is not None:
+        update_category_stats(old.category_id, count=-1, published=-old.is_published,
+                              removed_price=old.price if old.is_published else None)
+
+    if new is not None:
+        update_category_stats(new.category_id, count=1, published=int(new.is_published),
+                              added_price=new.price if new.is_published else None)
+
+
+def recompute_category_stats(category_ids=None):
+    """
+    Пересчитывает статистику категорий по таблице продуктов одним запросом UPDATE с коррелированными подзапросами.
+
+    Используется после массовых изменений продуктов, минующих сигналы (bulk_create, bulk_update, update()), и
+    командой recompute_category_stats для исправления расхождений.
+
+    Параметры:
+        category_ids (iterable, optional): Идентификаторы категорий. По умолчанию - все категории.
+
+    Возвращает:
+        int: Количество обновленных категорий.
+    """
+
+    queryset = Category.objects.all()
+
+    if category_ids is not None:
+        queryset = queryset.filter(pk__in=list(category_ids))
+
+    return queryset.update(**category_stats_expressions())
+
+
+def category_stats_expressions():
+    """
+    Возвращает выражения фактических значений полей статистики категории (подзапросы к таблице продуктов).
+    """
 
-    return products
+    return {
+        'product_count': _category_count_subquery(),
+        'published_count': _category_count_subquery(is_published=True),
+        'min_price': _category_price_subquery(Min),
+        'max_price': _category_price_subquery(Max),
+    }
@@ -0,0 +1,220 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, post_init, pre_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from catalog import search
+from catalog.models import Product, ProductVersion, Category, Blog, SearchEntry, ForbiddenWord
+from catalog.images import schedule_missing_derivatives
+from catalog.metrics import sql_execute_wrapper
+from catalog.moderation import invalidate_forbidden_words
+from catalog.page_cache import purge_page_cache, purge_page_group
+from catalog.services import invalidate_products_cache, get_category_stats_state, change_category_stats, \
+    recompute_category_stats, touch_category_products, PRODUCT_PAGE_CACHE
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductVersion)
+@receiver(post_delete, sender=ProductVersion)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_products_cache_on_change(sender, **kwargs):
+    """
+    Инвалидирует кэш списка продуктов при изменении или удалении продукта, версии продукта или категории.
+
+    Переключение поколения откладывается до фиксации транзакции, чтобы перестройка кэша не прочитала незафиксированные
+    данные.
+    """
+
+    transaction.on_commit(invalidate_products_cache)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductVersion)
+@receiver(post_delete, sender=ProductVersion)
+def purge_product_page_on_change(sender, instance, **kwargs):
+    """
+    Сбрасывает кэш страницы продукта при изменении или удалении продукта или его версии после фиксации транзакции.
+    """
+
+    product_id = instance.pk if sender is Product else instance.product_id
+    transaction.on_commit(lambda: purge_page_cache(PRODUCT_PAGE_CACHE, [product_id]))
+
+
+@receiver(post_save, sender=Category)
+def purge_category_product_pages(sender, instance, created, **kwargs):
+    """
+    Сбрасывает кэш страниц продуктов категории при ее изменении, так как наименование категории выводится на странице
+    продукта. Переключается одна версия группы страниц категории, продукты категории не перебираются.
+    """
+
+    if not created:
+        transaction.on_commit(lambda: purge_page_group(PRODUCT_PAGE_CACHE, instance.pk))
+
+
+@receiver(post_save, sender=ProductVersion)
+@receiver(post_delete, sender=ProductVersion)
+def touch_product_on_version_change(sender, instance, **kwargs):
+    """
+    Обновляет дату изменения продукта при изменении или удалении его версии, так как текущая версия входит в выгрузку
+    каталога и продукт должен попасть в инкрементальную выгрузку.
+    """
+
+    Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Category)
+def touch_category_products_on_change(sender, instance, created, **kwargs):
+    """
+    Обновляет дату изменения продуктов категории при ее изменении, так как наименование категории входит в выгрузку
+    каталога. Обновление выполняется порциями после фиксации транзакции, чтобы сохранение категории не держало
+    блокировки всех ее продуктов.
+    """
+
+    if not created:
+        transaction.on_commit(lambda: touch_category_products(instance.pk))
+
+
+@receiver(post_save, sender=Product)
+def index_product_on_save(sender, instance, **kwargs):
+    """
+    Обновляет запись поискового индекса для сохраненного продукта после фиксации транзакции.
+    """
+
+    transaction.on_commit(lambda: search.index_product(instance))
+
+
+@receiver(post_save, sender=Blog)
+def index_blog_on_save(sender, instance, **kwargs):
+    """
+    Обновляет запись поискового индекса для сохраненной статьи блога после фиксации транзакции.
+    """
+
+    transaction.on_commit(lambda: search.index_blog(instance))
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, **kwargs):
+    """
+    Обновляет записи поискового индекса продуктов категории, так как в них входит наименование категории.
+    """
+
+    if created:
+        return
+
+    def reindex():
+        for product in instance.products.filter(is_published=True).select_related('category').iterator():
+            search.index_product(product)
+
+    transaction.on_commit(reindex)
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_index(sender, instance, **kwargs):
+    """
+    Удаляет удаленный продукт из поискового индекса.
+    """
+
+    search.remove_entry(SearchEntry.KIND_PRODUCT, instance.pk)
+
+
+@receiver(post_delete, sender=Blog)
+def remove_blog_from_index(sender, instance, **kwargs):
+    """
+    Удаляет удаленную статью блога из поискового индекса.
+    """
+
+    search.remove_entry(SearchEntry.KIND_BLOG, instance.pk)
+
+
+@receiver(post_save, sender=ForbiddenWord)
+@receiver(post_delete, sender=ForbiddenWord)
+def invalidate_forbidden_words_on_change(sender, **kwargs):
+    """
+    Переключает поколение списка запрещенных слов после фиксации транзакции, в которой список изменился.
+    """
+
+    transaction.on_commit(invalidate_forbidden_words)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Blog)
+def generate_preview_derivatives(sender, instance, **kwargs):
+    """
+    Ставит в очередь создание уменьшенных копий изображения продукта или статьи блога после его загрузки.
+    """
+
+    schedule_missing_derivatives(instance.preview)
+
+
+@receiver(connection_created)
+def install_sql_execute_wrapper(sender, connection, **kwargs):
+    """
+    Подключает к новому соединению с базой данных обертку, учитывающую SQL-запросы в показателях запроса
+    (catalog.metrics).
+    """
+
+    if sql_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_execute_wrapper)
+
+
+@receiver(post_init, sender=Product)
+def remember_category_stats_state(sender, instance, **kwargs):
+    """
+    Запоминает вклад загруженного продукта в статистику категории, чтобы при сохранении изменить статистику без
+    чтения прежних значений из базы данных.
+    """
+
+    instance._category_stats_state = get_category_stats_state(instance)
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_delete, sender=Product)
+def remember_stored_category(sender, instance, **kwargs):
+    """
+    Запоминает категорию сохраняемого или удаляемого продукта, загруженного с отложенными полями: статистика
+    пересчитывается для категории, в которой продукт хранился в базе данных (при смене категории - и для нее).
+    """
+
+    if instance._category_stats_state is None and not instance._state.adding:
+        instance._stored_category_id = (
+            Product.objects.filter(pk=instance.pk).values_list('category_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Product)
+def update_category_stats_on_save(sender, instance, created, **kwargs):
+    """
+    Обновляет статистику категорий при создании продукта, смене категории, цены или флага публикации.
+
+    Если прежние значения неизвестны (продукт загружен с отложенными полями), статистика прежней и текущей категорий
+    продукта пересчитывается полностью.
+    """
+
+    new = get_category_stats_state(instance)
+    old = None if created else instance._category_stats_state
+
+    if new is None or old is None and not created:
+        stored_category_id = getattr(instance, '_stored_category_id', None)
+        recompute_category_stats({instance.category_id, stored_category_id} - {None})
+    else:
+        change_category_stats(old, new)
+
+    instance._category_stats_state = new
+
+
+@receiver(post_delete, sender=Product)
+def update_category_stats_on_delete(sender, instance, **kwargs):
+    """
+    Исключает удаленный продукт из статистики категории.
+    """
+
+    state = instance._category_stats_state
+
+    if state is None:
+        recompute_category_stats({instance._stored_category_id} - {None})
+    else:
+        change_category_stats(state, None)
@@ -1,5 +1,6 @@
 from django import template
 
+from catalog.images import build_picture_sources, get_image_variants
 
 register = template.Library()
 
@@ -15,3 +16,30 @@ def remove_trailing_slash(url):
 @register.filter
 def media_redirection(media_url):
     return f"/media/{media_url}"
+
+
+@register.inclusion_tag('catalog/include/picture.html')
+def picture(image, alt='', sizes='100vw', variants=None):
+    """
+    Выводит изображение тегом <picture> с набором уменьшенных копий в форматах WebP и JPEG (srcset), из которых
+    браузер выбирает подходящую по ширине. Пока производные изображения не созданы, выводится исходное изображение.
+
+    Параметры:
+        image (FieldFile | str): Изображение или имя файла в хранилище.
+        alt (str): Альтернативный текст.
+        sizes (str): Значение атрибута sizes, например '25vw'.
+        variants (str, optional): Описание производных изображений, если оно уже загружено вместе с объектом. По
+                                  умолчанию читается из кэша.
+    """
+
+    source = str(image)
+
+    if variants is None:
+        variants = get_image_variants(source)
+
+    return {
+        'src': media_redirection(source),
+        'alt': alt,
+        'sizes': sizes,
+        'sources': build_picture_sources(source, variants),
+    }
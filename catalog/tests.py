@@ -0,0 +1,1509 @@
+import asyncio
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from operator import itemgetter
+from unittest import mock
+
+from PIL import Image
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core import mail
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.http import HttpResponse, QueryDict
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog import services
+from catalog.contact_buffer import ContactMessageBuffer
+from catalog.cache import AsyncRedisCache
+from catalog.benchmark import ENDPOINTS, QUERY_BUDGETS, seed_dataset, measure_endpoint
+from catalog.forms import VersionFormSet
+from catalog.images import DERIVATIVE_FORMATS, DIGEST_LENGTH, build_picture_sources, derivative_name, \
+    generate_derivatives, get_image_variants, parse_variants, save_variants
+from catalog.views import BlogListView, MetricsView, ProductListView
+from catalog.filters import PRICE_RANGES, ProductFilter, build_facets, price_q
+from catalog.management.commands.bench_views import Command as BenchViewsCommand
+from catalog.local_cache import TIER_COUNTER, TwoTierCache, clear_local_caches, facets_cache
+from catalog.metrics import DURATION_BUCKETS, OUTBOX_SMTP_HISTOGRAM, MetricsRegistry, RequestMetrics, \
+    metrics_registry, render_prometheus
+from catalog.middleware import compile_cache_policies, iter_url_names
+from catalog.page_cache import aget_page_fragment, get_page_fragment, purge_page_cache, purge_page_group
+from catalog.services import flush_blog_views, get_pending_blog_views, increment_blog_views, recompute_category_stats
+from catalog.models import Category, Product, ProductVersion, Blog, OutboxEmail, ContactMessage, SearchEntry, \
+    SearchTerm, ImageDerivative
+from catalog.search import index_entry, index_product, index_products, rebuild_index, resolve_results, search
+from catalog.urls import get_urlpatterns
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QueryBudgetTests(TestCase):
+    """
+    Тесты бюджетов запросов к базе данных для всех маршрутов приложений catalog и users.
+
+    Маршруты, наборы данных и бюджеты описаны в catalog.benchmark и используются также командой bench_endpoints.
+    Каждый маршрут запрашивается с пустым и с заполненным кэшем; количество запросов не должно превышать бюджет и
+    не должно расти вместе с количеством объектов в базе данных.
+    """
+
+    # Маршруты списков, на которых проявляется проблема N+1.
+    LIST_ENDPOINTS = ('home', 'home_cursor', 'home_authenticated', 'home_filtered', 'blog', 'blog_cursor', 'search',
+                      'categories', 'category_detail')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = seed_dataset()
+
+    def setUp(self):
+        self.authenticated = self.client_class()
+        self.authenticated.force_login(self.dataset.user)
+
+    def measure(self, endpoint):
+        client = self.authenticated if endpoint.login else self.client
+
+        return measure_endpoint(client, endpoint, self.dataset, repeat=2)
+
+    def grow_dataset(self, count=30):
+        """
+        Добавляет в базу данных продукты с текущими версиями и статьи блога, которые попадают на первые страницы
+        списков.
+        """
+
+        products = Product.objects.bulk_create([
+            Product(name=f'Новый продукт {index}', category=self.dataset.product.category, price=Decimal(index),
+                    owner=self.dataset.user, is_published=True)
+            for index in range(count)
+        ])
+        ProductVersion.objects.bulk_create([
+            ProductVersion(product=product, version_number='1', version_name='Первая', is_current=True)
+            for product in products
+        ])
+        Blog.objects.bulk_create([
+            Blog(title=f'Новая статья {index}', slug=f'new-article-{index}', content='Содержание')
+            for index in range(count)
+        ])
+
+    def test_every_route_is_measured(self):
+        url_names = {name for name in iter_url_names() if name.startswith(('catalog:', 'users:'))}
+
+        self.assertEqual(url_names - {endpoint.url_name for endpoint in ENDPOINTS}, set())
+
+    def test_every_endpoint_has_budget(self):
+        self.assertEqual(set(QUERY_BUDGETS), {endpoint.name for endpoint in ENDPOINTS})
+
+    def test_query_budgets(self):
+        for endpoint in ENDPOINTS:
+            with self.subTest(endpoint=endpoint.name):
+                result = self.measure(endpoint)
+
+                self.assertEqual(result['status_code'], endpoint.status_code)
+                self.assertLessEqual(result['queries']['max'], QUERY_BUDGETS[endpoint.name])
+
+    def test_queries_do_not_depend_on_dataset_size(self):
+        endpoints = [endpoint for endpoint in ENDPOINTS if endpoint.name in self.LIST_ENDPOINTS]
+        before = {endpoint.name: self.measure(endpoint)['queries'] for endpoint in endpoints}
+
+        self.grow_dataset()
+
+        for endpoint in endpoints:
+            with self.subTest(endpoint=endpoint.name):
+                self.assertEqual(self.measure(endpoint)['queries'], before[endpoint.name])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProductListQueryTests(TestCase):
+    """
+    Тесты количества запросов списка продуктов с пустым кэшем: оно не превышает бюджет маршрута (то есть не растет с
+    количеством продуктов на странице) и не зависит от количества продуктов и версий в базе данных.
+    """
+
+    # Адрес -> маршрут catalog.benchmark, бюджет которого применяется.
+    PATHS = {
+        '/': 'home',
+        '/?page=2': 'home_page_2',
+        '/?cursor=': 'home_cursor',
+        '/?available=1': 'home_filtered',
+        '/?available=1&page=2': 'home_filtered_page_2',
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user(email='list@example.com', password='password')
+        cls.category = Category.objects.create(name='Категория')
+        cls.create_products(30)
+
+    @classmethod
+    def create_products(cls, count):
+        products = Product.objects.bulk_create([
+            Product(name=f'Продукт {index}', category=cls.category, price=Decimal(index + 1), owner=cls.owner,
+                    is_published=index % 3 != 0)
+            for index in range(count)
+        ])
+        ProductVersion.objects.bulk_create([
+            ProductVersion(product=product, version_number=str(number), version_name=f'Версия {number}',
+                           is_current=number == 2)
+            for product in products for number in (1, 2)
+        ])
+
+    def count_queries(self, path):
+        cache.clear()
+        clear_local_caches()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+
+        self.assertEqual(response.status_code, 200)
+
+        return len(queries)
+
+    def test_queries_do_not_depend_on_number_of_products(self):
+        small = {path: self.count_queries(path) for path in self.PATHS}
+
+        for path, endpoint_name in self.PATHS.items():
+            with self.subTest(path=path):
+                self.assertLessEqual(small[path], QUERY_BUDGETS[endpoint_name])
+
+        self.create_products(5000)
+
+        for path in self.PATHS:
+            with self.subTest(path=path):
+                self.assertEqual(self.count_queries(path), small[path])
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    """
+    Тесты двухуровневого кэша: L2 - отдельный экземпляр LocMemCache, общий для нескольких "процессов" (экземпляров
+    TwoTierCache), и счетчика обращений, через который проверяется, какой уровень ответил.
+    """
+
+    def setUp(self):
+        self.backend = LocMemCache('two-tier-tests', {})
+        self.backend.clear()
+
+    def make_cache(self, name='test', max_entries=10, timeout=60):
+        return TwoTierCache(name, max_entries=max_entries, timeout=timeout, backend=self.backend)
+
+    def count(self, name, tier, result):
+        labels = (('cache', name), ('tier', tier), ('result', result))
+
+        return metrics_registry.snapshot()['counters'].get((TIER_COUNTER, labels), 0)
+
+    def test_local_hit_does_not_read_backend(self):
+        local_cache = self.make_cache('local_hit')
+        local_cache.set('key', 'value', 60)
+
+        with mock.patch.object(self.backend, 'get_many') as get_many:
+            self.assertEqual(local_cache.get('key'), 'value')
+
+        get_many.assert_not_called()
+        self.assertEqual(self.count('local_hit', 'l1', 'hit'), 1)
+
+    def test_backend_hit_fills_local_tier(self):
+        writer, reader = self.make_cache('backend_hit'), self.make_cache('backend_hit')
+        writer.set('key', 'value', 60)
+
+        self.assertEqual(reader.get('key'), 'value')
+        self.assertEqual(reader.get('key'), 'value')
+        self.assertEqual(self.count('backend_hit', 'l2', 'hit'), 1)
+        self.assertEqual(self.count('backend_hit', 'l1', 'hit'), 1)
+
+    def test_generation_change_is_visible_to_all_processes(self):
+        first, second = self.make_cache(), self.make_cache()
+        self.backend.set('generation', 1)
+        first.set('snapshot:1', 'old', 60)
+        self.assertEqual(second.get('snapshot:1'), 'old')
+
+        self.backend.incr('generation')
+        key = f'snapshot:{self.backend.get("generation")}'
+
+        self.assertIsNone(second.get(key))
+        first.set(key, 'new', 60)
+        self.assertEqual(second.get(key), 'new')
+
+    def test_least_recently_used_entries_are_evicted(self):
+        local_cache = self.make_cache(max_entries=2)
+        local_cache.set_many({'a': 1, 'b': 2}, 60)
+        local_cache.get('a')
+        local_cache.set('c', 3, 60)
+        self.backend.clear()
+
+        self.assertEqual(local_cache.get_many(['a', 'b', 'c']), {'a': 1, 'c': 3})
+
+    def test_expired_entries_are_read_from_backend(self):
+        local_cache = self.make_cache(timeout=10)
+
+        with mock.patch('catalog.local_cache.time.monotonic', return_value=100):
+            local_cache.set('key', 'value', 60)
+
+        self.backend.set('key', 'updated', 60)
+
+        with mock.patch('catalog.local_cache.time.monotonic', return_value=105):
+            self.assertEqual(local_cache.get('key'), 'value')
+
+        with mock.patch('catalog.local_cache.time.monotonic', return_value=111):
+            self.assertEqual(local_cache.get('key'), 'updated')
+
+    def test_async_methods_share_local_tier(self):
+        local_cache = self.make_cache()
+        async_to_sync(local_cache.aset_many)({'a': 1, 'b': 2}, 60)
+        self.backend.clear()
+
+        self.assertEqual(async_to_sync(local_cache.aget)('a'), 1)
+        self.assertEqual(local_cache.get_many(['a', 'b']), {'a': 1, 'b': 2})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PageFragmentTests(SimpleTestCase):
+    """
+    Тесты кэша общих частей страниц stale-while-revalidate на функции построения, которая считает свои вызовы.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.group = 'a'
+
+    def build(self):
+        self.calls += 1
+
+        return {'value': f'1:{self.calls}', 'group': self.group}
+
+    def get(self, grouped=False):
+        if grouped:
+            fragment = get_page_fragment('test_group_page', 1, self.build, 60, 600, get_group=itemgetter('group'))
+        else:
+            fragment = get_page_fragment('test_page', 1, self.build, 60, 600)
+
+        return fragment['value']
+
+    def test_fresh_entry_is_served_from_cache(self):
+        self.assertEqual(self.get(), '1:1')
+        self.assertEqual(self.get(), '1:1')
+        self.assertEqual(self.calls, 1)
+
+    def test_async_version_shares_entries(self):
+        self.assertEqual(self.get(), '1:1')
+
+        async def abuild():
+            return self.build()
+
+        fragment = async_to_sync(aget_page_fragment)('test_page', 1, abuild, 60, 600)
+
+        self.assertEqual(fragment['value'], '1:1')
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_entry_is_served_while_another_request_revalidates(self):
+        self.get()
+
+        with mock.patch('catalog.page_cache.time.time', return_value=time.time() + 120):
+            # Блокировку перестройки удерживает другой запрос.
+            with mock.patch.object(cache, 'add', return_value=False):
+                self.assertEqual(self.get(), '1:1')
+
+            self.assertEqual(self.get(), '1:2')
+
+        self.assertEqual(self.get(), '1:2')
+
+    def test_purge_makes_changes_visible(self):
+        self.get()
+        purge_page_cache('test_page', [1])
+
+        self.assertEqual(self.get(), '1:2')
+
+    def test_missing_object_is_not_cached(self):
+        self.assertIsNone(get_page_fragment('test_page', 1, lambda: None, 60, 600))
+        self.assertEqual(self.get(), '1:1')
+
+    def test_group_purge_makes_changes_visible(self):
+        # Первое построение только запоминает группу страницы, второе сохраняется с версией группы.
+        self.get(grouped=True)
+        self.assertEqual(self.get(grouped=True), '1:2')
+        self.assertEqual(self.get(grouped=True), '1:2')
+
+        purge_page_group('test_group_page', 'b')
+        self.assertEqual(self.get(grouped=True), '1:2')
+
+        purge_page_group('test_group_page', 'a')
+        self.assertEqual(self.get(grouped=True), '1:3')
+        self.assertEqual(self.get(grouped=True), '1:3')
+
+    def test_group_change_is_remembered(self):
+        self.get(grouped=True)
+        self.get(grouped=True)
+
+        self.group = 'b'
+        purge_page_cache('test_group_page', [1])
+        self.assertEqual(self.get(grouped=True), '1:3')
+        self.assertEqual(self.get(grouped=True), '1:4')
+
+        purge_page_group('test_group_page', 'b')
+        self.assertEqual(self.get(grouped=True), '1:5')
+        self.assertEqual(self.get(grouped=True), '1:5')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProductPageCacheTests(TestCase):
+    """
+    Тесты страницы продукта: общая часть страницы кэшируется одна для всех пользователей, а кнопки владельца
+    рендерятся для каждого пользователя.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user(email='owner@example.com', password='password')
+        cls.visitor = get_user_model().objects.create_user(email='visitor@example.com', password='password')
+        category = Category.objects.create(name='Категория')
+        cls.product = Product.objects.create(name='Продукт', category=category, price=Decimal(100), owner=cls.owner,
+                                             is_published=True)
+
+    def setUp(self):
+        cache.clear()
+        self.owner_client = self.client_class()
+        self.owner_client.force_login(self.owner)
+        self.visitor_client = self.client_class()
+        self.visitor_client.force_login(self.visitor)
+        self.path = f'/product/{self.product.pk}/'
+
+    def get(self, client):
+        with mock.patch.object(services, '_product_page', wraps=services._product_page) as build:
+            response = client.get(self.path)
+
+        self.assertEqual(response.status_code, 200)
+
+        return response, build.call_count
+
+    def test_users_share_one_entry_and_one_revalidation(self):
+        # Первое построение запоминает группу страницы (категорию), второе сохраняет запись.
+        self.get(self.owner_client)
+        self.get(self.owner_client)
+
+        owner_response, builds = self.get(self.owner_client)
+        visitor_response, visitor_builds = self.get(self.visitor_client)
+
+        self.assertEqual((builds, visitor_builds), (0, 0))
+        self.assertContains(owner_response, 'Редактировать')
+        self.assertNotContains(visitor_response, 'Редактировать')
+        self.assertContains(visitor_response, 'Продукт')
+
+        expired = time.time() + settings.PRODUCT_PAGE_SOFT_TIMEOUT + 1
+
+        with mock.patch('catalog.page_cache.time.time', return_value=expired):
+            # Пока владелец перестраивает страницу, посетитель получает сохраненную часть страницы.
+            with mock.patch.object(cache, 'add', return_value=False):
+                self.assertEqual(self.get(self.visitor_client)[1], 0)
+
+            self.assertEqual(self.get(self.owner_client)[1], 1)
+            self.assertEqual(self.get(self.visitor_client)[1], 0)
+
+    def test_product_change_is_visible(self):
+        self.get(self.visitor_client)
+        self.get(self.visitor_client)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = Decimal(250)
+            self.product.save()
+
+        self.assertContains(self.get(self.visitor_client)[0], '250')
+
+    def test_missing_product_returns_404(self):
+        self.assertEqual(self.visitor_client.get('/product/0/').status_code, 404)
+        self.assertEqual(self.visitor_client.get('/product/0/').status_code, 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProductFeedTests(TestCase):
+    """
+    Тесты выгрузки каталога: инкрементальная выгрузка не раскрывает данные снятых с публикации продуктов.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = get_user_model().objects.create_user(email='feed@example.com', password='password')
+        cls.category = Category.objects.create(name='Категория')
+        cls.published = Product.objects.create(name='Опубликованный', description='Описание', sku='P-1',
+                                               category=cls.category, price=Decimal(100), owner=owner,
+                                               is_published=True)
+        cls.hidden = Product.objects.create(name='Секретный', description='Секретное описание', sku='H-1',
+                                            category=cls.category, price=Decimal(200), owner=owner)
+
+    def get_records(self, query=''):
+        response = self.client.get(f'/feed/jsonl/{query}')
+        content = b''.join(response.streaming_content).decode()
+
+        return {record['id']: record for record in map(json.loads, content.splitlines())}
+
+    def test_full_feed_contains_only_published_products(self):
+        self.assertEqual(set(self.get_records()), {self.published.pk})
+
+    def test_incremental_feed_hides_unpublished_product_data(self):
+        records = self.get_records('?since=1970-01-01')
+        hidden = records[self.hidden.pk]
+
+        self.assertEqual(records[self.published.pk]['name'], 'Опубликованный')
+        self.assertEqual(
+            {field for field, value in hidden.items() if value is not None},
+            {'id', 'sku', 'is_published', 'updated_at'},
+        )
+        self.assertNotIn('Секретн', json.dumps(hidden, ensure_ascii=False))
+
+    def test_category_change_touches_products_after_commit(self):
+        Product.objects.update(updated_at=timezone.now() - timedelta(days=1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'Новое наименование'
+            self.category.save()
+
+        self.assertFalse(Product.objects.filter(updated_at__lt=timezone.now() - timedelta(hours=1)).exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class SendOutboxTests(TestCase):
+    """
+    Тесты команды send_outbox: отправка писем из очереди, стирание текста отправленных писем и удаление старых записей.
+    """
+
+    def send_outbox(self, *args):
+        call_command('send_outbox', *args, stdout=StringIO())
+
+    def test_password_reset_email_is_sent_and_scrubbed(self):
+        user = get_user_model().objects.create_user(email='reset@example.com', password='password')
+        self.client.post('/users/password_reset/', {'email': user.email})
+
+        self.send_outbox()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [user.email])
+        new_password = mail.outbox[0].body.rsplit(' ', 1)[-1]
+        user.refresh_from_db()
+        self.assertTrue(user.check_password(new_password))
+
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.status, OutboxEmail.STATUS_SENT)
+        self.assertEqual(email.message, '')
+
+    def test_failed_email_is_retried_then_marked_dead(self):
+        OutboxEmail.objects.enqueue('Тема', 'Текст', ['user@example.com'])
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            self.send_outbox('--max-attempts=2', '--backoff=0')
+
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.status, email.attempts, email.message), (OutboxEmail.STATUS_DEAD, 2, ''))
+        self.assertEqual(mail.outbox, [])
+
+    def test_old_sent_and_dead_emails_are_purged(self):
+        for status in (OutboxEmail.STATUS_SENT, OutboxEmail.STATUS_DEAD, OutboxEmail.STATUS_PENDING):
+            OutboxEmail.objects.create(subject=status, message='', from_email='shop@example.com',
+                                       recipients=['user@example.com'], status=status,
+                                       next_attempt_at=timezone.now() + timedelta(days=1))
+
+        OutboxEmail.objects.update(created_at=timezone.now() - timedelta(days=30))
+        OutboxEmail.objects.create(subject='new', message='', from_email='shop@example.com',
+                                   recipients=['user@example.com'], status=OutboxEmail.STATUS_SENT)
+
+        self.send_outbox('--retention=86400')
+
+        self.assertEqual(set(OutboxEmail.objects.values_list('subject', flat=True)), {'pending', 'new'})
+
+    def test_smtp_time_is_recorded(self):
+        OutboxEmail.objects.enqueue('Тема', 'Текст', ['user@example.com'])
+        OutboxEmail.objects.enqueue('Тема', 'Текст', ['other@example.com'])
+        before = metrics_registry.snapshot()['histograms']
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=[1, OSError('down')]):
+            self.send_outbox('--max-attempts=1')
+
+        after = metrics_registry.snapshot()['histograms']
+
+        for operation, result in (('open', 'ok'), ('send', 'ok'), ('send', 'error')):
+            key = (OUTBOX_SMTP_HISTOGRAM, (('operation', operation), ('result', result)))
+            count = sum(after[key][:-1]) - sum(before.get(key, [0])[:-1])
+
+            with self.subTest(operation=operation, result=result):
+                self.assertEqual(count, 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MetricsTests(TestCase):
+    """
+    Тесты показателей обработки запросов: заголовок Server-Timing, корзины гистограмм, текстовый формат Prometheus и
+    доступ к представлению /metrics.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    @staticmethod
+    def create_registry():
+        registry = MetricsRegistry(publish_interval=60, max_processes=2)
+        # Фоновый поток публикации не запускается: показатели читаются из памяти.
+        registry._start_publisher = lambda: None
+
+        return registry
+
+    def test_server_timing_header(self):
+        response = self.client.get('/')
+
+        self.assertRegex(
+            response.headers['Server-Timing'],
+            r'^sql;dur=\d+\.\d{2};desc="\d+ queries", '
+            r'cache;dur=\d+\.\d{2};desc="\d+ calls, \d+ hits, \d+ misses", '
+            r'tpl;dur=\d+\.\d{2}, total;dur=\d+\.\d{2}$',
+        )
+
+        with self.settings(METRICS_SERVER_TIMING=False):
+            self.assertNotIn('Server-Timing', self.client.get('/').headers)
+
+    def test_histogram_buckets(self):
+        registry = self.create_registry()
+        request_metrics = RequestMetrics()
+        request_metrics.sql_time = 0.003
+
+        # Граница корзины входит в корзину (le), значения больше последней границы попадают в корзину +Inf.
+        for duration in (0.001, 0.003, 0.3, 20):
+            registry.observe('catalog:home', 200, duration, request_metrics)
+
+        histograms = registry.snapshot()['histograms']
+        duration = histograms[('http_request_duration_seconds', (('view', 'catalog:home'),))]
+        buckets = dict(zip((*DURATION_BUCKETS, '+Inf'), duration))
+
+        self.assertEqual((buckets[0.001], buckets[0.005], buckets[0.5], buckets['+Inf']), (1, 1, 1, 1))
+        self.assertEqual(sum(duration[:-1]), 4)
+        self.assertAlmostEqual(duration[-1], 20.304)
+        self.assertEqual(histograms[('http_request_sql_duration_seconds', (('view', 'catalog:home'),))][2], 4)
+
+    def test_render_prometheus(self):
+        registry = self.create_registry()
+        registry.observe('catalog:home', 200, 0.002, RequestMetrics())
+        registry.observe('catalog:home', 404, 0.2, RequestMetrics())
+        registry.observe_duration(OUTBOX_SMTP_HISTOGRAM, (('operation', 'send'), ('result', 'ok')), 0.02)
+        registry.increment('page_cache_requests_total', (('cache', 'a"b'), ('result', 'fresh')))
+
+        lines = render_prometheus(registry.snapshot()).splitlines()
+
+        for line in (
+            '# TYPE http_request_duration_seconds histogram',
+            'http_request_duration_seconds_bucket{view="catalog:home",le="0.001"} 0',
+            'http_request_duration_seconds_bucket{view="catalog:home",le="0.0025"} 1',
+            'http_request_duration_seconds_bucket{view="catalog:home",le="0.25"} 2',
+            'http_request_duration_seconds_bucket{view="catalog:home",le="+Inf"} 2',
+            'http_request_duration_seconds_sum{view="catalog:home"} 0.202000',
+            'http_request_duration_seconds_count{view="catalog:home"} 2',
+            'outbox_smtp_duration_seconds_bucket{operation="send",result="ok",le="0.025"} 1',
+            'outbox_smtp_duration_seconds_count{operation="send",result="ok"} 1',
+            '# TYPE http_responses_total counter',
+            'http_responses_total{view="catalog:home",status="200"} 1',
+            'http_responses_total{view="catalog:home",status="404"} 1',
+            'page_cache_requests_total{cache="a\\"b",result="fresh"} 1',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, lines)
+
+    def test_metrics_view_access(self):
+        user_model = get_user_model()
+        staff = user_model.objects.create_user(email='staff@example.com', password='password', is_staff=True)
+        user = user_model.objects.create_user(email='user@example.com', password='password')
+
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+        self.client.force_login(user)
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+        self.client.force_login(staff)
+        response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], MetricsView.content_type)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', response.content.decode())
+
+    @override_settings(METRICS_TOKEN='secret-token')
+    def test_metrics_view_bearer_token(self):
+        for header, status_code in (('Bearer secret-token', 200), ('bearer secret-token', 200),
+                                    ('Bearer wrong-token', 403), ('Basic secret-token', 403)):
+            with self.subTest(header=header):
+                self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION=header).status_code, status_code)
+
+
+class ContactMessagesTests(TestCase):
+    """
+    Тесты буфера сообщений формы обратной связи и их выгрузки командой export_contact_messages.
+    """
+
+    def test_export_does_not_overwrite_previous_segments(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            for number in range(2):
+                ContactMessage.objects.create(name=f'Имя {number}', phone='123', message='Текст')
+                call_command('export_contact_messages', '--output-dir', output_dir, '--delete', stdout=StringIO())
+
+            self.assertEqual(sorted(os.listdir(output_dir)), ['contact_messages-0001.jsonl',
+                                                              'contact_messages-0002.jsonl'])
+
+            with open(os.path.join(output_dir, 'contact_messages-0001.jsonl'), encoding='utf-8') as file:
+                self.assertEqual(json.loads(file.read())['name'], 'Имя 0')
+
+    def test_buffer_size_is_limited(self):
+        buffer = ContactMessageBuffer('batch', batch_size=10, flush_interval=60, max_pending=2)
+        buffer._thread = mock.Mock()
+
+        for number in range(3):
+            buffer.add(name=f'Имя {number}', phone='123', message='Текст')
+
+        self.assertEqual(ContactMessage.objects.get().name, 'Имя 2')
+        self.assertEqual(buffer.flush(), 2)
+
+        def fail_while_new_message_arrives(*args, **kwargs):
+            buffer.add(name='Имя 5', phone='123', message='Текст')
+            raise OSError('down')
+
+        buffer.add(name='Имя 3', phone='123', message='Текст')
+        buffer.add(name='Имя 4', phone='123', message='Текст')
+
+        with mock.patch.object(ContactMessage.objects, 'bulk_create', side_effect=fail_while_new_message_arrives):
+            with self.assertRaises(OSError), self.assertLogs('catalog.contact_buffer', 'ERROR'):
+                buffer.flush()
+
+        self.assertEqual([message.name for message in buffer._messages], ['Имя 4', 'Имя 5'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProductFilterTests(TestCase):
+    """
+    Тесты фильтров списка продуктов: нормализация параметров запроса, подсчет фасетов одним запросом и фасеты
+    страницы без фильтров из снимка каталога.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = seed_dataset()
+        cls.categories = list(Category.objects.order_by('pk').values_list('pk', flat=True))
+        Product.objects.filter(pk__in=Product.objects.order_by('pk').values('pk')[:5]).update(
+            is_published=False, price=Decimal(6000)
+        )
+
+    def test_equivalent_queries_are_normalized(self):
+        first, second = self.categories[:2]
+        product_filter = ProductFilter.from_query(QueryDict(
+            f'category={second}&category={first}&category={second}&price_min=150,5&price_max=110&available=1'
+        ))
+        same_filter = ProductFilter.from_query(QueryDict(
+            f'available=1&price_min=110.00&price_max=150.50&category={first}&category={second}'
+        ))
+
+        self.assertEqual(product_filter.categories, (first, second))
+        self.assertEqual((product_filter.price_min, product_filter.price_max), (Decimal('110.00'), Decimal('150.50')))
+        self.assertEqual(product_filter.to_query(), same_filter.to_query())
+
+    def test_invalid_values_are_ignored(self):
+        product_filter = ProductFilter.from_query(QueryDict(
+            'category=x&category=%C2%B2&category=-1&category=9999999999999999999999'
+            '&price_min=abc&price_max=NaN&available=yes'
+        ))
+
+        self.assertTrue(product_filter.is_empty())
+        self.assertEqual(self.client.get('/?category=%C2%B2').status_code, 200)
+
+    def test_facets_are_counted_in_one_query(self):
+        first, second = self.categories[:2]
+        filters = [
+            ProductFilter(),
+            ProductFilter(available=False),
+            ProductFilter(categories=[first, second], price_min=Decimal(100), price_max=Decimal(6000), available=True),
+        ]
+
+        for product_filter in filters:
+            with self.subTest(query=product_filter.to_query()):
+                with self.assertNumQueries(2):
+                    facets = build_facets(product_filter)
+
+                products = Product.objects.all()
+                self.assertEqual(facets['total'], product_filter.apply(products).count())
+
+                for pk, name, count in facets['categories']:
+                    expected = products.filter(product_filter.get_q(exclude='category'), category_id=pk).count()
+                    self.assertEqual(count, expected)
+
+                for (price_min, price_max), count in zip(PRICE_RANGES, facets['price_ranges']):
+                    expected = products.filter(product_filter.get_q(exclude='price'), price_q(price_min, price_max))
+                    self.assertEqual(count, expected.count())
+
+                for value in (True, False):
+                    expected = products.filter(product_filter.get_q(exclude='available'), is_published=value)
+                    self.assertEqual(facets['available'][value], expected.count())
+
+
+    def test_unfiltered_page_takes_facets_from_snapshot(self):
+        cache.clear()
+        clear_local_caches()
+        # Авторизованный пользователь: ответ главной страницы не берется из кэша CachePolicyMiddleware.
+        self.client.force_login(self.dataset.user)
+        self.client.get('/')
+
+        with mock.patch.object(facets_cache, 'get', wraps=facets_cache.get) as facets_get:
+            response = self.client.get('/')
+
+        facets_get.assert_not_called()
+        self.assertEqual(response.context['facets_total'], Product.objects.count())
+
+        product = Product.objects.filter(is_published=False).first()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.is_published = True
+            product.save()
+
+        response = self.client.get('/')
+        unpublished = Product.objects.filter(is_published=False).count()
+
+        self.assertEqual(
+            [facet['count'] for facet in response.context['facets']['available']],
+            [Product.objects.count() - unpublished, unpublished],
+        )
+        self.assertEqual(self.client.get('/?available=0').context['facets_total'], unpublished)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProductVersionConflictTests(TestCase):
+    """
+    Тесты сохранения версий продукта при нарушении уникального индекса текущей версии одновременным запросом.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email='owner@example.com', password='password')
+        cls.category = Category.objects.create(name='Категория')
+        cls.product = Product.objects.create(name='Продукт', category=cls.category, price=Decimal(100),
+                                             owner=cls.user)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def post(self, url, data):
+        versions = {
+            'versions-TOTAL_FORMS': '1', 'versions-INITIAL_FORMS': '0',
+            'versions-0-version_number': '2', 'versions-0-version_name': 'Новая', 'versions-0-is_current': 'on',
+        }
+
+        with mock.patch.object(VersionFormSet, 'save', side_effect=IntegrityError('unique_current_version')):
+            return self.client.post(url, {**data, **versions})
+
+    def test_update_conflict_is_shown_as_formset_error(self):
+        response = self.post(f'/product/{self.product.pk}/edit/', {'name': 'Новое наименование', 'price': '150'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Текущая версия продукта была изменена', response.context['formset'].non_form_errors()[0])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.name, 'Продукт')
+
+    def test_create_conflict_is_shown_as_formset_error(self):
+        response = self.post('/new_product/', {'name': 'Новый', 'category': self.category.pk, 'price': '150'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Текущая версия продукта была изменена', response.context['formset'].non_form_errors()[0])
+        self.assertIsNone(response.context['form'].instance.pk)
+        self.assertEqual(Product.objects.count(), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CachePolicyMiddlewareTests(TestCase):
+    """
+    Тесты кэширования ответов по таблице политик CACHE_POLICIES.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = seed_dataset()
+
+    def setUp(self):
+        cache.clear()
+
+    def assertServedFromCache(self, view_class, path):
+        with mock.patch.object(view_class, 'get', side_effect=AssertionError('представление не должно вызываться')):
+            return self.client.get(path)
+
+    def test_home_is_cached_for_anonymous_users(self):
+        first = self.client.get('/')
+        second = self.assertServedFromCache(ProductListView, '/')
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertIn('max-age=60', second['Cache-Control'])
+
+    def test_cache_hit_is_not_stored_again(self):
+        self.client.get('/')
+
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            response = self.assertServedFromCache(ProductListView, '/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([call for call in cache_set.call_args_list if call.args[0].startswith('cache_policy:')])
+
+    def test_product_change_is_shown_to_anonymous_users(self):
+        first = self.client.get('/').content.decode()
+        product = next(
+            product for product in Product.objects.filter(is_published=True).order_by('-pk')
+            if f'>{product.name}<' in first
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = 'Переименованный продукт'
+            product.save()
+
+        self.assertContains(self.client.get('/'), 'Переименованный продукт')
+
+    def test_home_is_not_cached_for_authenticated_users(self):
+        self.client.force_login(self.dataset.user)
+        self.client.get('/')
+
+        with mock.patch.object(ProductListView, 'get', return_value=HttpResponse('view')) as view:
+            self.client.get('/')
+
+        view.assert_called_once()
+
+    def test_blog_is_cached_per_cookie(self):
+        self.client.force_login(self.dataset.user)
+        # Первый ответ устанавливает cookie CSRF и не кэшируется, второй сохраняется в кэш.
+        self.client.get('/blog/')
+        first = self.client.get('/blog/')
+        second = self.assertServedFromCache(BlogListView, '/blog/')
+
+        self.assertEqual(second.content, first.content)
+        self.assertIn('Cookie', second['Vary'])
+
+        other_client = self.client_class()
+        other_client.force_login(get_user_model().objects.create_user(email='other@example.com', password='password'))
+        other_client.cookies.load({settings.CSRF_COOKIE_NAME: self.client.cookies[settings.CSRF_COOKIE_NAME].value})
+
+        with mock.patch.object(BlogListView, 'get', return_value=HttpResponse('view')) as view:
+            other_client.get('/blog/')
+
+        view.assert_called_once()
+
+    def test_invalid_timeout_is_rejected(self):
+        for timeout in (True, 0, -1, 1.5, '60', None):
+            with self.subTest(timeout=timeout), self.assertRaises(ImproperlyConfigured):
+                compile_cache_policies({'catalog:home': {'timeout': timeout}})
+
+    def test_unknown_generation_is_rejected(self):
+        for options in ({'timeout': 60, 'generation': 'blog'}, {'never_cache': True, 'generation': 'products'}):
+            with self.subTest(options=options), self.assertRaises(ImproperlyConfigured):
+                compile_cache_policies({'catalog:home': options})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FlushBlogViewsTests(TestCase):
+    """
+    Тесты переноса накопленных в кэше просмотров статей в базу данных.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.blogs = Blog.objects.bulk_create([
+            Blog(title=f'Статья {number}', slug=f'article-{number}', content='Текст', author_email='a@example.com')
+            for number in range(5)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def flush(self, chunk_size=2):
+        with self.captureOnCommitCallbacks(execute=True):
+            return flush_blog_views(chunk_size=chunk_size)
+
+    def views_count(self):
+        return dict(Blog.objects.values_list('pk', 'views_count'))
+
+    def test_only_viewed_articles_are_flushed(self):
+        viewed = {self.blogs[0].pk: 3, self.blogs[2].pk: 1, self.blogs[4].pk: 2}
+
+        for pk, views in viewed.items():
+            for _ in range(views):
+                increment_blog_views(pk)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.flush(), 6)
+
+        # Две порции (2 и 1 статья): для каждой - выборка строк статей порции и одно обновление. Идентификаторы всех
+        # статей не загружаются.
+        statements = [query['sql'].split()[0] for query in queries if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(statements, ['SELECT', 'UPDATE', 'SELECT', 'UPDATE'])
+
+        self.assertEqual(self.views_count(), {blog.pk: viewed.get(blog.pk, 0) for blog in self.blogs})
+        self.assertEqual([get_pending_blog_views(pk) for pk in viewed], [0, 0, 0])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.flush(), 0)
+
+        self.assertEqual(len(queries), 0)
+
+    def test_views_are_kept_when_database_update_fails(self):
+        pk = self.blogs[1].pk
+        increment_blog_views(pk)
+        increment_blog_views(pk)
+
+        with mock.patch.object(Blog.objects, 'bulk_update', side_effect=OSError('down')):
+            with self.assertRaises(OSError):
+                self.flush()
+
+        self.assertEqual(get_pending_blog_views(pk), 2)
+
+        increment_blog_views(pk)
+        self.assertEqual(self.flush(), 3)
+        self.assertEqual(self.views_count()[pk], 3)
+
+    def test_congratulation_email_is_sent_once(self):
+        pk = self.blogs[3].pk
+
+        for _ in range(99):
+            increment_blog_views(pk)
+
+        self.flush()
+        increment_blog_views(pk)
+        self.flush()
+        increment_blog_views(pk)
+        self.flush()
+
+        self.assertEqual(self.views_count()[pk], 101)
+        self.assertEqual(OutboxEmail.objects.filter(subject='Поздравляем!').count(), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ImportCatalogTests(TestCase):
+    """
+    Тесты команды import_catalog: кэш страниц и поисковый индекс обновляются порциями, количество запросов индексации
+    не зависит от количества продуктов, результат совпадает с индексацией по одному продукту.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user(email='import@example.com', password='password')
+        cls.category = Category.objects.create(name='Категория')
+
+    def create_products(self, count):
+        return Product.objects.bulk_create([
+            Product(name=f'Продукт {index}', description=f'Описание товара {index}', sku=f'S-{count}-{index}',
+                    category=self.category, price=Decimal(index + 1), owner=self.owner, is_published=index % 4 != 0)
+            for index in range(count)
+        ])
+
+    @staticmethod
+    def index_snapshot():
+        entries = SearchEntry.objects.values_list('kind', 'object_id', 'title', 'body', 'url')
+        terms = SearchTerm.objects.values_list('entry__kind', 'entry__object_id', 'term', 'weight')
+
+        return sorted(entries), sorted(terms)
+
+    def test_index_products_matches_index_product(self):
+        products = self.create_products(8)
+        # Устаревшая запись неопубликованного продукта удаляется, запись опубликованного - обновляется.
+        index_entry(SearchEntry.KIND_PRODUCT, products[0].pk, 'Старое', 'Старый текст', '/old/')
+        index_entry(SearchEntry.KIND_PRODUCT, products[1].pk, 'Старое', 'Старый текст', '/old/')
+
+        index_products(product.pk for product in products)
+        bulk = self.index_snapshot()
+
+        SearchEntry.objects.all().delete()
+
+        for product in Product.objects.select_related('category'):
+            index_product(product)
+
+        self.assertEqual(bulk, self.index_snapshot())
+        self.assertEqual(len(bulk[0]), 6)
+
+    def test_index_products_queries_do_not_depend_on_number_of_products(self):
+        counts = []
+
+        for count in (5, 50):
+            ids = [product.pk for product in self.create_products(count)]
+
+            with CaptureQueriesContext(connection) as queries:
+                index_products(ids)
+
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_import_updates_caches_and_index_in_chunks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'catalog.csv')
+
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write('sku,name,description,category,price\n')
+                file.writelines(f'I-{index},Импорт {index},Описание,Категория,{index + 1}\n' for index in range(5))
+
+            with mock.patch('catalog.management.commands.import_catalog.purge_page_cache') as purge:
+                call_command('import_catalog', path, owner=self.owner.email, chunk_size=2, publish=True,
+                             stdout=StringIO())
+
+        self.assertEqual([len(call.args[1]) for call in purge.call_args_list], [2, 2, 1])
+        self.assertEqual(
+            set(SearchEntry.objects.values_list('object_id', flat=True)),
+            set(Product.objects.filter(sku__startswith='I-').values_list('pk', flat=True)),
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SearchTests(TestCase):
+    """
+    Тесты полнотекстового поиска: результаты search() и страницы поиска, перестройка индекса на месте и заполнение
+    индекса миграцией 0024.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = get_user_model().objects.create_user(email='search@example.com', password='password')
+        cls.category = Category.objects.create(name='Электроника')
+        products = {
+            'Красный телефон': 'Смартфон с большим экраном',
+            'Синий телефон': 'Кнопочный телефон',
+            'Зарядка': 'Зарядное устройство для телефона',
+            'Чайник': 'Электрический чайник',
+        }
+        cls.products = {
+            name: Product.objects.create(name=name, description=description, sku=f'Q-{index}', category=cls.category,
+                                         price=Decimal(index + 1), owner=owner, is_published=True)
+            for index, (name, description) in enumerate(products.items())
+        }
+        cls.blog = Blog.objects.create(title='Как выбрать телефон', slug='choose-phone', content='Советы по выбору')
+        Blog.objects.create(title='Черновик про телефон', slug='draft', content='Черновик', is_published=False)
+
+    def setUp(self):
+        # Сигналы индексируют объекты после фиксации транзакции, в тестах индекс строится явно.
+        rebuild_index()
+
+    @staticmethod
+    def found(query):
+        return [entry.title for entry in resolve_results(search(query))]
+
+    def test_search_ranks_title_matches_first(self):
+        results = self.found('телефоны')
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(set(results[:3]), {'Красный телефон', 'Синий телефон', 'Как выбрать телефон'})
+        self.assertEqual(results[3], 'Зарядка')
+
+    def test_search_requires_all_terms(self):
+        self.assertEqual(self.found('красный телефон'), ['Красный телефон'])
+        self.assertEqual(self.found('зеленый телефон'), [])
+        self.assertEqual(self.found('   '), [])
+
+    def test_search_view(self):
+        response = self.client.get(reverse('catalog:search'), {'q': 'телефон кнопочный'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry.title for entry in response.context['results']], ['Синий телефон'])
+        product = self.products['Синий телефон']
+        self.assertContains(response, reverse('catalog:product_detail', kwargs={'pk': product.pk}))
+
+        response = self.client.get(reverse('catalog:search'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['results'], [])
+
+    def test_rebuild_index_updates_entries_in_place_and_removes_stale(self):
+        entry_ids = set(SearchEntry.objects.values_list('pk', flat=True))
+        Product.objects.filter(pk=self.products['Чайник'].pk).update(is_published=False)
+        Product.objects.filter(pk=self.products['Зарядка'].pk).update(name='Зарядка для телефона')
+        Blog.objects.filter(pk=self.blog.pk).delete()
+
+        self.assertEqual(rebuild_index(chunk_size=2), 3)
+
+        self.assertLess(set(SearchEntry.objects.values_list('pk', flat=True)), entry_ids)
+        self.assertEqual(self.found('чайник'), [])
+        self.assertEqual(self.found('зарядка телефон'), ['Зарядка для телефона'])
+        self.assertEqual(self.found('выбрать'), [])
+
+    def test_migration_backfill_matches_rebuild_index(self):
+        expected = ImportCatalogTests.index_snapshot()
+        SearchEntry.objects.all().delete()
+        migration = import_module('catalog.migrations.0024_backfill_search_index')
+
+        # Функция миграции использует только connection схемы, отдельный редактор схемы не нужен.
+        migration.backfill_search_index(django_apps, mock.Mock(connection=connection))
+
+        self.assertEqual(ImportCatalogTests.index_snapshot(), expected)
+        self.assertEqual(len(expected[0]), 5)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CategoryStatsTests(TestCase):
+    """
+    Тесты инкрементального обновления статистики категорий при сохранении и удалении продуктов: после каждого
+    изменения статистика совпадает с пересчитанной recompute_category_stats().
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user(email='stats@example.com', password='password')
+        cls.first = Category.objects.create(name='Первая')
+        cls.second = Category.objects.create(name='Вторая')
+
+    @staticmethod
+    def stats():
+        return list(
+            Category.objects.order_by('pk').values_list('pk', 'product_count', 'published_count', 'min_price',
+                                                         'max_price')
+        )
+
+    def assertStatsConsistent(self):
+        incremental = self.stats()
+        recompute_category_stats()
+        self.assertEqual(incremental, self.stats())
+
+    def change(self, func, *args, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = func(*args, **kwargs)
+
+        self.assertStatsConsistent()
+
+        return result
+
+    def create(self, price, category=None, is_published=True):
+        return self.change(Product.objects.create, name=f'Продукт {price}', price=Decimal(price), owner=self.owner,
+                           category=category or self.first, is_published=is_published)
+
+    def save(self, product, **fields):
+        for name, value in fields.items():
+            setattr(product, name, value)
+
+        self.change(product.save)
+
+    def test_create_and_publish(self):
+        product = self.create(100, is_published=False)
+        self.assertEqual(self.stats()[0][1:], (1, 0, None, None))
+
+        self.create(300)
+        self.save(product, is_published=True)
+        self.assertEqual(self.stats()[0][1:], (2, 2, Decimal(100), Decimal(300)))
+
+        self.save(product, is_published=False)
+        self.assertEqual(self.stats()[0][1:], (2, 1, Decimal(300), Decimal(300)))
+
+    def test_price_change(self):
+        cheap = self.create(100)
+        expensive = self.create(500)
+        self.create(300)
+
+        self.save(cheap, price=Decimal(200))
+        self.save(expensive, price=Decimal(400))
+        self.save(cheap, price=Decimal(50))
+        self.save(expensive, price=Decimal(900))
+        self.assertEqual(self.stats()[0][3:], (Decimal(50), Decimal(900)))
+
+    def test_category_move(self):
+        product = self.create(100)
+        self.create(200, category=self.second)
+        self.create(300, category=self.second, is_published=False)
+
+        self.save(product, category=self.second)
+        self.save(product, category=self.first, price=Decimal(700), is_published=False)
+        self.assertEqual(self.stats(), [
+            (self.first.pk, 1, 0, None, None),
+            (self.second.pk, 2, 1, Decimal(200), Decimal(200)),
+        ])
+
+    def test_delete(self):
+        products = [self.create(price) for price in (100, 200, 300)]
+
+        self.change(products[2].delete)
+        self.change(products[0].delete)
+        self.assertEqual(self.stats()[0][1:], (1, 1, Decimal(200), Decimal(200)))
+
+        self.change(Product.objects.filter(pk=products[1].pk).delete)
+        self.assertEqual(self.stats()[0][1:], (0, 0, None, None))
+
+    def test_deferred_fields_are_recomputed(self):
+        product = self.create(100)
+        deferred = Product.objects.only('name').get(pk=product.pk)
+
+        self.save(deferred, name='Новое наименование')
+        self.save(Product.objects.only('name', 'category').get(pk=product.pk), category=self.second)
+        self.change(Product.objects.only('name').get(pk=product.pk).delete)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AsyncViewsTests(TestCase):
+    """
+    Тесты асинхронных представлений (catalog.async_views, get_urlpatterns(async_views=True)): ответы и контекст
+    шаблонов совпадают с синхронными представлениями.
+    """
+
+    # Адрес -> переменные контекста, которые сравниваются с синхронным представлением.
+    CONTEXT_KEYS = {
+        '/': ('product_cards', 'facets', 'facets_total', 'page_obj'),
+        '/?available=1': ('product_cards', 'facets', 'facets_total', 'page_obj'),
+        '/?cursor=': ('product_cards', 'cursor_pagination'),
+        '/product/{product}/': ('product_id', 'product_html', 'is_owner'),
+        '/blog/': ('blog_cards', 'page_obj'),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = seed_dataset()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.async_urlconf = BenchViewsCommand.build_urlconf(async_views=True)
+
+    def setUp(self):
+        self.client.force_login(self.dataset.user)
+        self.async_client.force_login(self.dataset.user)
+
+    def get(self, path, async_views, clear_cache=True):
+        if clear_cache:
+            cache.clear()
+            clear_local_caches()
+
+        if not async_views:
+            return self.client.get(path)
+
+        with self.settings(ROOT_URLCONF=self.async_urlconf):
+            return async_to_sync(self.async_client.get)(path)
+
+    @staticmethod
+    def without_csrf(response):
+        # Маскированный токен CSRF различается в каждом ответе.
+        return re.sub(r'name="csrfmiddlewaretoken" value="[^"]*"', '', response.content.decode())
+
+    def test_async_urlpatterns_use_async_views(self):
+        patterns = {pattern.name: pattern.callback for pattern in get_urlpatterns(async_views=True)}
+
+        for name in ('home', 'product_detail', 'blog', 'blog_detail'):
+            with self.subTest(name=name):
+                self.assertTrue(iscoroutinefunction(patterns[name]))
+
+        self.assertFalse(iscoroutinefunction(get_urlpatterns()[0].callback))
+
+    def test_context_matches_sync_views(self):
+        for template, keys in self.CONTEXT_KEYS.items():
+            path = template.format(product=self.dataset.product.pk)
+
+            with self.subTest(path=path):
+                sync_response = self.get(path, async_views=False)
+                async_response = self.get(path, async_views=True)
+
+                self.assertEqual(async_response.status_code, 200)
+                self.assertEqual(sync_response.status_code, 200)
+                self.assertEqual(self.without_csrf(async_response), self.without_csrf(sync_response))
+
+                for key in keys:
+                    self.assertEqual(repr(async_response.context[key]), repr(sync_response.context[key]), key)
+
+    def test_blog_detail_counts_views(self):
+        path = f'/blog/{self.dataset.blog.slug}/'
+        sync_response = self.get(path, async_views=False)
+        async_response = self.get(path, async_views=True, clear_cache=False)
+
+        self.assertEqual(async_response.status_code, 200)
+        self.assertEqual(async_response.context['object'].pk, sync_response.context['object'].pk)
+        self.assertEqual(async_response.context['object'].views_count, sync_response.context['object'].views_count + 1)
+
+    def test_missing_objects_return_404(self):
+        for path in ('/product/0/', '/blog/missing-article/'):
+            with self.subTest(path=path):
+                self.assertEqual(self.get(path, async_views=True).status_code, 404)
+
+    def test_anonymous_user_is_redirected_to_login(self):
+        self.async_client.logout()
+
+        response = self.get(f'/product/{self.dataset.product.pk}/', async_views=True)
+
+        self.assertEqual(response.status_code, 302)
+
+
+class AsyncRedisCacheTests(SimpleTestCase):
+    """
+    Тесты пулов соединений redis.asyncio бэкенда AsyncRedisCache: отдельный пул для каждого цикла событий, запись на
+    основной сервер, чтение с реплики. Соединения с Redis не открываются.
+    """
+
+    def setUp(self):
+        self.cache = AsyncRedisCache('redis://primary:6379/0,redis://replica:6379/0', {})
+
+    def get_pools(self):
+        async def pools():
+            return (
+                self.cache.get_async_client(write=True).connection_pool,
+                self.cache.get_async_client(write=True).connection_pool,
+                self.cache.get_async_client().connection_pool,
+            )
+
+        return asyncio.run(pools())
+
+    def test_pools_are_reused_within_event_loop(self):
+        write_pool, same_write_pool, read_pool = self.get_pools()
+
+        self.assertIs(write_pool, same_write_pool)
+        self.assertEqual(write_pool.connection_kwargs['host'], 'primary')
+        self.assertEqual(read_pool.connection_kwargs['host'], 'replica')
+
+    def test_each_event_loop_has_own_pools(self):
+        first = self.get_pools()
+        second = self.get_pools()
+
+        self.assertIsNot(first[0], second[0])
+        self.assertIsNot(first[2], second[2])
+
+    def test_single_server_is_used_for_reads_and_writes(self):
+        cache_backend = AsyncRedisCache('redis://primary:6379/0', {})
+
+        self.assertEqual({cache_backend.get_server_index(write) for write in (True, False, False)}, {0})
+        self.assertEqual({self.cache.get_server_index(write=False) for _ in range(20)}, {1})
+
+
+@override_settings(CACHES=LOCMEM_CACHES, IMAGE_DERIVATIVE_WIDTHS=(320, 640, 1280))
+class ImageDerivativesTests(TestCase):
+    """
+    Тесты уменьшенных копий изображений (catalog.images): имена файлов с контрольной суммой, отсутствие увеличения,
+    замена прозрачности белым фоном в JPEG, значения srcset тега picture и повторное создание копий командой
+    generate_image_derivatives.
+    """
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = self.settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        cache.clear()
+
+    @staticmethod
+    def save_image(name, size, mode='RGB', color=(0, 128, 255)):
+        buffer = io.BytesIO()
+        Image.new(mode, size, color).save(buffer, 'PNG')
+
+        return default_storage.save(name, ContentFile(buffer.getvalue())), buffer.getvalue()
+
+    @staticmethod
+    def open_derivative(source, variants, width, extension):
+        digest, widths = parse_variants(variants)
+
+        return Image.open(default_storage.open(derivative_name(source, digest, width, extension)))
+
+    def test_names_contain_source_digest(self):
+        source, data = self.save_image('products/phone.png', (2000, 1000))
+        digest = hashlib.sha256(data).hexdigest()[:DIGEST_LENGTH]
+
+        self.assertEqual(generate_derivatives(source), (source, f'{digest}:320,640,1280'))
+
+        for width in (320, 640, 1280):
+            for extension in DERIVATIVE_FORMATS:
+                name = f'derivatives/products/phone.{digest}.{width}w.{extension}'
+
+                with self.subTest(name=name):
+                    self.assertTrue(default_storage.exists(name))
+
+                    with Image.open(default_storage.open(name)) as image:
+                        self.assertEqual(image.size, (width, width // 2))
+
+        # Новое содержимое файла с тем же именем дает новые имена копий.
+        default_storage.delete(source)
+        self.save_image('products/phone.png', (2000, 1000), color=(255, 0, 0))
+        self.assertNotEqual(parse_variants(generate_derivatives(source)[1])[0], digest)
+
+    def test_small_image_is_not_upscaled(self):
+        source, data = self.save_image('products/small.png', (500, 250))
+        variants = generate_derivatives(source)[1]
+
+        self.assertEqual(parse_variants(variants)[1], [320, 500])
+
+        with self.open_derivative(source, variants, 500, 'webp') as image:
+            self.assertEqual(image.size, (500, 250))
+
+    def test_transparent_image_is_flattened_for_jpeg(self):
+        source, data = self.save_image('products/logo.png', (400, 400), mode='RGBA', color=(255, 0, 0, 0))
+        variants = generate_derivatives(source)[1]
+
+        with self.open_derivative(source, variants, 320, 'jpg') as image:
+            self.assertEqual(image.mode, 'RGB')
+            self.assertTrue(all(channel >= 250 for channel in image.getpixel((10, 10))))
+
+        with self.open_derivative(source, variants, 320, 'webp') as image:
+            self.assertEqual(image.mode, 'RGBA')
+            self.assertEqual(image.getpixel((10, 10))[3], 0)
+
+    def test_save_variants_updates_database_and_cache(self):
+        generation = services.get_products_generation()
+
+        save_variants([('products/phone.png', 'abc:320')])
+        save_variants([('products/phone.png', 'def:320,640')])
+
+        self.assertEqual(ImageDerivative.objects.get().variants, 'def:320,640')
+        self.assertNotEqual(services.get_products_generation(), generation)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_image_variants('products/phone.png'), 'def:320,640')
+
+    def test_picture_sources(self):
+        sources = build_picture_sources('products/phone.png', 'abc123:320,640')
+        prefix = f'{settings.MEDIA_URL}derivatives/products/phone.abc123'
+
+        self.assertEqual(sources, {
+            'webp': ('image/webp', f'{prefix}.320w.webp 320w, {prefix}.640w.webp 640w'),
+            'jpg': ('image/jpeg', f'{prefix}.320w.jpg 320w, {prefix}.640w.jpg 640w'),
+            'src': f'{prefix}.640w.jpg',
+        })
+        self.assertEqual(build_picture_sources('products/phone.png', ''), {})
+
+        template = Template('{% load custom_filters %}{% picture image "Телефон" "25vw" variants %}')
+        html = template.render(Context({'image': 'products/phone.png', 'variants': 'abc123:320,640'}))
+
+        self.assertInHTML(
+            f'<source type="image/webp" srcset="{sources["webp"][1]}" sizes="25vw">', html,
+        )
+        self.assertInHTML(
+            f'<img src="{prefix}.640w.jpg" srcset="{sources["jpg"][1]}" sizes="25vw" class="img-fluid" '
+            f'alt="Телефон" loading="lazy">',
+            html,
+        )
+
+        html = template.render(Context({'image': 'products/phone.png', 'variants': ''}))
+
+        self.assertInHTML('<img src="/media/products/phone.png" class="img-fluid" alt="Телефон">', html)
+
+    def test_command_creates_missing_derivatives(self):
+        owner = get_user_model().objects.create_user(email='images@example.com', password='password')
+        category = Category.objects.create(name='Категория')
+
+        for name in ('first', 'second'):
+            source, data = self.save_image(f'products/{name}.png', (100, 100))
+            Product.objects.create(name=name, sku=name, category=category, price=Decimal(1), owner=owner,
+                                   preview=source)
+
+        # Копии первого изображения уже созданы, копии второго потеряны вместе с задачей пула процессов.
+        save_variants([generate_derivatives('products/first.png')])
+
+        # Пул потоков вместо пула процессов: результат тот же, но тест не запускает процессы.
+        with mock.patch('catalog.management.commands.generate_image_derivatives.ProcessPoolExecutor',
+                        ThreadPoolExecutor):
+            stdout = StringIO()
+            call_command('generate_image_derivatives', stdout=stdout)
+
+        self.assertIn('Изображений для обработки: 1', stdout.getvalue())
+        self.assertEqual(
+            sorted(ImageDerivative.objects.values_list('source', flat=True)),
+            ['products/first.png', 'products/second.png'],
+        )
@@ -0,0 +1,66 @@
+import re
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+MIN_STEM_LENGTH = 3
+
+# Окончания и суффиксы русского языка, отбрасываемые при нормализации слова. Отсортированы по убыванию длины, чтобы
+# отбрасывалось самое длинное подходящее окончание.
+RUSSIAN_ENDINGS = sorted({
+    'ами', 'ями', 'ому', 'ему', 'ого', 'его', 'ыми', 'ими', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ой', 'ей', 'ый',
+    'ий', 'ую', 'юю', 'ам', 'ям', 'ах', 'ях', 'ом', 'ем', 'ов', 'ев', 'ию', 'ия', 'ии', 'ью', 'ть', 'ешь',
+    'ет', 'ют', 'ут', 'ит', 'ат', 'ят', 'ла', 'ло', 'ли', 'ать', 'ять', 'ить', 'еть', 'а', 'я', 'о', 'е', 'ы', 'и',
+    'у', 'ю', 'ь', 'й',
+}, key=len, reverse=True)
+
+
+def tokenize(text):
+    """
+    Разбивает текст на слова в нижнем регистре.
+
+    Параметры:
+        text (str): Исходный текст.
+
+    Возвращает:
+        list: Список слов.
+    """
+
+    return WORD_RE.findall((text or '').lower())
+
+
+def stem(word):
+    """
+    Возвращает основу слова, отбрасывая типичное окончание русского языка.
+
+    Нормализация упрощенная: отбрасывается самое длинное подходящее окончание при условии, что основа остается не
+    короче MIN_STEM_LENGTH символов. Этого достаточно, чтобы разные формы одного слова ("книга", "книги", "книгой")
+    приводились к одной основе.
+
+    Параметры:
+        word (str): Слово в нижнем регистре.
+
+    Возвращает:
+        str: Основа слова.
+    """
+
+    word = word.replace('ё', 'е')
+
+    for ending in RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+
+    return word
+
+
+def stems(text):
+    """
+    Возвращает основы всех слов текста в порядке их следования.
+
+    Параметры:
+        text (str): Исходный текст.
+
+    Возвращает:
+        list: Список основ.
+    """
+
+    return [stem(word) for word in tokenize(text)]
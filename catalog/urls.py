@@ -1,22 +1,46 @@
+from django.conf import settings
 from django.urls import path
-from django.views.decorators.cache import cache_page
 
 from catalog.apps import CatalogConfig
+from catalog.async_views import AsyncProductListView, AsyncProductDetailView, AsyncBlogListView, AsyncBlogDetailView
 from catalog.views import ProductListView, ContactView, ProductDetailView, ProductCreateView, BlogListView, \
-    BlogCreateView, BlogDetailView, BlogUpdateView, BlogDeleteView, ProductUpdateView, ProductDeleteView
+    BlogCreateView, BlogDetailView, BlogUpdateView, BlogDeleteView, ProductUpdateView, ProductDeleteView, SearchView, \
+    ProductFeedView, CategoryListView, CategoryDetailView
 
 app_name = CatalogConfig.name
 
-urlpatterns = [
-    path('', ProductListView.as_view(), name='home'),
-    path('contacts/', ContactView.as_view(), name='contacts'),
-    path('product/<int:pk>/', cache_page(60)(ProductDetailView.as_view()), name='product_detail'),
-    path('new_product/', ProductCreateView.as_view(), name='new_product'),
-    path('blog/', BlogListView.as_view(), name='blog'),
-    path('blog/new/', BlogCreateView.as_view(), name='new_blog'),
-    path('blog/<slug:slug>/', BlogDetailView.as_view(), name='blog_detail'),
-    path('blog/<slug:slug>/edit/', BlogUpdateView.as_view(), name='blog_edit'),
-    path('blog/<slug:slug>/delete/', BlogDeleteView.as_view(), name='blog_delete'),
-    path('product/<int:pk>/edit/', ProductUpdateView.as_view(), name='product_update'),
-    path('product/<int:pk>/delete/', ProductDeleteView.as_view(), name='product_delete'),
-]
+
+def get_urlpatterns(async_views=False):
+    """
+    Возвращает маршруты приложения.
+
+    Параметры:
+        async_views (bool): Использовать асинхронные версии представлений чтения каталога и блога
+                            (catalog.async_views) для запуска под ASGI.
+    """
+
+    product_list = AsyncProductListView if async_views else ProductListView
+    product_detail = AsyncProductDetailView if async_views else ProductDetailView
+    blog_list = AsyncBlogListView if async_views else BlogListView
+    blog_detail = AsyncBlogDetailView if async_views else BlogDetailView
+
+    return [
+        path('', product_list.as_view(), name='home'),
+        path('contacts/', ContactView.as_view(), name='contacts'),
+        path('product/<int:pk>/', product_detail.as_view(), name='product_detail'),
+        path('new_product/', ProductCreateView.as_view(), name='new_product'),
+        path('blog/', blog_list.as_view(), name='blog'),
+        path('blog/new/', BlogCreateView.as_view(), name='new_blog'),
+        path('blog/<slug:slug>/', blog_detail.as_view(), name='blog_detail'),
+        path('blog/<slug:slug>/edit/', BlogUpdateView.as_view(), name='blog_edit'),
+        path('blog/<slug:slug>/delete/', BlogDeleteView.as_view(), name='blog_delete'),
+        path('product/<int:pk>/edit/', ProductUpdateView.as_view(), name='product_update'),
+        path('product/<int:pk>/delete/', ProductDeleteView.as_view(), name='product_delete'),
+        path('search/', SearchView.as_view(), name='search'),
+        path('feed/<str:feed_format>/', ProductFeedView.as_view(), name='product_feed'),
+        path('categories/', CategoryListView.as_view(), name='categories'),
+        path('categories/<int:pk>/', CategoryDetailView.as_view(), name='category_detail'),
+    ]
+
+
+urlpatterns = get_urlpatterns(settings.CATALOG_ASYNC_VIEWS)
@@ -1,19 +1,43 @@
-from datetime import datetime
-
+from django.conf import settings
 from django.contrib.auth.mixins import PermissionRequiredMixin
+from django.db import IntegrityError, transaction
 from django.forms import inlineformset_factory
+from django.http import HttpResponseRedirect, StreamingHttpResponse, Http404, HttpResponseBadRequest, HttpResponse, \
+    HttpResponseForbidden
+from django.shortcuts import get_object_or_404
 from django.urls import reverse_lazy
+from django.utils.cache import patch_vary_headers, add_never_cache_headers
+from django.utils.crypto import constant_time_compare
+from django.utils.safestring import mark_safe
+from django.views import View
 from django.views.generic import ListView, TemplateView, DetailView, CreateView, UpdateView, DeleteView
 
-from catalog.forms import ProductForm, VersionForm
-from catalog.mixins import CustomLoginRequiredMixin
-from catalog.models import Product, Contact, Blog, ProductVersion
-from catalog.services import get_cached_products
+from catalog import search
+from catalog.filters import ProductFilter, get_facets, get_facet_links
+from catalog.feeds import FEED_CONTENT_TYPES, parse_since, render_feed, encode_feed
+from catalog.contact_buffer import contact_message_buffer
+from catalog.metrics import metrics_registry, render_prometheus
+from catalog.forms import ProductForm, VersionForm, VersionFormSet, BlogForm
+from catalog.mixins import CustomLoginRequiredMixin, KeysetPaginationMixin
+from catalog.models import Product, Contact, Blog, ProductVersion, Category
+from catalog.services import get_products_queryset, get_catalog_snapshot, get_product_page, increment_blog_views, \
+    render_product_cards, render_blog_cards, product_row, preview_variants_subquery
+
+# Ошибка набора форм версий, когда другой запрос одновременно отметил текущей другую версию продукта и сохранение
+# нарушило уникальный индекс unique_current_version_per_product.
+CURRENT_VERSION_CONFLICT = 'Текущая версия продукта была изменена другим пользователем. Проверьте версии и сохраните ' \
+                           'продукт еще раз.'
 
 
-class ProductListView(ListView):
+class ProductListView(KeysetPaginationMixin, ListView):
     """
-    Представление на основе классов для вывода списка продуктов с пагинацией.
+    Представление на основе классов для вывода списка продуктов с пагинацией и фильтрами.
+
+    По умолчанию страницы выбираются из кэшированного снимка каталога. При наличии параметра запроса cursor продукты
+    выводятся постранично по курсору непосредственно из базы данных (см. KeysetPaginationMixin). Если заданы фильтры
+    по категориям, цене или наличию (catalog.filters.ProductFilter), продукты выбираются из базы данных по индексам,
+    а количество продуктов для постраничной навигации берется из фасетов, которые выводятся над списком. Фасеты без
+    выбранных фильтров хранятся в снимке каталога, поэтому страница из снимка не читает кэш фасетов.
 
     Атрибуты класса:
     - model: Указывает, какая модель будет использоваться для представления данных (Product).
@@ -22,36 +46,101 @@ class ProductListView(ListView):
                      ('catalog/product_list.html').
 
     Методы:
+    - setup(self, request, *args, **kwargs):
+        Разбирает фильтры из параметров запроса.
+
+    - get_facets(self):
+        Возвращает количество продуктов для значений фильтров (catalog.filters.get_facets()).
+
+    - get_filter_context(self):
+        Возвращает контекст фильтров для шаблона.
+
+    - reads_database(self):
+        Возвращает True, если продукты выбираются из базы данных, а не из снимка каталога.
+
     - get_context_data(self, **kwargs):
-        Переопределяет метод для добавления к контексту данных о продуктах и их текущих версиях.
+        Переопределяет метод для добавления к контексту карточек продуктов текущей страницы и фильтров. Карточки
+        берутся из общего кэша фрагментов, отсутствующие рендерятся из строк снимка каталога.
         Возвращает:
-            context (dict): Контекст с добавленными продуктами и их текущими версиями.
+            context (dict): Контекст с добавленными карточками продуктов и фильтрами.
 
     - get_queryset(self):
-        Переопределяет метод для получения кэшированных продуктов.
+        Переопределяет метод для получения строк кэшированного снимка каталога (фасеты снимка сохраняются в атрибут
+        facets), а в режиме курсора или при заданных фильтрах - QuerySet продуктов.
         Возвращает:
-            queryset (QuerySet): Кэшированный QuerySet продуктов.
+            list | QuerySet: Строки снимка каталога или QuerySet продуктов.
+
+    - get_paginator(self, queryset, per_page, **kwargs):
+        При заданных фильтрах передает в Paginator количество продуктов из фасетов вместо запроса COUNT(*).
     """
 
     model = Product
     paginate_by = 10
     template_name = 'catalog/product_list.html'
+    facets = None
+
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+
+        self.product_filter = ProductFilter.from_query(request.GET)
+
+    def get_facets(self):
+        if self.facets is None:
+            self.facets = get_facets(self.product_filter)
+
+        return self.facets
+
+    def reads_database(self):
+        """
+        Возвращает True, если продукты выбираются из базы данных, а не из снимка каталога.
+        """
+
+        return self.is_cursor_mode() or not self.product_filter.is_empty()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        products_with_versions = []
+        rows = context['object_list']
 
-        for product in get_cached_products():
-            current_version = product.versions.filter(is_current=True).first()
-            products_with_versions.append((product, current_version))
+        if self.reads_database():
+            rows = [product_row(product) for product in rows]
 
-        context['products_with_versions'] = products_with_versions
+        context['product_cards'] = render_product_cards(rows)
+        context.update(self.get_filter_context())
 
         return context
 
+    def get_filter_context(self):
+        """
+        Возвращает контекст фильтров: выбранные фильтры, значения фасетов с количеством продуктов и строку запроса
+        фильтров для ссылок постраничной навигации.
+        """
+
+        facets = self.get_facets()
+
+        return {
+            'product_filter': self.product_filter,
+            'facets': get_facet_links(self.product_filter, facets),
+            'facets_total': facets['total'],
+            'filter_query': f'{self.product_filter.to_query()}&' if not self.product_filter.is_empty() else '',
+        }
+
     def get_queryset(self):
-        return get_cached_products()
+        if self.reads_database():
+            return self.product_filter.apply(get_products_queryset())
+
+        snapshot = get_catalog_snapshot()
+        self.facets = snapshot.facets
+
+        return snapshot.rows
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        paginator = super().get_paginator(queryset, per_page, **kwargs)
+
+        if not self.product_filter.is_empty():
+            paginator.count = self.get_facets()['total']
+
+        return paginator
 
 
 class ContactView(CustomLoginRequiredMixin, TemplateView):
@@ -67,8 +156,8 @@ class ContactView(CustomLoginRequiredMixin, TemplateView):
     template_name (str): Имя HTML-шаблона для отображения контактов.
 
     Методы:
-    post(request) (HttpResponse): Метод для обработки POST-запросов, сохраняет отправленные данные в файл и возвращает
-                                  ответ.
+    post(request) (HttpResponse): Метод для обработки POST-запросов, передает отправленное сообщение в буфер сообщений
+                                  обратной связи и возвращает ответ.
     get_context_data(**kwargs) (dict): Переопределенный метод для добавления дополнительного контекста (список
                                        контактов).
     """
@@ -78,12 +167,11 @@ class ContactView(CustomLoginRequiredMixin, TemplateView):
 
     def post(self, request):
         if request.method == 'POST':
-            name = request.POST.get('name')
-            phone = request.POST.get('phone')
-            message = request.POST.get('message')
+            name = request.POST.get('name', '')[:100]
+            phone = request.POST.get('phone', '')[:35]
+            message = request.POST.get('message', '')
 
-            with open('messages.txt', 'a+', encoding='utf-8') as file:
-                file.write(f"{datetime.now()} - {name} ({phone}): {message}\n")
+            contact_message_buffer.add(name=name, phone=phone, message=message)
 
         contact_details = Contact.objects.all()
         context = {
@@ -100,31 +188,42 @@ class ContactView(CustomLoginRequiredMixin, TemplateView):
         return context
 
 
-class ProductDetailView(CustomLoginRequiredMixin, DetailView):
+class ProductDetailView(CustomLoginRequiredMixin, TemplateView):
     """
     Класс-представление для отображения деталей продукта.
 
+    Описание продукта (наименование, текущая версия, изображение, категория, цена) одинаково для всех пользователей и
+    берется из общего кэша страниц (catalog.services.get_product_page()). Вокруг него при каждом запросе рендерятся
+    части страницы, зависящие от пользователя: меню, кнопки владельца продукта и токен CSRF.
+
     Наследует:
     CustomLoginRequiredMixin (миксин): Обеспечивает доступ к представлению только для авторизованных пользователей.
-    DetailView (DetailView): Базовое представление для отображения деталей объекта.
+    TemplateView (TemplateView): Базовое представление для отображения шаблона.
 
     Атрибуты класса:
-    model (Model): Модель, для которой создается представление (Product).
-    form_class (ModelForm): Форма, используемая для взаимодействия с моделью продукта.
+    template_name (str): Имя шаблона страницы.
 
     Методы:
-    get_context_data(**kwargs) (dict): Переопределенный метод для добавления дополнительного контекста (текущая версия
-                                       продукта).
+    get(request, *args, **kwargs) (HttpResponse): Возвращает страницу продукта или ошибку 404.
+    get_context_data(page, **kwargs) (dict): Возвращает контекст шаблона для общей части страницы продукта.
     """
 
-    model = Product
-    form_class = ProductForm
+    template_name = 'catalog/product_detail.html'
 
-    def get_context_data(self, **kwargs):
+    def get(self, request, *args, **kwargs):
+        page = get_product_page(self.kwargs['pk'])
+
+        if page is None:
+            raise Http404('Продукт не найден')
+
+        return self.render_to_response(self.get_context_data(page))
+
+    def get_context_data(self, page, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        current_version = self.object.versions.filter(is_current=True).first()
-        context['product_version'] = current_version
+        context['product_id'] = self.kwargs['pk']
+        context['product_html'] = mark_safe(page['html'])
+        context['is_owner'] = self.request.user.pk == page['owner_id']
 
         return context
 
@@ -156,7 +255,11 @@ class ProductCreateView(CustomLoginRequiredMixin, CreateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        SubjectFormset = inlineformset_factory(Product, ProductVersion, form=VersionForm, extra=1)
+        if 'formset' in kwargs:
+            return context
+
+        SubjectFormset = inlineformset_factory(Product, ProductVersion, form=VersionForm, formset=VersionFormSet,
+                                               extra=1)
 
         if self.request.method == 'POST':
             context['formset'] = SubjectFormset(self.request.POST)
@@ -168,13 +271,22 @@ class ProductCreateView(CustomLoginRequiredMixin, CreateView):
     def form_valid(self, form):
         form.instance.owner = self.request.user
         formset = self.get_context_data()['formset']
-        self.object = form.save()
 
-        if formset.is_valid():
-            formset.instance = self.object
-            formset.save()
+        if not formset.is_valid():
+            return self.form_invalid(form)
+
+        try:
+            with transaction.atomic():
+                self.object = form.save()
+                formset.instance = self.object
+                formset.save()
+        except IntegrityError:
+            self.object = form.instance.pk = None
+            formset.non_form_errors().append(CURRENT_VERSION_CONFLICT)
+
+            return self.render_to_response(self.get_context_data(form=form, formset=formset))
 
-        return super().form_valid(form)
+        return HttpResponseRedirect(self.get_success_url())
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
@@ -199,8 +311,8 @@ class ProductUpdateView(CustomLoginRequiredMixin, UpdateView):
         Аргументы:
             - kwargs: Дополнительные ключевые аргументы.
 
-        - form_valid(form): Сохраняет форму и связанные наборы форм, а также проверяет наличие более одной активной
-                            версии продукта.
+        - form_valid(form): Проверяет набор форм версий (не более одной активной версии) и сохраняет форму и набор
+                            форм в одной транзакции.
         Аргументы:
             - form: Форма продукта.
         Возвращает:
@@ -229,7 +341,11 @@ class ProductUpdateView(CustomLoginRequiredMixin, UpdateView):
 
         context = super().get_context_data(**kwargs)
 
-        SubjectFormset = inlineformset_factory(Product, ProductVersion, form=VersionForm, extra=1)
+        if 'formset' in kwargs:
+            return context
+
+        SubjectFormset = inlineformset_factory(Product, ProductVersion, form=VersionForm, formset=VersionFormSet,
+                                               extra=1)
 
         if self.request.method == 'POST':
             context['formset'] = SubjectFormset(self.request.POST, instance=self.object)
@@ -240,7 +356,9 @@ class ProductUpdateView(CustomLoginRequiredMixin, UpdateView):
 
     def form_valid(self, form):
         """
-        Проверяет валидность формы и набора форм, сохраняет их и проверяет количество активных версий продукта.
+        Проверяет валидность набора форм версий и сохраняет форму и набор форм в одной транзакции. Единственность
+        текущей версии обеспечивается проверкой набора форм и уникальным индексом в базе данных. Если индекс нарушен
+        одновременным сохранением другого запроса, транзакция откатывается и форма выводится с ошибкой набора форм.
 
         Аргументы:
             - form: Форма продукта.
@@ -250,20 +368,21 @@ class ProductUpdateView(CustomLoginRequiredMixin, UpdateView):
         """
 
         formset = self.get_context_data()['formset']
-        self.object = form.save()
-
-        if formset.is_valid():
-            formset.instance = self.object
-            formset.save()
 
-        active_versions_count = ProductVersion.objects.filter(product=self.object, is_current=True).count()
+        if not formset.is_valid():
+            return self.form_invalid(form)
 
-        if active_versions_count > 1:
-            form.add_error(None, 'Допустима только одна активная версия для каждого продукта.')
+        try:
+            with transaction.atomic():
+                self.object = form.save()
+                formset.instance = self.object
+                formset.save()
+        except IntegrityError:
+            formset.non_form_errors().append(CURRENT_VERSION_CONFLICT)
 
-            return self.form_invalid(form)
+            return self.render_to_response(self.get_context_data(form=form, formset=formset))
 
-        return super().form_valid(form)
+        return HttpResponseRedirect(self.get_success_url())
 
     def get_form_kwargs(self):
         """
@@ -297,12 +416,13 @@ class ProductDeleteView(CustomLoginRequiredMixin, DeleteView):
     success_url = reverse_lazy('catalog:home')
 
 
-class BlogListView(CustomLoginRequiredMixin, ListView):
+class BlogListView(CustomLoginRequiredMixin, KeysetPaginationMixin, ListView):
     """
     Класс-представление для отображения списка опубликованных блогов.
 
     Наследует:
     CustomLoginRequiredMixin (миксин): Обеспечивает доступ к представлению только для авторизованных пользователей.
+    KeysetPaginationMixin (миксин): Добавляет постраничный вывод по курсору (параметр запроса cursor).
     ListView (ListView): Базовое представление для отображения списка объектов.
 
     Атрибуты класса:
@@ -310,14 +430,27 @@ class BlogListView(CustomLoginRequiredMixin, ListView):
     paginate_by (int): Количество объектов на одной странице (по умолчанию 10).
 
     Методы:
-    get_queryset(): Возвращает QuerySet из опубликованных блогов.
+    get_queryset(): Возвращает QuerySet из опубликованных блогов, упорядоченных от новых к старым.
+    get_context_data(**kwargs) (dict): Добавляет в контекст карточки статей текущей страницы из общего кэша
+                                       фрагментов.
     """
 
     model = Blog
     paginate_by = 10
 
     def get_queryset(self):
-        return Blog.objects.filter(is_published=True)
+        return (
+            Blog.objects.filter(is_published=True)
+            .annotate(preview_variants=preview_variants_subquery())
+            .order_by('-created_at', '-id')
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+
+        context['blog_cards'] = render_blog_cards(context['object_list'])
+
+        return context
 
 
 class BlogCreateView(CustomLoginRequiredMixin, PermissionRequiredMixin, CreateView):
@@ -330,13 +463,12 @@ class BlogCreateView(CustomLoginRequiredMixin, PermissionRequiredMixin, CreateVi
 
     Атрибуты класса:
     model (Model): Модель, для которой создается представление (Blog).
-    fields (tuple): Поля модели, которые будут использоваться в форме создания блога (title, content, preview,
-                    is_published).
+    form_class (ModelForm): Форма создания статьи с проверкой на запрещенные слова (BlogForm).
     success_url (str): URL, на который будет перенаправлен пользователь после успешного создания блога.
     """
 
     model = Blog
-    fields = ('title', 'content', 'preview', 'is_published')
+    form_class = BlogForm
     success_url = reverse_lazy('catalog:blog')
     permission_required = 'catalog.add_blog'
 
@@ -356,6 +488,8 @@ class BlogDetailView(CustomLoginRequiredMixin, DetailView):
 
     Методы:
     get_object(*args, **kwargs): Переопределяет метод получения объекта для увеличения счетчика просмотров статьи.
+                                 Просмотр учитывается в кэше, в базу данных счетчик переносится командой
+                                 flush_blog_views.
     """
 
     model = Blog
@@ -365,8 +499,7 @@ class BlogDetailView(CustomLoginRequiredMixin, DetailView):
     def get_object(self, *args, **kwargs):
         article = super().get_object(*args, **kwargs)
 
-        article.views_count += 1
-        article.save()
+        article.views_count += increment_blog_views(article.pk)
 
         return article
 
@@ -381,7 +514,7 @@ class BlogUpdateView(CustomLoginRequiredMixin, PermissionRequiredMixin, UpdateVi
 
     Атрибуты класса:
     model (Model): Модель, для которой создается представление (Blog).
-    fields (tuple): Поля модели, которые будут отображаться в форме для обновления записи.
+    form_class (ModelForm): Форма редактирования статьи с проверкой на запрещенные слова (BlogForm).
     slug_field (str): Поле модели, которое будет использоваться для поиска объекта (slug).
     slug_url_kwarg (str): Параметр URL, который будет использоваться для поиска объекта по полю slug.
 
@@ -390,7 +523,7 @@ class BlogUpdateView(CustomLoginRequiredMixin, PermissionRequiredMixin, UpdateVi
     """
 
     model = Blog
-    fields = ('title', 'content', 'preview', 'is_published')
+    form_class = BlogForm
     slug_field = 'slug'
     slug_url_kwarg = 'slug'
     permission_required = 'catalog.change_blog'
@@ -419,3 +552,177 @@ class BlogDeleteView(CustomLoginRequiredMixin, PermissionRequiredMixin, DeleteVi
     slug_field = 'slug'
     slug_url_kwarg = 'slug'
     permission_required = 'catalog.delete_blog'
+
+
+class SearchView(ListView):
+    """
+    Класс-представление для полнотекстового поиска по опубликованным продуктам и статьям блога.
+
+    Наследует:
+    ListView (ListView): Базовое представление для отображения списка объектов.
+
+    Атрибуты класса:
+    paginate_by (int): Количество результатов на одной странице (по умолчанию 10).
+    template_name (str): Имя шаблона для отображения результатов поиска.
+
+    Методы:
+    get_queryset(): Возвращает результаты поиска по параметру запроса q, упорядоченные по релевантности.
+    get_context_data(**kwargs) (dict): Добавляет в контекст поисковый запрос и записи индекса текущей страницы.
+    """
+
+    paginate_by = 10
+    template_name = 'catalog/search.html'
+
+    def get_queryset(self):
+        query = self.request.GET.get('q', '').strip()
+
+        if not query:
+            return []
+
+        return search.search(query)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+
+        context['query'] = self.request.GET.get('q', '').strip()
+        context['results'] = search.resolve_results(context['object_list'])
+
+        return context
+
+
+class CategoryListView(ListView):
+    """
+    Класс-представление для вывода списка категорий со статистикой продуктов.
+
+    Количество продуктов, количество опубликованных продуктов и диапазон цен хранятся в полях категории и
+    обновляются при изменении продуктов, поэтому страница не обращается к таблице продуктов.
+
+    Атрибуты класса:
+    paginate_by (int): Количество категорий на одной странице (по умолчанию 20).
+    template_name (str): Имя шаблона для отображения списка категорий.
+    """
+
+    queryset = Category.objects.order_by('name', 'pk')
+    paginate_by = 20
+    template_name = 'catalog/category_list.html'
+
+
+class CategoryDetailView(KeysetPaginationMixin, ListView):
+    """
+    Класс-представление для вывода категории со статистикой и опубликованными продуктами категории.
+
+    Продукты выводятся постранично по курсору (KeysetPaginationMixin) по индексу (category, is_published, created_at,
+    id), а количество продуктов берется из статистики категории, поэтому стоимость страницы не зависит от количества
+    продуктов в категории.
+
+    Атрибуты класса:
+    paginate_by (int): Количество продуктов на одной странице (по умолчанию 10).
+    template_name (str): Имя шаблона для отображения категории.
+
+    Методы:
+    get(request, *args, **kwargs): Загружает категорию и выводит страницу.
+    get_queryset(): Возвращает QuerySet опубликованных продуктов категории.
+    get_context_data(**kwargs) (dict): Добавляет в контекст категорию и карточки продуктов текущей страницы.
+    """
+
+    paginate_by = 10
+    template_name = 'catalog/category_detail.html'
+
+    def get(self, request, *args, **kwargs):
+        self.category = get_object_or_404(Category, pk=kwargs['pk'])
+
+        return super().get(request, *args, **kwargs)
+
+    def is_cursor_mode(self):
+        return True
+
+    def get_queryset(self):
+        return get_products_queryset().filter(category=self.category, is_published=True)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+
+        context['category'] = self.category
+        context['product_cards'] = render_product_cards([product_row(product) for product in context['object_list']])
+
+        return context
+
+
+class ProductFeedView(View):
+    """
+    Класс-представление для потоковой выгрузки каталога продуктов для маркетплейсов и агрегаторов.
+
+    Выгрузка формируется построчно и отдается через StreamingHttpResponse, поэтому объем памяти не зависит от размера
+    каталога. Если клиент поддерживает сжатие (заголовок Accept-Encoding содержит gzip), выгрузка сжимается на лету.
+    Параметр запроса since (дата и время в формате ISO 8601) включает инкрементальную выгрузку продуктов, измененных
+    начиная с указанного момента.
+
+    Методы:
+    get(request, feed_format): Возвращает выгрузку в формате csv, jsonl или yml.
+    """
+
+    def get(self, request, feed_format):
+        if feed_format not in FEED_CONTENT_TYPES:
+            raise Http404('Неизвестный формат выгрузки')
+
+        since = None
+
+        if request.GET.get('since'):
+            try:
+                since = parse_since(request.GET['since'])
+            except ValueError as error:
+                return HttpResponseBadRequest(str(error))
+
+        compress = 'gzip' in request.headers.get('Accept-Encoding', '')
+        base_url = request.build_absolute_uri('/').rstrip('/')
+
+        response = StreamingHttpResponse(
+            encode_feed(render_feed(feed_format, base_url, since), compress),
+            content_type=FEED_CONTENT_TYPES[feed_format],
+        )
+        response['Content-Disposition'] = f'inline; filename="catalog.{feed_format}"'
+
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+
+        patch_vary_headers(response, ['Accept-Encoding'])
+
+        return response
+
+
+class MetricsView(View):
+    """
+    Класс-представление для выдачи показателей обработки запросов в текстовом формате Prometheus.
+
+    Показатели всех процессов сервера объединяются реестром catalog.metrics.metrics_registry. Представление доступно
+    сотрудникам (is_staff) и запросам с заголовком Authorization: Bearer <METRICS_TOKEN>, если токен задан в
+    настройках; остальным возвращается код 403.
+
+    Методы:
+    get(request): Возвращает показатели.
+    """
+
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def get(self, request):
+        if not self.has_access(request):
+            return HttpResponseForbidden()
+
+        response = HttpResponse(render_prometheus(metrics_registry.collect()), content_type=self.content_type)
+        add_never_cache_headers(response)
+
+        return response
+
+    @staticmethod
+    def has_access(request):
+        """
+        Проверяет, что запрос выполнен сотрудником или содержит токен доступа к показателям.
+        """
+
+        if settings.METRICS_TOKEN:
+            scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+
+            if scheme.lower() == 'bearer' and constant_time_compare(token, settings.METRICS_TOKEN):
+                return True
+
+        return request.user.is_staff
@@ -50,6 +50,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'catalog.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,16 +58,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'django.middleware.cache.UpdateCacheMiddleware',
-    'django.middleware.cache.FetchFromCacheMiddleware',
-    'catalog.middleware.ExcludeCacheMiddleware',
+    'catalog.middleware.CachePolicyMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'catalog.metrics.InstrumentedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -141,6 +140,12 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Уменьшенные копии загруженных изображений (catalog.images): ширины в пикселях, качество сжатия WebP и JPEG и
+# количество процессов, в которых они создаются.
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 1280)
+IMAGE_DERIVATIVE_QUALITY = 80
+IMAGE_DERIVATIVE_WORKERS = 2
+
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 
 EMAIL_HOST = 'smtp.yandex.ru'
@@ -159,17 +164,24 @@ SERVER_EMAIL = EMAIL_HOST_USER
 
 EMAIL_ADMIN = EMAIL_HOST_USER
 
+# Время хранения в секундах записей отправленных и недоставленных писем очереди исходящих писем (команда send_outbox).
+OUTBOX_RETENTION = 7 * 24 * 60 * 60
+
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap4"
 
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
 AUTH_USER_MODEL = 'users.User'
 
+# Права пользователей кэшируются между запросами (users.backends.CachedModelBackend).
+AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
+
 LOGOUT_REDIRECT_URL = '/'
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        # RedisCache с неблокирующими асинхронными методами для представлений под ASGI (catalog.cache).
+        'BACKEND': 'catalog.cache.InstrumentedRedisCache',
         'LOCATION': env('CACHES_LOCATION')
     }
 }
@@ -178,8 +190,69 @@ CACHE_MIDDLEWARE_ALIAS = 'default'
 CACHE_MIDDLEWARE_SECONDS = 60
 CACHE_MIDDLEWARE_KEY_PREFIX = ''
 
-CACHE_MIDDLEWARE_IGNORE_LIST = [
-    '/admin/',
-    '/login/',
-    '/logout/',
-]
+# Политики кэширования ответов по имени маршрута (catalog.middleware.CachePolicyMiddleware):
+#   timeout - время жизни ответа в кэше в секундах;
+#   anonymous_only - кэшировать только ответы для анонимных пользователей;
+#   vary - заголовки запроса, от которых зависит ответ (например, Cookie для страниц, зависящих от пользователя);
+#   generation - поколение кэша, при переключении которого сохраненные ответы становятся недоступны (например,
+#                products - поколение кэша списка продуктов, переключаемое при изменении каталога);
+#   never_cache - запретить кэширование ответа браузером и промежуточными прокси.
+CACHE_POLICIES = {
+    'catalog:home': {'timeout': 60, 'anonymous_only': True, 'generation': 'products'},
+    'catalog:blog': {'timeout': 60, 'vary': ['Cookie']},
+    'catalog:contacts': {'never_cache': True},
+    'catalog:new_product': {'never_cache': True},
+    'catalog:product_update': {'never_cache': True},
+    'catalog:new_blog': {'never_cache': True},
+    'catalog:blog_edit': {'never_cache': True},
+}
+
+# Кэш общей для всех пользователей части страниц продуктов (catalog.page_cache.get_page_fragment()). Через
+# PRODUCT_PAGE_SOFT_TIMEOUT секунд часть страницы перестраивается одним запросом, остальные запросы всех
+# пользователей в это время получают сохраненную; запись хранится PRODUCT_PAGE_HARD_TIMEOUT секунд. При изменении
+# продукта, его версий или категории записи сбрасываются сразу.
+PRODUCT_PAGE_SOFT_TIMEOUT = 60
+PRODUCT_PAGE_HARD_TIMEOUT = 24 * 60 * 60
+
+# Кэши в памяти процесса перед Redis (catalog.local_cache.TwoTierCache): максимальное количество записей и время
+# жизни записи в секундах. Хранятся только записи под версионированными ключами (снимок каталога, фрагменты
+# карточек, фасеты), поэтому изменение каталога в любом процессе делает их недоступными во всех процессах.
+LOCAL_CACHES = {
+    'products': {'MAX_ENTRIES': 2, 'TIMEOUT': 5 * 60},
+    'cards': {'MAX_ENTRIES': 5000, 'TIMEOUT': 60 * 60},
+    'facets': {'MAX_ENTRIES': 500, 'TIMEOUT': 5 * 60},
+}
+
+# Буферизация сообщений формы обратной связи: 'batch' - сообщения накапливаются в памяти процесса и записываются
+# в базу данных пачками в фоновом потоке, 'always' - каждое сообщение записывается сразу в потоке запроса.
+# CONTACT_MESSAGES_MAX_PENDING - максимальное количество сообщений в буфере процесса, сверх него сообщения
+# записываются в потоке запроса.
+CONTACT_MESSAGES_FLUSH_POLICY = 'batch'
+CONTACT_MESSAGES_BATCH_SIZE = 500
+CONTACT_MESSAGES_FLUSH_INTERVAL = 1.0
+CONTACT_MESSAGES_MAX_PENDING = 10 * CONTACT_MESSAGES_BATCH_SIZE
+
+# Асинхронные представления чтения каталога и блога (catalog.async_views). Включаются при запуске под ASGI
+# (config.asgi), под WSGI синхронные представления эффективнее.
+CATALOG_ASYNC_VIEWS = env.bool('CATALOG_ASYNC_VIEWS', default=False)
+
+# Подтверждение email при регистрации (users.verification): 'database' - токены хранятся в таблице
+# VerificationToken, 'signed' - подписанные токены с временем создания, проверяемые без обращения к базе данных.
+# Срок действия токена в секундах и возраст в секундах, после которого неподтвержденные пользователи удаляются
+# командой purge_unverified_users.
+VERIFICATION_TOKENS_MODE = env('VERIFICATION_TOKENS_MODE', default='database')
+VERIFICATION_TOKEN_MAX_AGE = 2 * 24 * 60 * 60
+UNVERIFIED_USERS_MAX_AGE = 30 * 24 * 60 * 60
+
+# Показатели обработки запросов (catalog.metrics): заголовок Server-Timing в ответах, интервал публикации
+# показателей процесса в кэш в секундах и максимальное количество процессов, показатели которых объединяются
+# представлением /metrics. Представление доступно сотрудникам (is_staff) и по заголовку
+# Authorization: Bearer <METRICS_TOKEN>, если токен задан.
+METRICS_SERVER_TIMING = True
+METRICS_PUBLISH_INTERVAL = 10
+METRICS_MAX_PROCESSES = 64
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+
+# Выгрузка каталога для маркетплейсов и агрегаторов (catalog.feeds): наименование магазина и компании в формате YML.
+FEED_SHOP_NAME = 'online_store'
+FEED_COMPANY_NAME = 'online_store'
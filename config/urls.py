@@ -20,9 +20,12 @@ from django.contrib import admin
 from django.contrib.auth.views import LogoutView
 from django.urls import path, include
 
+from catalog.views import MetricsView
+
 urlpatterns = [
                   path('admin/', admin.site.urls),
                   path('', include('catalog.urls', namespace='catalog')),
                   path('users/', include('users.urls', namespace='users')),
                   path('logout/', LogoutView.as_view(), name='logout'),
+                  path('metrics', MetricsView.as_view(), name='metrics'),
               ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,74 @@
+import time
+
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+PERMISSIONS_GENERATION_KEY = 'permissions:generation'
+PERMISSIONS_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def get_permissions_generation():
+    """
+    Возвращает текущее поколение кэша прав пользователей.
+
+    Если счетчик поколений отсутствует в кэше, он инициализируется текущим временем в миллисекундах, чтобы новое
+    поколение гарантированно не совпало ни с одним из ранее сохраненных ключей.
+
+    Возвращает:
+        int: Номер текущего поколения.
+    """
+
+    generation = cache.get(PERMISSIONS_GENERATION_KEY)
+
+    if generation is None:
+        cache.add(PERMISSIONS_GENERATION_KEY, int(time.time() * 1000), timeout=None)
+        generation = cache.get(PERMISSIONS_GENERATION_KEY)
+
+    return generation
+
+
+def invalidate_permissions_cache():
+    """
+    Инвалидирует кэш прав всех пользователей, переключая его на новое поколение.
+    """
+
+    try:
+        cache.incr(PERMISSIONS_GENERATION_KEY)
+    except ValueError:
+        cache.add(PERMISSIONS_GENERATION_KEY, int(time.time() * 1000), timeout=None)
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    Бэкенд аутентификации, кэширующий множество прав пользователя в общем кэше между запросами.
+
+    Стандартный ModelBackend загружает права пользователя и его групп из базы данных один раз на запрос (в атрибут
+    пользователя _perm_cache). Этот бэкенд сохраняет полученное множество в кэше по ключу из поколения прав,
+    идентификатора пользователя и флага суперпользователя, поэтому на последующих запросах проверка прав не выполняет
+    запросов к базе данных. Поколение переключается при изменении состава групп, прав групп и прав пользователей
+    (см. users/signals.py).
+
+    Методы:
+        - get_all_permissions(user_obj, obj=None): Возвращает множество прав пользователя из кэша.
+        - get_cache_key(user_obj): Возвращает ключ кэша прав пользователя.
+    """
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+
+        if not hasattr(user_obj, '_perm_cache'):
+            cache_key = self.get_cache_key(user_obj)
+            permissions = cache.get(cache_key)
+
+            if permissions is None:
+                permissions = super().get_all_permissions(user_obj)
+                cache.set(cache_key, permissions, PERMISSIONS_CACHE_TIMEOUT)
+
+            user_obj._perm_cache = permissions
+
+        return user_obj._perm_cache
+
+    @staticmethod
+    def get_cache_key(user_obj):
+        return f'permissions:{get_permissions_generation()}:{user_obj.pk}:{int(user_obj.is_superuser)}'
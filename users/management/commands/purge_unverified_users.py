@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from users.models import VerificationToken
+from users.verification import get_token_max_age, unverified_users
+
+
+class Command(BaseCommand):
+    """
+    Команда для удаления истекших токенов подтверждения email и давно зарегистрированных неподтвержденных
+    пользователей.
+
+    Токены старше VERIFICATION_TOKEN_MAX_AGE и пользователи, не подтвердившие email за UNVERIFIED_USERS_MAX_AGE
+    (неактивные и ни разу не входившие в систему, см. users.verification.unverified_users()), удаляются порциями
+    по первичному ключу, каждая порция - в отдельной транзакции, поэтому таблицы не блокируются надолго.
+    Переход по ссылке с удаленным токеном возвращает код 404, повторное письмо не отправляется.
+
+    Методы:
+        - add_arguments(parser): Добавляет аргументы --chunk-size, --days и --dry-run.
+        - handle(*args, **options): Удаляет токены и пользователей и выводит количество удаленных.
+        - purge(queryset, chunk_size, dry_run): Удаляет объекты выборки порциями.
+    """
+
+    help = 'Удаляет истекшие токены подтверждения email и неподтвержденных пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Количество объектов в одной порции')
+        parser.add_argument('--days', type=int,
+                            help='Возраст неподтвержденных пользователей в днях, по умолчанию UNVERIFIED_USERS_MAX_AGE')
+        parser.add_argument('--dry-run', action='store_true', help='Только подсчитать объекты, не удаляя их')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть положительным')
+
+        now = timezone.now()
+
+        if options['days'] is not None:
+            users_max_age = timedelta(days=options['days'])
+        else:
+            users_max_age = timedelta(seconds=settings.UNVERIFIED_USERS_MAX_AGE)
+
+        tokens = self.purge(
+            VerificationToken.objects.filter(created_at__lt=now - get_token_max_age()),
+            options['chunk_size'], options['dry_run'],
+        )
+        users = self.purge(
+            unverified_users().filter(date_joined__lt=now - users_max_age),
+            options['chunk_size'], options['dry_run'],
+        )
+
+        action = 'Найдено для удаления' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(f'{action}: токенов {tokens}, пользователей {users}'))
+
+    @staticmethod
+    def purge(queryset, chunk_size, dry_run):
+        """
+        Удаляет объекты выборки порциями по первичному ключу.
+
+        Параметры:
+            - queryset (QuerySet): Выборка удаляемых объектов.
+            - chunk_size (int): Количество объектов в одной порции.
+            - dry_run (bool): Только подсчитать объекты.
+
+        Возвращает:
+            - int: Количество удаленных (найденных) объектов.
+        """
+
+        if dry_run:
+            return queryset.count()
+
+        deleted = 0
+        last_pk = 0
+
+        while True:
+            pks = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+
+            if not pks:
+                return deleted
+
+            with transaction.atomic():
+                deleted += queryset.filter(pk__in=pks).delete()[1].get(queryset.model._meta.label, 0)
+
+            last_pk = pks[-1]
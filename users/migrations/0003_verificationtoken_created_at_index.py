@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 03:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_verificationtoken'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='verificationtoken',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
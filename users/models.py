@@ -154,6 +154,12 @@ class User(AbstractUser):
 
 
 class VerificationToken(models.Model):
+    """
+    Токен подтверждения email пользователя (режим VERIFICATION_TOKENS_MODE = 'database', см. users.verification).
+
+    Истекшие токены удаляются командой purge_unverified_users; индекс по created_at используется для их выборки.
+    """
+
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     token = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from catalog.images import schedule_missing_derivatives
+from users.backends import invalidate_permissions_cache
+
+User = get_user_model()
+
+PERMISSION_CHANGE_ACTIONS = ('post_add', 'post_remove', 'post_clear')
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_permissions_on_m2m_change(sender, action, **kwargs):
+    """
+    Инвалидирует кэш прав пользователей при изменении состава групп, прав групп или прав пользователей.
+
+    Переключение поколения откладывается до фиксации транзакции, чтобы кэш не был заполнен незафиксированными данными.
+    """
+
+    if action in PERMISSION_CHANGE_ACTIONS:
+        transaction.on_commit(invalidate_permissions_cache)
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def invalidate_permissions_on_change(sender, **kwargs):
+    """
+    Инвалидирует кэш прав пользователей при удалении группы, а также при создании или удалении права (права
+    суперпользователя включают все существующие права).
+    """
+
+    transaction.on_commit(invalidate_permissions_cache)
+
+
+@receiver(post_save, sender=User)
+def generate_avatar_derivatives(sender, instance, **kwargs):
+    """
+    Ставит в очередь создание уменьшенных копий аватара пользователя после его загрузки.
+    """
+
+    schedule_missing_derivatives(instance.avatar)
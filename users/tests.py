@@ -0,0 +1,237 @@
+import time
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog.models import OutboxEmail
+from users.models import User, VerificationToken
+from users.verification import make_verification_token
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PermissionsCacheTests(TestCase):
+    """
+    Тесты кэширования прав пользователей (users.backends.CachedModelBackend): права читаются из кэша без запросов к
+    базе данных, а изменение групп и прав после фиксации транзакции переключает поколение кэша.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='perms@example.com', password='password')
+        cls.group = Group.objects.create(name='Модераторы')
+        cls.add_product = Permission.objects.get(codename='add_product')
+        cls.change_product = Permission.objects.get(codename='change_product')
+        cls.group.permissions.add(cls.add_product)
+        cls.user.groups.add(cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_user(self):
+        # Новый объект пользователя: права, загруженные в атрибуты прежнего объекта, не используются.
+        return User.objects.get(pk=self.user.pk)
+
+    def change(self, func, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            func(*args)
+
+    def test_permissions_are_cached_between_requests(self):
+        self.assertTrue(self.get_user().has_perm('catalog.add_product'))
+
+        user = self.get_user()
+
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm('catalog.add_product'))
+            self.assertFalse(user.has_perm('catalog.change_product'))
+
+    def test_group_permission_change_invalidates_cache(self):
+        self.assertFalse(self.get_user().has_perm('catalog.change_product'))
+
+        self.change(self.group.permissions.add, self.change_product)
+        self.assertTrue(self.get_user().has_perm('catalog.change_product'))
+
+        self.change(self.group.permissions.remove, self.change_product)
+        self.assertFalse(self.get_user().has_perm('catalog.change_product'))
+
+    def test_user_permission_and_membership_changes_invalidate_cache(self):
+        self.change(self.user.user_permissions.add, self.change_product)
+        self.assertTrue(self.get_user().has_perm('catalog.change_product'))
+
+        self.change(self.user.groups.remove, self.group)
+        self.assertFalse(self.get_user().has_perm('catalog.add_product'))
+
+        self.change(self.user.groups.add, self.group)
+        self.assertTrue(self.get_user().has_perm('catalog.add_product'))
+
+        self.change(self.group.delete)
+        self.assertFalse(self.get_user().has_perm('catalog.add_product'))
+
+    def test_cache_is_not_invalidated_before_commit(self):
+        self.assertFalse(self.get_user().has_perm('catalog.change_product'))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.group.permissions.add(self.change_product)
+
+        # До фиксации транзакции поколение не переключено, права читаются из кэша.
+        self.assertFalse(self.get_user().has_perm('catalog.change_product'))
+
+        for callback in callbacks:
+            callback()
+
+        self.assertTrue(self.get_user().has_perm('catalog.change_product'))
+
+    def test_superuser_flag_is_part_of_cache_key(self):
+        self.assertNotIn('catalog.change_product', self.get_user().get_all_permissions())
+
+        User.objects.filter(pk=self.user.pk).update(is_superuser=True)
+
+        self.assertIn('catalog.change_product', self.get_user().get_all_permissions())
+
+
+@override_settings(CACHES=LOCMEM_CACHES, VERIFICATION_TOKENS_MODE='signed')
+class VerificationTokenTests(TestCase):
+    """
+    Тесты подтверждения email (users.verification): подписанные и хранящиеся в базе данных токены, истекшие и
+    поддельные ссылки.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='verify@example.com', password='password', is_active=False)
+
+    def verify(self, token):
+        return self.client.get(reverse('users:verify_email', kwargs={'token': token}))
+
+    def make_expired_token(self):
+        # Подпись с временем создания на день больше срока действия токена.
+        created = time.time() - settings.VERIFICATION_TOKEN_MAX_AGE - 24 * 60 * 60
+
+        with mock.patch('django.core.signing.time.time', return_value=created):
+            return make_verification_token(self.user)
+
+    def assertActive(self, is_active):
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.is_active, is_active)
+
+    def test_signed_token_activates_user_with_one_query(self):
+        token = make_verification_token(self.user)
+
+        self.assertFalse(VerificationToken.objects.exists())
+
+        with self.assertNumQueries(1):
+            response = self.verify(token)
+
+        self.assertContains(response, 'Email verified successfully')
+        self.assertActive(True)
+
+    def test_expired_signed_token_sends_new_email(self):
+        response = self.verify(self.make_expired_token())
+
+        self.assertContains(response, 'The token has expired')
+        self.assertActive(False)
+        self.assertEqual(list(OutboxEmail.objects.values_list('recipients', flat=True)), [[self.user.email]])
+
+    def test_tampered_signed_token_is_rejected(self):
+        token = make_verification_token(self.user)
+        other = User.objects.create_user(email='other@example.com', password='password', is_active=False)
+        forged = token.replace(str(self.user.pk), str(other.pk), 1)
+
+        for bad_token in (token[:-1] + ('A' if token[-1] != 'A' else 'B'), forged, 'not-a-token'):
+            with self.subTest(token=bad_token):
+                self.assertEqual(self.verify(bad_token).status_code, 404)
+
+        self.assertActive(False)
+        self.assertFalse(User.objects.filter(is_active=True).exists())
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_signed_token_does_not_reactivate_disabled_user(self):
+        token = make_verification_token(self.user)
+        User.objects.filter(pk=self.user.pk).update(last_login=timezone.now())
+
+        self.assertContains(self.verify(token), 'Email verified successfully')
+        self.assertActive(False)
+        self.assertEqual(self.verify(self.make_expired_token()).status_code, 404)
+
+    @override_settings(VERIFICATION_TOKENS_MODE='database')
+    def test_database_token(self):
+        token = make_verification_token(self.user)
+
+        self.assertEqual(self.verify(str(uuid.uuid4())).status_code, 404)
+        self.assertContains(self.verify(token), 'Email verified successfully')
+        self.assertActive(True)
+        self.assertFalse(VerificationToken.objects.exists())
+
+    @override_settings(VERIFICATION_TOKENS_MODE='database')
+    def test_expired_database_token_is_replaced(self):
+        token = make_verification_token(self.user)
+        expired = timezone.now() - timedelta(seconds=settings.VERIFICATION_TOKEN_MAX_AGE + 1)
+        VerificationToken.objects.update(created_at=expired)
+
+        self.assertContains(self.verify(token), 'The token has expired')
+        self.assertActive(False)
+        self.assertEqual(self.verify(token).status_code, 404)
+        self.assertNotEqual(str(VerificationToken.objects.get(user=self.user).token), token)
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PurgeUnverifiedUsersTests(TestCase):
+    """
+    Тесты команды purge_unverified_users: удаляются только истекшие токены и давно зарегистрированные неподтвержденные
+    пользователи.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        old = now - timedelta(seconds=settings.UNVERIFIED_USERS_MAX_AGE + 60)
+        users = {
+            # email: (is_active, last_login, date_joined)
+            'old@example.com': (False, None, old),
+            'old2@example.com': (False, None, old),
+            'recent@example.com': (False, None, now),
+            'active@example.com': (True, None, old),
+            'disabled@example.com': (False, old, old),
+        }
+
+        for email, (is_active, last_login, date_joined) in users.items():
+            User.objects.create_user(email=email, password='password', is_active=is_active, last_login=last_login,
+                                     date_joined=date_joined)
+
+        expired = now - timedelta(seconds=settings.VERIFICATION_TOKEN_MAX_AGE + 60)
+        VerificationToken.objects.create(user=User.objects.get(email='recent@example.com'))
+        VerificationToken.objects.create(user=User.objects.get(email='disabled@example.com'))
+        VerificationToken.objects.filter(user__email='disabled@example.com').update(created_at=expired)
+
+    def purge(self, *args):
+        stdout = StringIO()
+        call_command('purge_unverified_users', *args, stdout=stdout)
+
+        return stdout.getvalue()
+
+    def test_dry_run_deletes_nothing(self):
+        self.assertIn('Найдено для удаления: токенов 1, пользователей 2', self.purge('--dry-run'))
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(VerificationToken.objects.count(), 2)
+
+    def test_purge_in_chunks(self):
+        self.assertIn('Удалено: токенов 1, пользователей 2', self.purge('--chunk-size', '1'))
+        self.assertEqual(
+            set(User.objects.values_list('email', flat=True)),
+            {'recent@example.com', 'active@example.com', 'disabled@example.com'},
+        )
+        self.assertEqual(list(VerificationToken.objects.values_list('user__email', flat=True)), ['recent@example.com'])
+        self.assertIn('Удалено: токенов 0, пользователей 0', self.purge())
+
+    def test_days_option(self):
+        self.assertIn('пользователей 3', self.purge('--days', '0', '--dry-run'))
@@ -0,0 +1,115 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog.models import OutboxEmail
+from config.settings import env
+from users.models import User, VerificationToken
+
+# Подтверждение email при регистрации. В режиме 'database' токен - UUID, хранящийся в таблице VerificationToken. В
+# режиме 'signed' токен - подписанный идентификатор пользователя с временем создания (signing.TimestampSigner):
+# он проверяется без обращения к базе данных, а активация выполняется одним запросом UPDATE. Режим выбирается
+# настройкой VERIFICATION_TOKENS_MODE; ссылки, выданные в другом режиме, продолжают работать до истечения срока.
+
+MODE_DATABASE = 'database'
+MODE_SIGNED = 'signed'
+
+SIGNED_TOKEN_SALT = 'users.verification'
+
+signer = signing.TimestampSigner(salt=SIGNED_TOKEN_SALT)
+
+
+def get_token_max_age():
+    """
+    Возвращает срок действия токена подтверждения (timedelta).
+    """
+
+    return timedelta(seconds=settings.VERIFICATION_TOKEN_MAX_AGE)
+
+
+def unverified_users(user_pk=None):
+    """
+    Возвращает QuerySet пользователей, ожидающих подтверждения email: неактивных и ни разу не входивших в систему.
+
+    Условие last_login не позволяет подписанной ссылке повторно активировать пользователя, отключенного
+    администратором.
+
+    Параметры:
+        user_pk (int, optional): Идентификатор пользователя, которым нужно ограничить выборку.
+    """
+
+    queryset = User.objects.filter(is_active=False, last_login__isnull=True, is_staff=False, is_superuser=False)
+
+    if user_pk is not None:
+        queryset = queryset.filter(pk=user_pk)
+
+    return queryset
+
+
+def make_verification_token(user):
+    """
+    Создает токен подтверждения email для пользователя.
+
+    В режиме 'database' существующий токен пользователя заменяется новым (один запрос INSERT или UPDATE).
+
+    Возвращает:
+        str: Токен для ссылки подтверждения.
+    """
+
+    if settings.VERIFICATION_TOKENS_MODE == MODE_SIGNED:
+        return signer.sign(str(user.pk))
+
+    token, _ = VerificationToken.objects.update_or_create(
+        user=user, defaults={'token': uuid.uuid4(), 'created_at': timezone.now()},
+    )
+
+    return str(token.token)
+
+
+def send_verification_email(user):
+    """
+    Создает токен подтверждения и ставит в очередь письмо со ссылкой подтверждения email.
+    """
+
+    verification_link = env('MY_IP_ADDRESS') + reverse(
+        'users:verify_email', kwargs={'token': make_verification_token(user)},
+    )
+
+    OutboxEmail.objects.enqueue(
+        'Verify your email', f'Please click the link to verify your email: {verification_link}', [user.email],
+    )
+
+
+def check_signed_token(token):
+    """
+    Проверяет подписанный токен подтверждения.
+
+    Параметры:
+        token (str): Токен из ссылки подтверждения.
+
+    Возвращает:
+        tuple: Идентификатор пользователя и признак истечения срока действия токена.
+
+    Исключения:
+        signing.BadSignature: Если подпись токена неверна.
+    """
+
+    try:
+        return int(signer.unsign(token, max_age=get_token_max_age())), False
+    except signing.SignatureExpired:
+        return int(signer.unsign(token)), True
+
+
+def parse_database_token(token):
+    """
+    Возвращает UUID токена, хранящегося в базе данных, или None, если строка не является UUID.
+    """
+
+    try:
+        return uuid.UUID(token)
+    except ValueError:
+        return None
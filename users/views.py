@@ -1,18 +1,22 @@
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.views import LoginView
-from django.core.mail import send_mail
-from django.http import HttpResponse
+from django.core import signing
+from django.db import transaction
+from django.http import HttpResponse, Http404
 from django.shortcuts import get_object_or_404, render
-from django.urls import reverse_lazy, reverse
+from django.urls import reverse_lazy
 from django.utils import timezone
 from django.utils.crypto import get_random_string
 from django.views import View
 from django.views.generic import CreateView, UpdateView
 
 from catalog.mixins import CustomLoginRequiredMixin
-from config.settings import env, EMAIL_HOST_USER, DEFAULT_FROM_EMAIL
+from catalog.models import OutboxEmail
+from config.settings import EMAIL_HOST_USER
 from users.forms import CustomUserCreationForm, ProfileForm
 from users.models import User, VerificationToken
+from users.verification import send_verification_email, get_token_max_age, check_signed_token, \
+    parse_database_token, unverified_users
 
 
 class RegisterView(CreateView):
@@ -20,7 +24,8 @@ class RegisterView(CreateView):
     Представление для регистрации новых пользователей.
 
     Это представление использует форму CustomUserCreationForm для создания новой учетной записи пользователя.
-    После успешной регистрации пользователю отправляется письмо с просьбой подтвердить свой email.
+    После успешной регистрации пользователю отправляется письмо с просьбой подтвердить свой email. Письмо ставится в
+    очередь исходящих писем в одной транзакции с созданием пользователя и отправляется командой send_outbox.
 
     Атрибуты:
     ----------
@@ -37,9 +42,8 @@ class RegisterView(CreateView):
     -------
     form_valid(form):
         Метод, который вызывается при отправке и валидации формы.
-        Сохраняет пользователя с установленным is_active=False и отправляет письмо с верификацией.
-    send_verification_email(user):
-        Статический метод для отправки письма с верификацией на email пользователя.
+        Сохраняет пользователя с установленным is_active=False и ставит в очередь письмо с верификацией
+        (users.verification.send_verification_email()).
     """
 
     model = User
@@ -48,35 +52,33 @@ class RegisterView(CreateView):
     success_url = reverse_lazy('users:login')
 
     def form_valid(self, form):
-        user = form.save(commit=False)
-        user.is_active = False
-        user.save()
-        self.send_verification_email(user)
+        with transaction.atomic():
+            user = form.save(commit=False)
+            user.is_active = False
+            user.save()
+            send_verification_email(user)
 
         return super(RegisterView, self).form_valid(form)
 
-    @staticmethod
-    def send_verification_email(user):
-        token = VerificationToken.objects.create(user=user)
-        verification_link = env('MY_IP_ADDRESS') + reverse('users:verify_email', kwargs={'token': str(token.token)})
-
-        subject = 'Verify your email'
-        message = f'Please click the link to verify your email: {verification_link}'
-        send_mail(subject, message, DEFAULT_FROM_EMAIL, [user.email])
-
 
 class VerifyEmailView(View):
     """
     Представление для верификации email пользователя.
 
     Это представление обрабатывает GET-запросы для завершения процесса верификации email.
-    При успешной верификации активируется учетная запись пользователя.
+    При успешной верификации активируется учетная запись пользователя. Токен из ссылки может быть UUID, хранящимся в
+    таблице VerificationToken, или подписанным токеном, который проверяется без обращения к базе данных
+    (см. users.verification). При истекшем сроке действия токена пользователю ставится в очередь новое письмо.
 
     Методы:
     -------
-    get(request, user_id):
+    get(request, token):
         Обрабатывает GET-запрос. Активирует учетную запись пользователя и возвращает сообщение
         о успешной верификации email.
+    verify_database_token(token):
+        Проверяет токен, хранящийся в базе данных.
+    verify_signed_token(token):
+        Проверяет подписанный токен.
     """
 
     def get(self, request, token):
@@ -87,28 +89,68 @@ class VerifyEmailView(View):
         ----------
         request : HttpRequest
             Объект запроса.
-        user_id : int
-            Идентификатор пользователя, который должен быть верифицирован.
+        token : str
+            Токен из ссылки подтверждения.
 
         Возвращает:
         -----------
         HttpResponse
-            Возвращает сообщение о успешной верификации email.
+            Возвращает сообщение о успешной верификации email или об отправке нового письма.
         """
 
-        verification_token = get_object_or_404(VerificationToken, token=token)
+        database_token = parse_database_token(token)
+
+        if database_token is not None:
+            return self.verify_database_token(database_token)
+
+        return self.verify_signed_token(token)
+
+    @staticmethod
+    def verify_database_token(token):
+        """
+        Проверяет токен, хранящийся в базе данных: токен и пользователь читаются одним запросом, при истекшем сроке
+        токен заменяется новым.
+        """
+
+        verification_token = get_object_or_404(VerificationToken.objects.select_related('user'), token=token)
         user = verification_token.user
-        time_elapsed = timezone.now() - verification_token.created_at
 
-        if time_elapsed.days > 1:
+        if timezone.now() - verification_token.created_at > get_token_max_age():
+            with transaction.atomic():
+                send_verification_email(user)
+
+            return HttpResponse("The token has expired. A new confirmation email has been sent.")
+
+        with transaction.atomic():
+            user.is_active = True
+            user.save(update_fields=['is_active'])
             verification_token.delete()
-            RegisterView.send_verification_email(user)
+
+        return HttpResponse("Email verified successfully")
+
+    @staticmethod
+    def verify_signed_token(token):
+        """
+        Проверяет подписанный токен: подпись и срок действия проверяются без обращения к базе данных, пользователь
+        активируется одним запросом UPDATE. Повторный переход по ссылке не изменяет уже активированного пользователя.
+        """
+
+        try:
+            user_pk, expired = check_signed_token(token)
+        except signing.BadSignature:
+            raise Http404('Неверная ссылка подтверждения')
+
+        if expired:
+            user = unverified_users(user_pk).first()
+
+            if user is None:
+                raise Http404('Неверная ссылка подтверждения')
+
+            send_verification_email(user)
 
             return HttpResponse("The token has expired. A new confirmation email has been sent.")
 
-        user.is_active = True
-        user.save()
-        verification_token.delete()
+        unverified_users(user_pk).update(is_active=True)
 
         return HttpResponse("Email verified successfully")
 
@@ -213,15 +255,18 @@ class PasswordResetView(View):
         if user:
             new_password = get_random_string(12)
             user.password = make_password(new_password)
-            user.save()
-            self.send_new_password_email(user, new_password)
+
+            with transaction.atomic():
+                user.save()
+                self.send_new_password_email(user, new_password)
 
         return HttpResponse("If the email exists in our system, a new password has been sent.")
 
     @staticmethod
     def send_new_password_email(user, new_password):
         """
-        Отправляет новый пароль на электронную почту пользователя.
+        Ставит в очередь письмо с новым паролем на электронную почту пользователя. Текст письма стирается командой
+        send_outbox после отправки.
 
         Параметры:
         ----------
@@ -231,7 +276,8 @@ class PasswordResetView(View):
             Новый сгенерированный пароль.
         """
 
-        send_mail("Your new password", f"Your new password is: {new_password}", EMAIL_HOST_USER, [user.email])
+        OutboxEmail.objects.enqueue("Your new password", f"Your new password is: {new_password}", [user.email],
+                                    from_email=EMAIL_HOST_USER)
 
 
 class ProfileUpdateView(CustomLoginRequiredMixin, UpdateView):